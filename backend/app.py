@@ -1,27 +1,84 @@
-from flask import Flask, jsonify, send_from_directory, request, send_file, session
-from hardware import (
-    LevelSensor,
-    InverterToggle,
-    getInverterRelayStatus,
-    Smartshunt,
-    FanToggle,
+from flask import (
+    Flask,
+    Response,
+    abort,
+    g,
+    jsonify,
+    request,
+    send_file,
+    session,
 )
 from dotenv import load_dotenv
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
 import subprocess
+import gzip
+import json
 import os
 import shutil
+import socket
+import threading
+import time
+import zlib
 from datetime import datetime
+from urllib.parse import quote
+from werkzeug.http import is_resource_modified
 from files import (
     UPLOAD_DIR,
     MAX_FILE_SIZE,
-    get_full_path,
+    resolve_path,
     sanitize_path,
     is_safe_filename,
     ensure_upload_dir,
-    is_folder_locked,
+    list_folder,
+    listing_cache,
+    load_locked_folders,
+    lock_store,
+    parent_folder,
     lock_folder,
     unlock_folder,
 )
+from uploads import PROOF_SIZE, UploadError, upload_manager
+from blobs import blob_store
+from quotas import quota_store
+from trash import TrashError, trash
+from events import event_hub
+from watcher import watcher
+from catalog import SEARCH_SORTS, ancestor_folders, catalog
+from archive import stream_zip, walk_selection
+from media import send_media
+from static_assets import StaticAssets
+from readings import CachedReading
+from metrics import CONTENT_TYPE, Counter, Gauge, Histogram, default_registry
+from profiling import PROFILE_HEADER, RequestProfiler
+from dashboard import Dashboard
+from control import ControlChannel, device_states
+from thumbnails import (
+    THUMBNAIL_MIMETYPES,
+    can_thumbnail,
+    snap_width,
+    supports_webp,
+    thumbnail_cache,
+)
+
+# Under serve.py the hardware belongs to the broker process
+if os.getenv("HARDWARE_SOCKET"):
+    from broker import (
+        hardware_metrics,
+        LevelSensor,
+        InverterToggle,
+        getInverterRelayStatus,
+        Smartshunt,
+        FanToggle,
+    )
+else:
+    from hardware import (
+        LevelSensor,
+        InverterToggle,
+        getInverterRelayStatus,
+        Smartshunt,
+        FanToggle,
+    )
 
 
 load_dotenv()
@@ -29,18 +86,294 @@ load_dotenv()
 app = Flask(__name__, static_folder="../dist")
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-key-change-in-production")
 
+profiler = RequestProfiler(app.secret_key)
+
+# Reject oversized request bodies while they stream in, not after buffering
+app.config["MAX_CONTENT_LENGTH"] = MAX_FILE_SIZE + 1024 * 1024
+
+static_assets = StaticAssets(app.static_folder)
+
+sock = Sock(app)
+
+# Deleted data still holds blob links until the trash is emptied
+trash.on_reaped = blob_store.collect_async
+
+# Seconds between keepalive comments on idle event streams
+EVENTS_KEEPALIVE = 30
+
+# Slides rendered ahead of the viewer and hinted with Link: rel=preload
+SLIDESHOW_PRELOAD = 3
+
+# Hardware reads shared by every client; a SmartShunt frame arrives about
+# once a second, and partial frames are dropped in favour of the last whole one
+hardware_readings = {
+    "smartshunt": CachedReading(
+        Smartshunt, ttl=2, stale=30, accept=lambda data: "voltage" in data
+    ),
+    "level_sensor": CachedReading(LevelSensor, ttl=1, stale=5),
+    "inverter": CachedReading(lambda: {"on": getInverterRelayStatus()}, ttl=1),
+}
+# Seconds each request waits for a device before answering without it
+HARDWARE_TIMEOUTS = {"smartshunt": 3, "level_sensor": 1, "inverter": 1}
+dashboard = Dashboard(
+    {
+        name: (reading, HARDWARE_TIMEOUTS[name])
+        for name, reading in hardware_readings.items()
+    }
+)
+
+# Responses smaller than this are sent uncompressed
+GZIP_MIN_SIZE = 1024
+
+
+def json_response(payload):
+    """jsonify, gzipped when the client accepts it and the body is large enough."""
+    response = jsonify(payload)
+    response.vary.add("Accept-Encoding")
+    if (
+        request.accept_encodings["gzip"]
+        and response.content_length
+        and response.content_length >= GZIP_MIN_SIZE
+    ):
+        response.set_data(gzip.compress(response.get_data(), compresslevel=5))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+
+def hardware_reading_response(name):
+    """The latest reading of one device, as its own endpoint has always sent it."""
+    reading = hardware_readings[name].get(timeout=HARDWARE_TIMEOUTS[name])
+    if reading["data"] is None:
+        return jsonify({"error": reading["error"]}), 503
+    return jsonify(reading["data"])
+
+
+def resolve(path_str, create_parents=False):
+    """resolve_path for the current request; closed when the request ends."""
+    target = resolve_path(path_str, create_parents=create_parents)
+    if target is not None:
+        g.setdefault("resolved_paths", []).append(target)
+    return target
+
+
+@app.teardown_request
+def close_resolved_paths(exc):
+    for target in g.pop("resolved_paths", []):
+        target.close()
+
+
+http_requests = Counter(
+    "vanui_http_requests_total",
+    "Requests handled, by route and status",
+    ["method", "route", "status"],
+)
+http_request_seconds = Histogram(
+    "vanui_http_request_duration_seconds",
+    "Time until the response is ready; streamed bodies are sent after that",
+    ["route"],
+)
+http_in_flight = Gauge("vanui_http_requests_in_flight", "Requests being handled")
+
+
+def request_route():
+    # The rule, not the path, so file names don't each become a series
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    http_in_flight.inc()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get("request_started")
+    if started is not None:
+        route = request_route()
+        http_request_seconds.labels(route).observe(time.perf_counter() - started)
+        http_requests.labels(request.method, route, response.status_code).inc()
+    return response
+
+
+@app.teardown_request
+def end_request_metrics(exc):
+    if g.pop("request_started", None) is not None:
+        http_in_flight.dec()
+
+
+@app.before_request
+def start_profiling():
+    # The listing is sent with the same header, but isn't worth profiling
+    if not profiler.wants(request) or request.path.startswith("/debug/profiles"):
+        return
+    try:
+        g.profile = (profiler.start(), time.perf_counter())
+    except ValueError as e:
+        # cProfile allows one active profiler at a time on Python 3.12+
+        print(f"Not profiling {request.path}: {e}")
+
+
+@app.after_request
+def finish_profiling(response):
+    profile = g.pop("profile", None)
+    if profile is not None:
+        active, started = profile
+        response.headers["X-Profile-Name"] = profiler.finish(active, request, started)
+    return response
+
+
+def join_path(folder, name):
+    return f"{folder}/{name}" if folder else name
+
+
+def is_locked_for_session(path):
+    """Check if any locked folder protecting a sanitized path is not authenticated."""
+    locked = lock_store.locked_ancestors(path)
+    if not locked:
+        return False
+    authenticated_folders = set(session.get("authenticated_folders", []))
+    return not authenticated_folders.issuperset(locked)
+
+
+def is_trash_entry_locked_for_session(entry):
+    """
+    Check a trash entry against its path's locks and the ones it was deleted
+    with, which stay in force while it is in the trash though they've been
+    lifted from the path.
+    """
+    if is_locked_for_session(entry["path"]):
+        return True
+    authenticated_folders = set(session.get("authenticated_folders", []))
+    return not authenticated_folders.issuperset(entry["locks"])
+
+
+def invalidate_listings(folder, recursive=False):
+    """Invalidate a changed folder's listings and, for their sizes, its parents'."""
+    listing_cache.invalidate(folder, recursive=recursive)
+    for ancestor in ancestor_folders(folder)[:-1]:
+        listing_cache.invalidate(ancestor)
+
+
+def apply_tree_changes(folders, created, reset):
+    """
+    Catch caches up with changes seen on disk and tell connected clients.
+
+    Called from the watcher thread for every change in the uploads tree,
+    including the ones made through this app.
+    """
+    if reset:
+        listing_cache.invalidate("", recursive=True)
+        catalog.reconcile()
+    else:
+        for folder in folders:
+            invalidate_listings(folder)
+            catalog.reconcile_folder(folder)
+        for folder in created:
+            catalog.reconcile(folder)
+    event_hub.publish(folders | created, reset)
+
+
+watcher.on_change = apply_tree_changes
+
+
+def catalog_item(row):
+    """Turn a catalog row into the item shape used by listings."""
+    item = {
+        "name": row["name"],
+        "type": "folder" if row["kind"] == "folder" else "file",
+        "kind": row["kind"],
+        "path": row["path"],
+        "folder": row["folder"],
+        "modified": datetime.fromtimestamp(row["mtime"]).isoformat(),
+    }
+    if row["kind"] != "folder":
+        item["size"] = row["size"]
+    if row["captured_at"] is not None:
+        item["captured"] = datetime.fromtimestamp(row["captured_at"]).isoformat()
+    return item
+
+
+def locked_folders_for_session():
+    """Return the locked folders this session hasn't unlocked."""
+    authenticated_folders = set(session.get("authenticated_folders", []))
+    return load_locked_folders() - authenticated_folders
+
+
+# Device commands, shared by the HTTP routes and the control channel. Each
+# publishes the change so every connected client sees it.
+def toggle_inverter():
+    data = InverterToggle()
+    hardware_readings["inverter"].invalidate()
+    device_states.publish("inverter", {"on": data["on"]})
+    return data
+
+
+def inverter_status():
+    return hardware_readings["inverter"].get(timeout=HARDWARE_TIMEOUTS["inverter"])
+
+
+def toggle_fan():
+    FanToggle()
+    # The fan relay is only pulsed, so its state is just when that happened
+    device_states.publish("fan", {"toggled_at": time.time()})
+    return True
+
+
+control_channel = ControlChannel(
+    {
+        "inverter.toggle": toggle_inverter,
+        "inverter.status": inverter_status,
+        "fan.toggle": toggle_fan,
+    }
+)
+
 
 # API
 @app.route("/inverter/toggle", methods=["POST"])
 def toggleInverter():
-    data = InverterToggle()
-    return jsonify(data)
+    return jsonify(toggle_inverter())
 
 
 @app.route("/fan/toggle", methods=["POST"])
 def toggleFan():
-    FanToggle()
-    return jsonify(True)
+    return jsonify(toggle_fan())
+
+
+@sock.route("/control")
+def controlChannel(ws):
+    """
+    Device commands with acknowledgements, and state changes pushed as they
+    happen. Holds a request thread for as long as the client stays connected.
+    """
+    # Acks and events are small writes that often go out back to back;
+    # without this the second waits for the client's delayed ACK
+    ws.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    subscription = device_states.subscribe()
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            ws.send(json.dumps(message))
+
+    def push_states():
+        try:
+            while (changes := subscription.get()) is not None:
+                for device, state in changes.items():
+                    send({"type": "state", "device": device, "state": state})
+        except ConnectionClosed:
+            pass
+
+    pusher = threading.Thread(target=push_states, daemon=True)
+    try:
+        send({"type": "hello", "state": device_states.snapshot()})
+        pusher.start()
+        while True:
+            send(control_channel.handle(ws.receive()))
+    except ConnectionClosed:
+        pass
+    finally:
+        subscription.close()
 
 
 @app.route("/app/kill", methods=["POST"])
@@ -55,20 +388,65 @@ def killFrontend():
 
 @app.route("/inverter", methods=["GET"])
 def inverterRelayStatus():
-    return jsonify({"on": getInverterRelayStatus()})
+    return hardware_reading_response("inverter")
 
 
 @app.route("/smartshunt/data", methods=["GET"])
 def smartshunData():
-    data = Smartshunt()
-    json = jsonify(data)
-    return json
+    return hardware_reading_response("smartshunt")
 
 
 @app.route("/level_sensor/data", methods=["GET"])
 def levelsensorData():
-    data = LevelSensor()
-    return jsonify(data)
+    return hardware_reading_response("level_sensor")
+
+
+@app.route("/dashboard", methods=["GET"])
+def dashboardData():
+    """Every device's state in one request, with each reading's age."""
+    return jsonify(dashboard.collect())
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    text = default_registry.render()
+    if os.getenv("HARDWARE_SOCKET"):
+        # The hardware's own metrics are kept in the broker process
+        try:
+            text += hardware_metrics()
+        except Exception as e:
+            print(f"Could not collect hardware metrics: {e}")
+    return Response(text, content_type=CONTENT_TYPE)
+
+
+@app.route("/debug/profiles", methods=["GET"])
+def listProfiles():
+    if not profiler.authorized(request.headers.get(PROFILE_HEADER)):
+        return jsonify({"error": "A profiling token is required"}), 403
+    return jsonify(profiler.recent())
+
+
+@app.route("/debug/profiles/<name>", methods=["GET"])
+def getProfile(name):
+    if not profiler.authorized(request.headers.get(PROFILE_HEADER)):
+        return jsonify({"error": "A profiling token is required"}), 403
+    path = profiler.path_of(name)
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(path, as_attachment=True)
+
+
+@app.cli.command("profile-token")
+def profileToken():
+    """Print a token for the X-Profile header."""
+    print(profiler.token())
+
+
+@app.route("/hardware/cache", methods=["GET"])
+def hardwareCacheStats():
+    return jsonify(
+        {name: reading.counters for name, reading in hardware_readings.items()}
+    )
 
 
 # File Management API
@@ -86,18 +464,16 @@ def uploadFile():
             return jsonify({"error": "Invalid filename"}), 400
 
         # Get folder path from form data
-        folder_path = request.form.get("folder", "")
-        sanitized_folder = sanitize_path(folder_path)
-        if sanitized_folder is None:
+        folder = resolve(request.form.get("folder", ""))
+        if folder is None:
             return jsonify({"error": "Invalid folder path"}), 400
+        sanitized_folder = folder.relative
 
-        # Get full path for the folder
-        folder_full_path = get_full_path(sanitized_folder)
-        if folder_full_path is None:
-            return jsonify({"error": "Invalid folder path"}), 400
+        if is_locked_for_session(sanitized_folder):
+            return jsonify({"error": "Folder is locked", "locked": True}), 403
 
         # Ensure folder exists
-        os.makedirs(folder_full_path, exist_ok=True)
+        folder.makedirs()
 
         # Check file size
         file.seek(0, os.SEEK_END)
@@ -113,14 +489,129 @@ def uploadFile():
                 ),
                 400,
             )
+        quota_store.check(sanitized_folder, file_size, upload_manager.pending_bytes)
 
-        # Save file
-        file_path = os.path.join(folder_full_path, file.filename)
-        file.save(file_path)
+        # Save through a temp file; entries may share data with other uploads
+        upload_manager.save(file.stream, folder.fd(), file.filename)
+        invalidate_listings(sanitized_folder)
+        catalog.add(join_path(sanitized_folder, file.filename))
 
         return jsonify(
             {"success": True, "filename": file.filename, "path": sanitized_folder}
         )
+    except UploadError as e:
+        return jsonify({"error": str(e), **e.extra}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Chunked, resumable uploads: init, append chunks at offsets, then commit
+@app.route("/files/uploads", methods=["POST"])
+def createUpload():
+    try:
+        data = request.get_json()
+        if not data or "filename" not in data or "size" not in data:
+            return jsonify({"error": "Filename and size required"}), 400
+
+        filename = data["filename"]
+        if not is_safe_filename(filename):
+            return jsonify({"error": "Invalid filename"}), 400
+
+        folder = resolve(data.get("folder", ""))
+        if folder is None:
+            return jsonify({"error": "Invalid folder path"}), 400
+        sanitized_folder = folder.relative
+
+        if is_locked_for_session(sanitized_folder):
+            return jsonify({"error": "Folder is locked", "locked": True}), 403
+
+        try:
+            size = int(data["size"])
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid size"}), 400
+        # Refuse before anything is written rather than part way through
+        quota_store.check(sanitized_folder, size, upload_manager.pending_bytes)
+        folder.makedirs()
+        upload = upload_manager.create(
+            sanitized_folder,
+            folder.fd(),
+            filename,
+            size,
+            sha256=data.get("sha256"),
+        )
+        return jsonify(upload.status()), 201
+    except UploadError as e:
+        return jsonify({"error": str(e), **e.extra}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/files/uploads/<upload_id>", methods=["GET"])
+def uploadStatus(upload_id):
+    try:
+        return jsonify(upload_manager.get(upload_id).status())
+    except UploadError as e:
+        return jsonify({"error": str(e), **e.extra}), e.status
+
+
+@app.route("/files/uploads/<upload_id>", methods=["PATCH"])
+def appendUpload(upload_id):
+    try:
+        upload = upload_manager.get(upload_id)
+        offset = request.args.get("offset", type=int)
+        if offset is None:
+            return jsonify({"error": "Offset required"}), 400
+
+        new_offset = upload_manager.append(
+            upload, offset, request.stream, request.content_length
+        )
+        return jsonify({"offset": new_offset, "size": upload.size})
+    except UploadError as e:
+        return jsonify({"error": str(e), **e.extra}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/files/uploads/<upload_id>/proof", methods=["POST"])
+def proveUpload(upload_id):
+    """Skip sending a stored file by sending the range the server asked for."""
+    try:
+        upload = upload_manager.get(upload_id)
+        upload_manager.prove(upload, request.stream.read(PROOF_SIZE + 1))
+        return jsonify(upload.status())
+    except UploadError as e:
+        return jsonify({"error": str(e), **e.extra}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/files/uploads/<upload_id>/commit", methods=["POST"])
+def commitUpload(upload_id):
+    try:
+        upload = upload_manager.get(upload_id)
+        # Checked against the folder the upload started in, which may have
+        # been moved or deleted since
+        folder = resolve(upload.folder)
+        folder_fd = folder.fd() if folder is not None and folder.is_dir() else None
+        upload_manager.commit(upload, folder_fd)
+        invalidate_listings(upload.folder)
+        catalog.add(join_path(upload.folder, upload.filename))
+        return jsonify(
+            {"success": True, "filename": upload.filename, "path": upload.folder}
+        )
+    except UploadError as e:
+        return jsonify({"error": str(e), **e.extra}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/files/uploads/<upload_id>", methods=["DELETE"])
+def abortUpload(upload_id):
+    try:
+        upload_manager.abort(upload_manager.get(upload_id))
+        return jsonify({"success": True})
+    except UploadError as e:
+        return jsonify({"error": str(e), **e.extra}), e.status
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -128,61 +619,236 @@ def uploadFile():
 @app.route("/files/list", methods=["GET"])
 def listFiles():
     try:
-        path = request.args.get("path", "")
-        sanitized_path = sanitize_path(path)
-        if sanitized_path is None:
+        target = resolve(request.args.get("path", ""))
+        if target is None:
             return jsonify({"error": "Invalid path"}), 400
+        sanitized_path = target.relative
 
         # Check if current folder is locked and user is not authenticated
-        if sanitized_path and is_folder_locked(sanitized_path):
-            authenticated_folders = set(session.get("authenticated_folders", []))
-            if sanitized_path not in authenticated_folders:
-                return jsonify({"error": "Folder is locked", "locked": True}), 403
+        if is_locked_for_session(sanitized_path):
+            return jsonify({"error": "Folder is locked", "locked": True}), 403
+
+        sort = request.args.get("sort", "name")
+        descending = request.args.get("order", "asc") == "desc"
+        cursor = request.args.get("cursor")
+        limit = request.args.get("limit", type=int)
+        if limit is not None and limit < 1:
+            return jsonify({"error": "Invalid limit"}), 400
+
+        try:
+            tag, last_modified = listing_cache.validator(sanitized_path, target.fd())
+        except (FileNotFoundError, NotADirectoryError):
+            return jsonify([])
 
-        full_path = get_full_path(sanitized_path)
-        if full_path is None:
+        # The ETag is one stat away, so unchanged folders are never scanned
+        key = (sanitized_path, sort, descending, cursor, limit)
+        etag = f"{tag}-{zlib.crc32(repr(key).encode()):x}"
+        if not is_resource_modified(
+            request.environ, etag=etag, last_modified=last_modified
+        ):
+            response = app.response_class(status=304)
+        else:
+            payload = listing_cache.get(key, tag)
+            if payload is None:
+                try:
+                    items, next_cursor = list_folder(
+                        target.fd(),
+                        sanitized_path,
+                        sort=sort,
+                        descending=descending,
+                        cursor=cursor,
+                        limit=limit,
+                    )
+                except ValueError as e:
+                    return jsonify({"error": str(e)}), 400
+
+                # Folder sizes come from the catalog's running totals
+                folders = [i["path"] for i in items if i["type"] == "folder"]
+                totals = catalog.usage(folders)
+                for item in items:
+                    if item["type"] == "folder":
+                        item["size"], item["files"] = totals[item["path"]]
+
+                # Unpaginated requests keep returning a plain array
+                if limit is None:
+                    payload = items
+                else:
+                    payload = {"items": items, "next_cursor": next_cursor}
+                listing_cache.put(key, tag, payload, len(items))
+            response = json_response(payload)
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/files/search", methods=["GET"])
+def searchFiles():
+    try:
+        query = request.args.get("q", "").strip()
+        prefix = request.args.get("prefix", "false") == "true"
+        sort = request.args.get("sort", "name")
+        if sort not in SEARCH_SORTS:
+            return jsonify({"error": "Invalid sort"}), 400
+        descending = request.args.get("order", "asc") == "desc"
+        limit = min(request.args.get("limit", 100, type=int), 500)
+        offset = request.args.get("offset", 0, type=int)
+        if limit < 1 or offset < 0:
+            return jsonify({"error": "Invalid limit or offset"}), 400
+
+        sanitized_path = sanitize_path(request.args.get("path", ""))
+        if sanitized_path is None:
             return jsonify({"error": "Invalid path"}), 400
+        if is_locked_for_session(sanitized_path):
+            return jsonify({"error": "Folder is locked", "locked": True}), 403
+
+        # Hide the contents of every locked folder this session hasn't unlocked
+        excluded = locked_folders_for_session()
+
+        rows = catalog.search(
+            query,
+            prefix=prefix,
+            folder=sanitized_path,
+            kind=request.args.get("type") or None,
+            sort=sort,
+            descending=descending,
+            limit=limit,
+            offset=offset,
+            excluded_folders=excluded,
+        )
+        items = [catalog_item(row) for row in rows]
+        return json_response({"items": items, "offset": offset, "limit": limit})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        if not os.path.exists(full_path):
-            return jsonify([])
+
+@app.route("/files/slideshow", methods=["GET"])
+def slideshowFeed():
+    try:
+        order = request.args.get("order", "name")
+        if order not in ("name", "captured"):
+            return jsonify({"error": "Invalid order"}), 400
+        recursive = request.args.get("recursive", "false") == "true"
+        limit = min(request.args.get("limit", 20, type=int), 100)
+        offset = request.args.get("offset", 0, type=int)
+        if limit < 1 or offset < 0:
+            return jsonify({"error": "Invalid limit or offset"}), 400
+        preload = max(
+            0, min(request.args.get("preload", SLIDESHOW_PRELOAD, type=int), limit)
+        )
+        width = snap_width(request.args.get("w", 1920, type=int))
+
+        sanitized_path = sanitize_path(request.args.get("path", ""))
+        if sanitized_path is None:
+            return jsonify({"error": "Invalid path"}), 400
+        if is_locked_for_session(sanitized_path):
+            return jsonify({"error": "Folder is locked", "locked": True}), 403
+
+        # One extra row tells whether there is another page
+        rows = catalog.search(
+            folder=sanitized_path,
+            recursive=recursive,
+            kind="image",
+            sort=order,
+            limit=limit + 1,
+            offset=offset,
+            excluded_folders=locked_folders_for_session(),
+        )
+        next_offset = offset + limit if len(rows) > limit else None
+        rows = rows[:limit]
 
         items = []
-        for item in os.listdir(full_path):
-            # Filter out the locked folders configuration file
-            if item == ".locked_folders.json":
-                continue
-
-            item_path = os.path.join(full_path, item)
-            relative_path = (
-                os.path.join(sanitized_path, item) if sanitized_path else item
+        for row in rows:
+            item = catalog_item(row)
+            item["src"] = f"/files/thumb/{quote(row['path'])}?w={width}"
+            items.append(item)
+
+        # Render the first slides now so they are cached by the time the
+        # browser asks. Image requests advertise WebP in every current
+        # browser, unlike this fetch, so warm the format they will get.
+        fmt = "webp" if supports_webp() else "jpeg"
+        for row in rows[:preload]:
+            if can_thumbnail(row["name"]):
+                try:
+                    target = resolve(row["path"])
+                    if target is None:
+                        continue
+                    thumbnail_cache.prefetch(
+                        target.full_path, width, fmt, open_source=target.open_file
+                    )
+                except OSError:
+                    # Gone since it was indexed
+                    continue
+
+        response = json_response(
+            {
+                "items": items,
+                "offset": offset,
+                "limit": limit,
+                "next_offset": next_offset,
+                "width": width,
+            }
+        )
+        if preload:
+            response.headers["Link"] = ", ".join(
+                f"<{item['src']}>; rel=preload; as=image" for item in items[:preload]
             )
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-            if os.path.isdir(item_path):
-                folder_locked = is_folder_locked(relative_path)
-                items.append(
-                    {
-                        "name": item,
-                        "type": "folder",
-                        "path": relative_path,
-                        "locked": folder_locked,
-                    }
-                )
+
+@app.route("/files/archive", methods=["GET"])
+def archiveFiles():
+    try:
+        paths = request.args.getlist("path")
+        if not paths:
+            return jsonify({"error": "Path required"}), 400
+
+        # The body is generated after the request ends, so the archive owns
+        # these descriptors instead of the request
+        selection = []
+        streaming = False
+        try:
+            for path in paths:
+                target = resolve_path(path)
+                if target is None:
+                    return jsonify({"error": "Invalid path"}), 400
+                selection.append(target)
+                if is_locked_for_session(target.relative):
+                    return jsonify({"error": "Folder is locked", "locked": True}), 403
+                if not target.exists():
+                    return jsonify({"error": "Path not found"}), 404
+
+            if len(selection) == 1:
+                name = os.path.basename(selection[0].full_path)
+                download_name = f"{os.path.splitext(name)[0] or name}.zip"
             else:
-                stat = os.stat(item_path)
-                items.append(
-                    {
-                        "name": item,
-                        "type": "file",
-                        "size": stat.st_size,
-                        "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                        "path": relative_path,
-                    }
-                )
+                download_name = "files.zip"
 
-        # Sort: folders first, then files, both alphabetically
-        items.sort(key=lambda x: (x["type"] != "folder", x["name"].lower()))
+            # Locked folders inside the selection are left out, not refused
+            entries = walk_selection(selection, locked_folders_for_session())
 
-        return jsonify(items)
+            def generate():
+                try:
+                    yield from stream_zip(entries)
+                finally:
+                    for target in selection:
+                        target.close()
+
+            response = Response(generate(), mimetype="application/zip")
+            response.headers["Content-Disposition"] = (
+                f"attachment; filename*=UTF-8''{quote(download_name)}"
+            )
+            streaming = True
+            return response
+        finally:
+            if not streaming:
+                for target in selection:
+                    target.close()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -190,21 +856,62 @@ def listFiles():
 @app.route("/files/view/<path:filepath>", methods=["GET"])
 def viewFile(filepath):
     try:
-        sanitized_path = sanitize_path(filepath)
-        if sanitized_path is None:
+        target = resolve(filepath)
+        if target is None:
             return jsonify({"error": "Invalid path"}), 400
 
-        full_path = get_full_path(sanitized_path)
-        if full_path is None:
-            return jsonify({"error": "Invalid path"}), 400
+        if is_locked_for_session(target.relative):
+            return jsonify({"error": "Folder is locked", "locked": True}), 403
 
-        if not os.path.exists(full_path):
+        if not target.exists():
             return jsonify({"error": "File not found"}), 404
 
-        if os.path.isdir(full_path):
+        if target.is_dir():
             return jsonify({"error": "Path is a directory"}), 400
 
-        return send_file(full_path)
+        return send_media(target.full_path, request, target.open_file())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/files/thumb/<path:filepath>", methods=["GET"])
+def thumbnailFile(filepath):
+    try:
+        target = resolve(filepath)
+        if target is None:
+            return jsonify({"error": "Invalid path"}), 400
+
+        if is_locked_for_session(target.relative):
+            return jsonify({"error": "Folder is locked", "locked": True}), 403
+
+        if not target.is_file():
+            return jsonify({"error": "File not found"}), 404
+
+        # Formats Pillow can't handle (or no Pillow at all) get the original
+        full_path = target.full_path
+        if not can_thumbnail(full_path):
+            return send_media(full_path, request, target.open_file())
+
+        width = snap_width(request.args.get("w", 256, type=int))
+        accepts_webp = request.accept_mimetypes["image/webp"] > 0
+        fmt = "webp" if accepts_webp and supports_webp() else "jpeg"
+        try:
+            thumb = thumbnail_cache.open(
+                full_path, width, fmt, open_source=target.open_file
+            )
+        except Exception as e:
+            print(f"Thumbnail failed for {target.relative}: {e}")
+            return send_media(full_path, request, target.open_file())
+
+        # The name hashes the source's path, mtime and size with the variant
+        response = send_file(
+            thumb,
+            mimetype=THUMBNAIL_MIMETYPES[fmt],
+            etag=os.path.basename(thumb.name),
+            last_modified=os.fstat(thumb.fileno()).st_mtime,
+        )
+        response.vary.add("Accept")
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -221,28 +928,23 @@ def createFolder():
             return jsonify({"error": "Invalid folder name"}), 400
 
         current_path = data.get("path", "")
-        sanitized_path = sanitize_path(current_path)
-        if sanitized_path is None:
+        if sanitize_path(current_path) is None:
             return jsonify({"error": "Invalid path"}), 400
 
-        # Create full path for new folder
-        if sanitized_path:
-            new_folder_path = sanitized_path + "/" + folder_name
-        else:
-            new_folder_path = folder_name
-
-        sanitized_new_path = sanitize_path(new_folder_path)
-        if sanitized_new_path is None:
+        target = resolve(join_path(current_path, folder_name))
+        if target is None:
             return jsonify({"error": "Invalid folder path"}), 400
 
-        full_path = get_full_path(sanitized_new_path)
-        if full_path is None:
-            return jsonify({"error": "Invalid folder path"}), 400
+        sanitized_path = parent_folder(target.relative)
+        if is_locked_for_session(sanitized_path):
+            return jsonify({"error": "Folder is locked", "locked": True}), 403
 
         # Create folder
-        os.makedirs(full_path, exist_ok=True)
+        target.makedirs()
+        invalidate_listings(sanitized_path)
+        catalog.add(target.relative)
 
-        return jsonify({"success": True, "path": sanitized_new_path})
+        return jsonify({"success": True, "path": target.relative})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -254,33 +956,189 @@ def deleteFile():
         if not data or "path" not in data:
             return jsonify({"error": "Path required"}), 400
 
-        path = data["path"]
-        sanitized_path = sanitize_path(path)
-        if sanitized_path is None:
+        target = resolve(data["path"])
+        if target is None or not target.relative:
             return jsonify({"error": "Invalid path"}), 400
+        sanitized_path = target.relative
 
         # Check if folder is locked
-        if is_folder_locked(sanitized_path):
-            authenticated_folders = set(session.get("authenticated_folders", []))
-            if sanitized_path not in authenticated_folders:
-                return jsonify({"error": "Folder is locked"}), 403
+        if is_locked_for_session(sanitized_path):
+            return jsonify({"error": "Folder is locked"}), 403
 
-        full_path = get_full_path(sanitized_path)
-        if full_path is None:
+        if not target.exists():
+            return jsonify({"error": "Path not found"}), 404
+
+        # Move it to the trash; the data is removed in the background once
+        # the undo window has passed
+        is_folder = target.is_dir()
+        locks = []
+        if is_folder:
+            prefix = f"{sanitized_path}/"
+            locks = [
+                f
+                for f in lock_store.folders()
+                if f == sanitized_path or f.startswith(prefix)
+            ]
+        entry = trash.trash(target, locks)
+        del entry["locks"]
+        if is_folder:
+            # Also unlock it and any locked folders inside it
+            unlock_folder(sanitized_path, recursive=True)
+            listing_cache.invalidate(sanitized_path, recursive=True)
+        invalidate_listings(parent_folder(sanitized_path))
+        catalog.remove(sanitized_path)
+
+        return jsonify({"success": True, "trash": entry})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/files/trash", methods=["GET"])
+def listTrash():
+    try:
+        entries = [
+            entry
+            for entry in trash.entries()
+            if not is_trash_entry_locked_for_session(entry)
+        ]
+        for entry in entries:
+            # Which folders inside were locked is private
+            del entry["locks"]
+        return jsonify(entries)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/files/trash/<entry_id>/restore", methods=["POST"])
+def restoreFromTrash(entry_id):
+    try:
+        entry = trash.get(entry_id)
+        sanitized_path = entry["path"]
+        if is_trash_entry_locked_for_session(entry):
+            return jsonify({"error": "Folder is locked", "locked": True}), 403
+
+        # The folder it was in may have been deleted since
+        target = resolve(sanitized_path, create_parents=True)
+        if target is None:
             return jsonify({"error": "Invalid path"}), 400
 
-        if not os.path.exists(full_path):
-            return jsonify({"error": "Path not found"}), 404
+        # Locked before the data is back, so it's never reachable unlocked
+        added_locks = set(entry["locks"]) - lock_store.folders()
+        for folder in entry["locks"]:
+            lock_folder(folder)
+        try:
+            trash.restore(entry_id, target)
+        except Exception:
+            for folder in added_locks:
+                unlock_folder(folder)
+            raise
+        invalidate_listings(parent_folder(sanitized_path))
+        catalog.add(sanitized_path)
+
+        return jsonify({"success": True, "path": sanitized_path})
+    except TrashError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        # Delete file or folder
-        if os.path.isdir(full_path):
-            shutil.rmtree(full_path)
-            # Also unlock if it was locked
-            unlock_folder(sanitized_path)
-        else:
-            os.remove(full_path)
 
-        return jsonify({"success": True})
+@app.route("/files/events", methods=["GET"])
+def folderEvents():
+    """
+    Server-sent events naming folders whose contents changed. Holds a request
+    thread for as long as the client stays subscribed.
+    """
+    # Sessions are only readable while handling the request, not in the stream
+    excluded = locked_folders_for_session()
+
+    def is_hidden(folder):
+        return any(
+            folder == locked or folder.startswith(f"{locked}/") for locked in excluded
+        )
+
+    subscription = event_hub.subscribe()
+
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                changes = subscription.get(timeout=EVENTS_KEEPALIVE)
+                if changes is None:
+                    # Also how a dropped connection is noticed
+                    yield ": keepalive\n\n"
+                    continue
+                folders, reset = changes
+                if reset:
+                    yield "event: reset\ndata: {}\n\n"
+                    continue
+                folders = sorted(f for f in folders if not is_hidden(f))
+                if folders:
+                    payload = json.dumps({"folders": folders})
+                    yield f"event: change\ndata: {payload}\n\n"
+        finally:
+            subscription.close()
+
+    response = Response(generate(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Keep reverse proxies from holding events back
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/files/storage", methods=["GET"])
+def storageStats():
+    try:
+        return jsonify(blob_store.stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/files/usage", methods=["GET"])
+def folderUsage():
+    try:
+        sanitized_path = sanitize_path(request.args.get("path", ""))
+        if sanitized_path is None:
+            return jsonify({"error": "Invalid path"}), 400
+
+        if is_locked_for_session(sanitized_path):
+            return jsonify({"error": "Folder is locked", "locked": True}), 403
+
+        size, files = catalog.usage([sanitized_path])[sanitized_path]
+        disk = shutil.disk_usage(UPLOAD_DIR)
+        return jsonify(
+            {
+                "path": sanitized_path,
+                "size": size,
+                "files": files,
+                "quota": quota_store.quotas().get(sanitized_path),
+                "disk_free": disk.free,
+                "disk_total": disk.total,
+            }
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/files/quota", methods=["POST"])
+def setFolderQuota():
+    try:
+        data = request.get_json()
+        if not data or "path" not in data:
+            return jsonify({"error": "Path required"}), 400
+
+        sanitized_path = sanitize_path(data["path"])
+        if sanitized_path is None:
+            return jsonify({"error": "Invalid path"}), 400
+
+        if is_locked_for_session(sanitized_path):
+            return jsonify({"error": "Folder is locked", "locked": True}), 403
+
+        quota = data.get("quota")
+        if quota is not None and (not isinstance(quota, int) or quota < 0):
+            return jsonify({"error": "Quota must be a number of bytes"}), 400
+
+        quota_store.set(sanitized_path, quota)
+        return jsonify({"success": True, "path": sanitized_path, "quota": quota})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -298,8 +1156,9 @@ def authenticateFolder():
         if sanitized_path is None:
             return jsonify({"error": "Invalid path"}), 400
 
-        # Check if folder is locked
-        if not is_folder_locked(sanitized_path):
+        # Check if folder is locked, either itself or through a parent
+        locked_folders = lock_store.locked_ancestors(sanitized_path)
+        if not locked_folders:
             return jsonify({"error": "Folder is not locked"}), 400
 
         # Validate password
@@ -312,7 +1171,7 @@ def authenticateFolder():
 
         # Add to authenticated folders in session
         authenticated_folders = set(session.get("authenticated_folders", []))
-        authenticated_folders.add(sanitized_path)
+        authenticated_folders.update(locked_folders)
         session["authenticated_folders"] = list(authenticated_folders)
 
         return jsonify({"success": True})
@@ -327,17 +1186,17 @@ def lockFolder():
         if not data or "path" not in data:
             return jsonify({"error": "Path required"}), 400
 
-        path = data["path"]
-        sanitized_path = sanitize_path(path)
-        if sanitized_path is None:
+        target = resolve(data["path"])
+        if target is None:
             return jsonify({"error": "Invalid path"}), 400
+        sanitized_path = target.relative
 
         # Verify it's a folder
-        full_path = get_full_path(sanitized_path)
-        if full_path is None or not os.path.isdir(full_path):
+        if not target.is_dir():
             return jsonify({"error": "Path is not a folder"}), 400
 
         lock_folder(sanitized_path)
+        listing_cache.invalidate(parent_folder(sanitized_path))
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -361,6 +1220,7 @@ def unlockFolder():
             return jsonify({"error": "Not authenticated"}), 403
 
         unlock_folder(sanitized_path)
+        listing_cache.invalidate(parent_folder(sanitized_path))
         # Remove from authenticated folders
         authenticated_folders.discard(sanitized_path)
         session["authenticated_folders"] = list(authenticated_folders)
@@ -373,13 +1233,28 @@ def unlockFolder():
 # Frontend
 @app.route("/")
 def index():
-    return send_from_directory(app.static_folder, "index.html")
+    return static_proxy("index.html")
 
 
 @app.route("/<path:path>")
 def static_proxy(path):
-    return send_from_directory(app.static_folder, path)
+    response = static_assets.send(request, path)
+    if response is None:
+        abort(404)
+    return response
+
+
+def start_background_services():
+    """Start the threads that keep the catalog, trash and watcher going."""
+    upload_manager.sweep_async()
+    catalog.start_reconciler()
+    trash.start_reaper()
+    watcher.start()
 
 
 if __name__ == "__main__":
+    # With debug on, this process only watches for code changes and the
+    # reloader serves from a child process, which gets WERKZEUG_RUN_MAIN
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
     app.run(host="0.0.0.0", port=5000, debug=True)
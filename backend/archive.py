@@ -0,0 +1,195 @@
+import errno
+import os
+import time
+import zipfile
+from stat import S_ISDIR, S_ISREG
+
+from files import is_internal_name
+
+# Bytes read from disk per write into the archive
+ARCHIVE_BLOCK_SIZE = 256 * 1024
+# Formats that are already compressed; deflating them again only burns CPU
+STORED_EXTENSIONS = (
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".gif",
+    ".webp",
+    ".heic",
+    ".mp4",
+    ".mov",
+    ".m4v",
+    ".webm",
+    ".mkv",
+    ".mp3",
+    ".m4a",
+    ".aac",
+    ".ogg",
+    ".flac",
+    ".zip",
+    ".gz",
+    ".7z",
+    ".pdf",
+)
+
+
+class _StreamBuffer:
+    """Write-only, unseekable sink that holds output until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _zip_info(arcname, stat):
+    # ZIP timestamps can't go before 1980
+    date_time = time.localtime(max(stat.st_mtime, 315532800))[:6]
+    info = zipfile.ZipInfo(arcname, date_time)
+    info.external_attr = (stat.st_mode & 0xFFFF) << 16
+    return info
+
+
+def _unique_name(name, used):
+    if name not in used:
+        used.add(name)
+        return name
+    base, ext = os.path.splitext(name)
+    n = 2
+    while f"{base} ({n}){ext}" in used:
+        n += 1
+    name = f"{base} ({n}){ext}"
+    used.add(name)
+    return name
+
+
+def _is_regular(name, dir_fd, want_dir):
+    try:
+        mode = os.stat(name, dir_fd=dir_fd, follow_symlinks=False).st_mode
+    except FileNotFoundError:
+        return False
+    return S_ISDIR(mode) if want_dir else S_ISREG(mode)
+
+
+def walk_selection(selection, excluded_folders=()):
+    """
+    Expand selected files and folders into archive entries.
+
+    Folders are walked lazily with os.fwalk, so every entry is reached
+    through a directory descriptor and symlinks are never followed (they
+    are left out). Internal files and any folder in excluded_folders (with
+    everything below it) are skipped. An entry's dir_fd is only valid until
+    the next entry is requested.
+
+    Args:
+        selection: list of ResolvedPath
+        excluded_folders: relative folder paths to leave out
+
+    Yields:
+        (arcname, dir_fd, name, is_dir)
+    """
+    used = set()
+    for target in selection:
+        top = _unique_name(os.path.basename(target.full_path), used)
+        if not target.is_dir():
+            if target.is_file():
+                yield top, target.dir_fd, target.name, False
+            continue
+        if target.relative in excluded_folders:
+            continue
+
+        yield f"{top}/", target.dir_fd, target.name, True
+        walk = os.fwalk(target.name, dir_fd=target.dir_fd)
+        for root, dirs, files, root_fd in walk:
+            relative_root = os.path.relpath(root, target.name)
+            prefix = top if relative_root == "." else f"{top}/{relative_root}"
+            folder = target.relative
+            if relative_root != ".":
+                folder = f"{folder}/{relative_root}" if folder else relative_root
+
+            kept = []
+            for name in sorted(dirs):
+                child = f"{folder}/{name}" if folder else name
+                if is_internal_name(name) or child in excluded_folders:
+                    continue
+                if not _is_regular(name, root_fd, want_dir=True):
+                    continue
+                kept.append(name)
+                yield f"{prefix}/{name}/", root_fd, name, True
+            dirs[:] = kept
+
+            for name in sorted(files):
+                if is_internal_name(name) or not _is_regular(name, root_fd, False):
+                    continue
+                yield f"{prefix}/{name}", root_fd, name, False
+
+
+def stream_zip(entries):
+    """
+    Generate a ZIP archive chunk by chunk.
+
+    Nothing is buffered beyond one block: each file is copied into the
+    archive ARCHIVE_BLOCK_SIZE bytes at a time and the output is yielded as
+    it is produced. Already-compressed formats are stored as-is, the rest
+    deflated. Files that vanish or turn into symlinks while the archive is
+    being built are skipped.
+
+    Args:
+        entries: iterable of (arcname, dir_fd, name, is_dir), see walk_selection
+
+    Yields:
+        bytes
+    """
+    sink = _StreamBuffer()
+    with zipfile.ZipFile(sink, "w", allowZip64=True) as zf:
+        for arcname, dir_fd, name, is_dir in entries:
+            try:
+                if is_dir:
+                    stat = os.stat(name, dir_fd=dir_fd, follow_symlinks=False)
+                    zf.writestr(_zip_info(arcname, stat), b"")
+                else:
+                    yield from _write_file(zf, sink, arcname, dir_fd, name)
+            except OSError as e:
+                # Gone, or swapped for a symlink, since it was listed
+                if e.errno not in (errno.ENOENT, errno.ELOOP):
+                    raise
+                continue
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+def _write_file(zf, sink, arcname, dir_fd, name):
+    fd = os.open(name, os.O_RDONLY | os.O_NOFOLLOW | os.O_CLOEXEC, dir_fd=dir_fd)
+    with os.fdopen(fd, "rb") as src:
+        stat = os.fstat(src.fileno())
+        info = _zip_info(arcname, stat)
+        info.file_size = stat.st_size
+        if arcname.lower().endswith(STORED_EXTENSIONS):
+            info.compress_type = zipfile.ZIP_STORED
+        else:
+            info.compress_type = zipfile.ZIP_DEFLATED
+
+        with zf.open(info, "w") as dest:
+            # Stop at the size in the header even if the file grows meanwhile
+            remaining = stat.st_size
+            while remaining > 0:
+                block = src.read(min(ARCHIVE_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                dest.write(block)
+                data = sink.drain()
+                if data:
+                    yield data
@@ -0,0 +1 @@
+"""Performance benchmarks for backend hot paths. Run from the backend directory."""
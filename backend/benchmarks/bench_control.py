@@ -0,0 +1,124 @@
+"""
+Command round trip over the /control WebSocket vs HTTP, with the hardware
+mocked, plus how long the state change takes to reach a second client.
+
+Usage (from backend/):
+    python -m benchmarks.bench_control [--server app|serve] [--commands 500]
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+
+import numpy as np
+import requests
+import simple_websocket
+
+from benchmarks.loadtest import PORT, SERVERS, wait_for_port
+
+BASE_URL = f"http://127.0.0.1:{PORT}"
+CONTROL_URL = f"ws://127.0.0.1:{PORT}/control"
+
+
+def http_new_connection():
+    """What voice/command_executor.py used to do for every command."""
+    requests.post(f"{BASE_URL}/inverter/toggle").json()
+
+
+def make_http_session():
+    session = requests.Session()
+    return lambda: session.post(f"{BASE_URL}/inverter/toggle").json()
+
+
+def make_control():
+    # Not waiting for the hello: simple-websocket's client only sees a message
+    # that came with the handshake reply once more data arrives
+    ws = simple_websocket.Client.connect(CONTROL_URL)
+    ids = iter(range(1, 1 << 62))
+
+    def command():
+        request_id = next(ids)
+        ws.send(json.dumps({"id": request_id, "command": "inverter.toggle"}))
+        while True:
+            message = json.loads(ws.receive())
+            if message["type"] == "ack" and message["id"] == request_id:
+                return message
+
+    return command, ws
+
+
+def time_calls(function, count):
+    function()  # warm up
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1e3
+
+
+def time_fan_out(command, count):
+    """Milliseconds from sending a command until another client sees its event."""
+    watcher = simple_websocket.Client.connect(CONTROL_URL)
+    seen = threading.Event()
+
+    def watch():
+        try:
+            while True:
+                if json.loads(watcher.receive())["type"] == "state":
+                    seen.set()
+        except simple_websocket.ConnectionClosed:
+            pass
+
+    threading.Thread(target=watch, daemon=True).start()
+    timings = []
+    for _ in range(count):
+        seen.clear()
+        start = time.perf_counter()
+        command()
+        seen.wait(5)
+        timings.append(time.perf_counter() - start)
+    watcher.close()
+    return np.array(timings) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--server", choices=SERVERS, default="app")
+    parser.add_argument("--commands", type=int, default=500)
+    args = parser.parse_args()
+
+    env = dict(os.environ, GPIOZERO_PIN_FACTORY="mock")
+    # Own session, so the dev server's reloader child goes down with it
+    process = subprocess.Popen(
+        SERVERS[args.server],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        wait_for_port()
+        command, ws = make_control()
+        results = {
+            "HTTP, new connection": time_calls(http_new_connection, args.commands),
+            "HTTP, kept alive": time_calls(make_http_session(), args.commands),
+            "/control": time_calls(command, args.commands),
+            "/control event to 2nd client": time_fan_out(command, args.commands),
+        }
+        ws.close()
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+    for name, timings in results.items():
+        p50, p99 = np.percentile(timings, [50, 99])
+        print(f"{name:30} p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
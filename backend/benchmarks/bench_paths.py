@@ -0,0 +1,89 @@
+"""
+Per-request cost of resolving a file path: string paths checked with
+os.path versus a ResolvedPath walked with openat from a root descriptor.
+
+Each iteration does what /files/view does before streaming: resolve the
+path, check it exists and isn't a folder, open it and close it.
+
+Usage (from backend/):
+    python -m benchmarks.bench_paths [--depth 4] [--iterations 20000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from files import resolve_path, sanitize_path
+
+
+def string_path(root, path):
+    """The checks endpoints did before ResolvedPath."""
+    sanitized = sanitize_path(path)
+    full_path = os.path.normpath(os.path.join(root, sanitized))
+    if not full_path.startswith(os.path.normpath(root)):
+        return
+    if not os.path.exists(full_path) or os.path.isdir(full_path):
+        return
+    with open(full_path, "rb"):
+        pass
+
+
+def resolved_path(root_fd, path):
+    with resolve_path(path, root_fd=root_fd) as target:
+        if not target.exists() or target.is_dir():
+            return
+        with target.open_file():
+            pass
+
+
+def measure(fn, iterations):
+    for _ in range(200):
+        fn()  # warm up
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        folder = "/".join(f"folder{i}" for i in range(args.depth))
+        path = f"{folder}/photo.jpg" if folder else "photo.jpg"
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+        with open(os.path.join(root, path), "wb") as f:
+            f.write(b"x" * 1024)
+        root_fd = os.open(root, os.O_RDONLY | os.O_DIRECTORY)
+
+        try:
+            results = {
+                "string path": measure(
+                    lambda: string_path(root, path), args.iterations
+                ),
+                "resolved path": measure(
+                    lambda: resolved_path(root_fd, path), args.iterations
+                ),
+            }
+        finally:
+            os.close(root_fd)
+
+    print(f"path:          {path}")
+    for name, timings in results.items():
+        print(
+            f"{name + ':':<15}mean {timings.mean():.1f} us, "
+            f"p50 {np.percentile(timings, 50):.1f} us, "
+            f"p99 {np.percentile(timings, 99):.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
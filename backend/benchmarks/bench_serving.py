@@ -0,0 +1,95 @@
+"""
+Throughput and tail latency of the Flask dev server vs serve.py under
+concurrent clients, with the hardware mocked.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serving [--requests 400] [--concurrency 16]
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+PORT = 5000  # app.py always binds the dev server here
+PATHS = ["/smartshunt/data", "/inverter", "/files/list?path="]
+
+SERVERS = {
+    "dev server": [sys.executable, "app.py", "-m", "true"],
+    "serve.py": [
+        sys.executable,
+        "serve.py",
+        "--bind",
+        f"127.0.0.1:{PORT}",
+        "-m",
+        "true",
+    ],
+}
+
+
+def wait_for_port(timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", PORT), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"Nothing listening on port {PORT}")
+
+
+def fetch(path):
+    start = time.perf_counter()
+    with urllib.request.urlopen(f"http://127.0.0.1:{PORT}{path}") as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def run(command, requests, concurrency):
+    env = dict(os.environ, GPIOZERO_PIN_FACTORY="mock")
+    # Own session, so the dev server's reloader child goes down with it
+    process = subprocess.Popen(
+        command,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        wait_for_port()
+        paths = [PATHS[i % len(PATHS)] for i in range(requests)]
+        for path in PATHS:
+            fetch(path)  # warm up
+        with ThreadPoolExecutor(concurrency) as pool:
+            start = time.perf_counter()
+            timings = list(pool.map(fetch, paths))
+            elapsed = time.perf_counter() - start
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+    return np.array(timings) * 1e3, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    for name, command in SERVERS.items():
+        timings, elapsed = run(command, args.requests, args.concurrency)
+        print(f"{name}:")
+        print(f"  throughput:  {len(timings) / elapsed:.0f} req/s")
+        print(f"  p50:         {np.percentile(timings, 50):.1f} ms")
+        print(f"  p99:         {np.percentile(timings, 99):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Per-frame cost of the audio-reactive spectrum analyzer.
+
+Usage (from backend/):
+    python -m benchmarks.bench_spectrum [--frames 2000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from voice.config import RATE
+from voice.spectrum import SpectrumAnalyzer
+
+BLOCK_SIZE = 512  # matches the RawInputStream blocksize in voiceApp.py
+
+
+def make_pcm(frames, rate=RATE):
+    """Chirp plus noise, so every band sees some energy."""
+    t = np.arange(frames * BLOCK_SIZE) / rate
+    chirp = np.sin(2 * np.pi * (60 + 4000 * t / t[-1]) * t)
+    noise = np.random.default_rng(0).normal(0, 0.1, len(t))
+    samples = ((chirp + noise) * 8000).astype(np.int16).tobytes()
+    step = BLOCK_SIZE * 2
+    return [samples[i : i + step] for i in range(0, len(samples), step)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=2000)
+    args = parser.parse_args()
+
+    analyzer = SpectrumAnalyzer()
+    blocks = make_pcm(args.frames)
+    for block in blocks[:50]:
+        analyzer.process(block)  # warm up
+
+    timings = []
+    for block in blocks:
+        start = time.perf_counter()
+        analyzer.process(block)
+        timings.append(time.perf_counter() - start)
+
+    timings = np.array(timings) * 1e6
+    budget_us = BLOCK_SIZE / RATE * 1e6
+    print(f"frames:        {len(timings)}")
+    print(f"frame rate:    {RATE / BLOCK_SIZE:.1f} FPS")
+    print(f"mean:          {timings.mean():.1f} us")
+    print(f"p50:           {np.percentile(timings, 50):.1f} us")
+    print(f"p99:           {np.percentile(timings, 99):.1f} us")
+    print(f"budget used:   {timings.mean() / budget_us * 100:.2f}% of one core")
+
+
+if __name__ == "__main__":
+    main()
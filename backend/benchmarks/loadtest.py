@@ -0,0 +1,487 @@
+"""
+Load test with a realistic mix of clients, to find how many the server can
+sustain before latency or errors get out of hand.
+
+Clients:
+    kiosk   polls /dashboard like the wall display
+    phone   browses a photo folder (listing + thumbnails), opens photos and
+            uploads new ones
+    voice   asks for device status like voice/command_executor.py, and
+            toggles the inverter and fan relays when the hardware is mocked
+            or --allow-toggles is given
+
+Kiosks and phones also hold the connections the UI keeps open for as long
+as they run: the /control WebSocket, and on phones the /files/events
+stream of the file manager. Each ties up a server thread, so they count
+against serve.py's pool like they would with real screens.
+
+Each step runs the mix multiplied by the step's factor for --duration
+seconds and reports throughput, error rate and p50/p95/p99 per route. A step
+passes if p99 stays under --slo-ms and errors under 1%. Think times are
+randomised around the values below; --think-scale shrinks them to push
+harder with fewer threads.
+
+By default the server is started here with the hardware mocked and its
+uploads and cache in a temporary folder. Pass --url to test one that is
+already running (e.g. serve.py on the Pi): its real relays are only toggled
+with --allow-toggles, and test files go in a loadtest/ folder of its uploads
+directory, which is moved to the trash afterwards.
+
+Usage (from backend/):
+    python -m benchmarks.loadtest [--server app|serve] [--url URL]
+        [--allow-toggles]
+        [--kiosks 2] [--phones 3] [--voice 1] [--steps 1,2,4,8]
+        [--duration 20] [--think-scale 1.0] [--slo-ms 500]
+"""
+
+import argparse
+import io
+import os
+import random
+import shutil
+import signal
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import requests
+import simple_websocket
+from PIL import Image
+
+PORT = 5000  # app.py always binds the dev server here
+LOADTEST_FOLDER = "loadtest"
+SEED_FOLDER = f"{LOADTEST_FOLDER}/photos"
+REQUEST_TIMEOUT = 10
+EVENTS_KEEPALIVE = 30  # how often app.py writes to an idle event stream
+# Share of failed requests that fails a step
+MAX_ERROR_RATE = 0.01
+
+# Mean seconds between a client's actions
+KIOSK_INTERVAL = 15  # the frontend's dashboard polling interval
+PHONE_THINK = 3
+VOICE_INTERVAL = 20
+
+SERVERS = {
+    "app": [sys.executable, "app.py", "-m", "true"],
+    "serve": [sys.executable, "serve.py", "--bind", f"127.0.0.1:{PORT}", "-m", "true"],
+}
+
+
+def make_photo(seed, size=(1600, 1200)):
+    """A JPEG of noise, about as hard to compress and thumbnail as a photo."""
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, (size[1] // 8, size[0] // 8, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels).resize(size)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route, seconds, ok):
+        with self._lock:
+            self.timings[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+
+def websocket_url(base_url):
+    return "ws" + base_url[len("http") :]
+
+
+class Client(threading.Thread):
+    # Whether the page this client stands for keeps these connections open
+    CONTROL = False
+    EVENTS = False
+
+    def __init__(self, base_url, stats, stop, think_scale, index):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.stats = stats
+        self.stop = stop
+        self.think_scale = think_scale
+        self.index = index
+        self.session = requests.Session()
+        self.session.verify = False
+        self.random = random.Random(f"{type(self).__name__}-{index}")
+
+    def think(self, mean):
+        """Wait about mean seconds; False once the step is over."""
+        delay = mean * self.think_scale * self.random.uniform(0.5, 1.5)
+        return not self.stop.wait(delay)
+
+    def request(self, route, method, path, **kwargs):
+        """Timed request; route is the name it's reported under."""
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, self.base_url + path, timeout=REQUEST_TIMEOUT, **kwargs
+            )
+            response.content
+        except requests.RequestException:
+            response = None
+        ok = response is not None and response.status_code < 400
+        self.stats.record(route, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    def open_control(self):
+        """The /control WebSocket every page of the UI holds."""
+        start = time.perf_counter()
+        context = None
+        if self.base_url.startswith("https"):
+            context = ssl._create_unverified_context()
+        try:
+            ws = simple_websocket.Client.connect(
+                websocket_url(self.base_url) + "/control", ssl_context=context
+            )
+        except (simple_websocket.ConnectionError, OSError):
+            ws = None
+        # The handshake is answered from the request thread, so this is how
+        # long the connection waited for one. The hello isn't waited for:
+        # the client library only sees messages that arrive with the
+        # handshake reply once more data comes in.
+        self.stats.record("WS /control", time.perf_counter() - start, ws is not None)
+        if ws is None:
+            return None
+        # Pushed state changes are read off the socket by the client's own
+        # thread, so nothing backs up on the server
+        return ws.close
+
+    def open_events(self):
+        """The /files/events stream the file manager holds."""
+        start = time.perf_counter()
+        try:
+            response = requests.get(
+                self.base_url + "/files/events",
+                stream=True,
+                verify=False,
+                timeout=(REQUEST_TIMEOUT, EVENTS_KEEPALIVE + REQUEST_TIMEOUT),
+            )
+            response.raw.read(1)  # the retry: line is sent straight away
+        except requests.RequestException:
+            response = None
+        ok = response is not None and response.status_code == 200
+        self.stats.record("GET /files/events", time.perf_counter() - start, ok)
+        if response is None:
+            return None
+
+        def drain():
+            try:
+                for _ in response.iter_content(chunk_size=None):
+                    pass
+            except Exception:
+                pass
+
+        threading.Thread(target=drain, daemon=True).start()
+        return response.close
+
+    def run(self):
+        connections = []
+        if self.CONTROL:
+            connections.append(self.open_control())
+        if self.EVENTS:
+            connections.append(self.open_events())
+        try:
+            # Clients start spread out rather than all at once
+            while self.think(1) and self.step() is not False:
+                pass
+        finally:
+            for close in connections:
+                if close is not None:
+                    close()
+
+    def step(self):
+        raise NotImplementedError
+
+
+class Kiosk(Client):
+    CONTROL = True
+
+    def step(self):
+        self.request("GET /dashboard", "GET", "/dashboard")
+        self.think(KIOSK_INTERVAL - 1)
+
+
+class Phone(Client):
+    CONTROL = True
+    EVENTS = True
+
+    def __init__(self, *args, photo=None):
+        super().__init__(*args)
+        self.photo = photo
+        self.photos = []
+        self.etags = {}
+        self.uploads = 0
+
+    def browse(self):
+        path = f"/files/list?path={SEED_FOLDER}&limit=60"
+        headers = {}
+        if path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+        response = self.request("GET /files/list", "GET", path, headers=headers)
+        if response is None:
+            return
+        if response.status_code == 200:
+            self.etags[path] = response.headers.get("ETag")
+            self.photos = [
+                item["path"]
+                for item in response.json()["items"]
+                if item["type"] == "file"
+            ]
+        # The grid loads the thumbnails in view
+        for photo in self.random.sample(self.photos, min(12, len(self.photos))):
+            self.request("GET /files/thumb", "GET", f"/files/thumb/{photo}?w=256")
+
+    def view(self):
+        if self.photos:
+            photo = self.random.choice(self.photos)
+            self.request("GET /files/view", "GET", f"/files/view/{photo}")
+
+    def upload(self):
+        self.uploads += 1
+        name = f"phone-{self.index}-{self.uploads}.jpg"
+        self.request(
+            "POST /files/upload",
+            "POST",
+            "/files/upload",
+            files={"file": (name, self.photo, "image/jpeg")},
+            data={"folder": f"{LOADTEST_FOLDER}/phone-{self.index}"},
+        )
+
+    def step(self):
+        action = self.random.choices(
+            [self.browse, self.view, self.upload], weights=[6, 3, 1]
+        )[0]
+        action()
+        self.think(PHONE_THINK - 1)
+
+
+class Voice(Client):
+    STATUS_COMMANDS = [
+        ("GET /inverter", "GET", "/inverter"),
+        ("GET /smartshunt/data", "GET", "/smartshunt/data"),
+    ]
+    # These switch real relays unless the hardware is mocked
+    TOGGLE_COMMANDS = [
+        ("POST /inverter/toggle", "POST", "/inverter/toggle"),
+        ("POST /fan/toggle", "POST", "/fan/toggle"),
+    ]
+
+    def __init__(self, *args, toggles=False):
+        super().__init__(*args)
+        self.commands = self.STATUS_COMMANDS
+        if toggles:
+            self.commands = self.commands + self.TOGGLE_COMMANDS
+
+    def step(self):
+        self.request(*self.random.choice(self.commands))
+        self.think(VOICE_INTERVAL - 1)
+
+
+def wait_for_port(timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", PORT), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"Nothing listening on port {PORT}")
+
+
+def seed(base_url, photos):
+    session = requests.Session()
+    session.verify = False
+    for i, photo in enumerate(photos):
+        response = session.post(
+            f"{base_url}/files/upload",
+            files={"file": (f"seed-{i:03d}.jpg", photo, "image/jpeg")},
+            data={"folder": SEED_FOLDER},
+            timeout=REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+
+
+def clean_up(base_url):
+    requests.delete(
+        f"{base_url}/files/delete",
+        json={"path": LOADTEST_FOLDER},
+        verify=False,
+        timeout=REQUEST_TIMEOUT,
+    )
+
+
+def run_step(base_url, counts, duration, think_scale, photo, toggles):
+    stats = Stats()
+    stop = threading.Event()
+    clients = []
+    for kind, count in counts.items():
+        for index in range(count):
+            args = (base_url, stats, stop, think_scale, index)
+            if kind is Phone:
+                clients.append(Phone(*args, photo=photo))
+            elif kind is Voice:
+                clients.append(Voice(*args, toggles=toggles))
+            else:
+                clients.append(kind(*args))
+
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    stop.wait(duration)
+    stop.set()
+    for client in clients:
+        client.join(REQUEST_TIMEOUT)
+    return stats, time.perf_counter() - start
+
+
+def connections(counts):
+    """How many long-lived connections a mix of clients holds."""
+    return sum(count * (kind.CONTROL + kind.EVENTS) for kind, count in counts.items())
+
+
+def report(stats, elapsed, slo_ms):
+    """Print the step's results; returns whether it met the SLO."""
+    total = sum(len(t) for t in stats.timings.values())
+    errors = sum(stats.errors.values())
+    all_timings = np.array([t for ts in stats.timings.values() for t in ts]) * 1e3
+    print(f"  throughput:  {total / elapsed:.1f} req/s ({total} requests)")
+    print(f"  errors:      {errors} ({errors / max(total, 1):.1%})")
+    print(f"  {'route':24} {'count':>6} {'errors':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for route in sorted(stats.timings):
+        timings = np.array(stats.timings[route]) * 1e3
+        p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+        print(
+            f"  {route:24} {len(timings):6} {stats.errors[route]:6}"
+            f" {p50:6.1f}ms {p95:6.1f}ms {p99:6.1f}ms"
+        )
+    if not total:
+        return False
+    p99 = np.percentile(all_timings, 99)
+    return p99 <= slo_ms and errors / total <= MAX_ERROR_RATE
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--server", choices=SERVERS, default="app")
+    parser.add_argument("--url", help="Test this running server instead")
+    parser.add_argument(
+        "--allow-toggles",
+        action="store_true",
+        help="Let voice clients toggle the relays of the server at --url",
+    )
+    parser.add_argument("--kiosks", type=int, default=2)
+    parser.add_argument("--phones", type=int, default=3)
+    parser.add_argument("--voice", type=int, default=1)
+    parser.add_argument(
+        "--steps", default="1,2,4,8", help="Client count multipliers to run"
+    )
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--think-scale", type=float, default=1.0)
+    parser.add_argument("--slo-ms", type=float, default=500)
+    parser.add_argument("--seed-photos", type=int, default=40)
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    process = None
+    data_dir = None
+    base_url = args.url
+    toggles = args.allow_toggles
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{PORT}"
+        toggles = True  # mocked
+        data_dir = tempfile.mkdtemp(prefix="vanui-loadtest-")
+        upload_dir = os.path.join(data_dir, "uploads")
+        os.mkdir(upload_dir)
+        env = dict(
+            os.environ,
+            GPIOZERO_PIN_FACTORY="mock",
+            VAN_UI_UPLOAD_DIR=upload_dir,
+            VAN_UI_CACHE_DIR=os.path.join(data_dir, "cache"),
+        )
+        # Own session, so the dev server's reloader child goes down with it
+        process = subprocess.Popen(
+            SERVERS[args.server],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    else:
+        print(
+            f"Loading the live server at {base_url}: test files go in"
+            f" {LOADTEST_FOLDER}/ of its uploads and are then moved to the trash",
+            file=sys.stderr,
+        )
+        if toggles:
+            print("Voice clients WILL toggle its inverter and fan", file=sys.stderr)
+        else:
+            print(
+                "Voice clients only read status; pass --allow-toggles to"
+                " switch its relays too",
+                file=sys.stderr,
+            )
+        print(file=sys.stderr)
+    base_url = base_url.rstrip("/")
+
+    try:
+        if process is not None:
+            wait_for_port()
+        photos = [make_photo(i) for i in range(min(args.seed_photos, 8))]
+        seed(base_url, [photos[i % len(photos)] for i in range(args.seed_photos)])
+
+        sustained = None
+        for factor in [int(step) for step in args.steps.split(",")]:
+            counts = {
+                Kiosk: args.kiosks * factor,
+                Phone: args.phones * factor,
+                Voice: args.voice * factor,
+            }
+            print(
+                f"x{factor}: {counts[Kiosk]} kiosks, {counts[Phone]} phones,"
+                f" {counts[Voice]} voice clients for {args.duration:.0f}s,"
+                f" holding {connections(counts)} connections open"
+            )
+            stats, elapsed = run_step(
+                base_url, counts, args.duration, args.think_scale, photos[0], toggles
+            )
+            ok = report(stats, elapsed, args.slo_ms)
+            print(f"  {'within' if ok else 'OVER'} SLO\n")
+            if not ok:
+                break
+            sustained = factor
+
+        if sustained is None:
+            print("The first step already missed the SLO")
+        else:
+            print(
+                f"Sustained x{sustained}: {args.kiosks * sustained} kiosks,"
+                f" {args.phones * sustained} phones, {args.voice * sustained} voice"
+            )
+    finally:
+        try:
+            clean_up(base_url)
+        except requests.RequestException:
+            pass
+        if process is not None:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait()
+        if data_dir is not None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Benchmark suite for the backend hot paths, compared against a saved baseline.
+
+Each case is timed as the median per-call time over several rounds. With
+--save the results become the baseline; otherwise they are compared with it
+and the run fails (exit status 1) if any case got slower than the baseline
+by more than the tolerance. Baselines are per machine, so by default they
+are kept in benchmarks/baselines/<hostname>.json.
+
+Usage (from backend/):
+    python -m benchmarks.suite [--save] [--baseline PATH] [--tolerance 0.5]
+        [--quick] [--only PATTERN]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+from files import LockStore, get_full_path, list_folder, resolve_path, sanitize_path
+from vedirect import read_frame
+from voice.commands import match_command
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+NUM_LEDS = 288  # the van's strip
+NUM_BANDS = 16
+
+# Recorded from the SmartShunt: a history block and a main block, each
+# ended by its Checksum field
+SMARTSHUNT_STREAM = (
+    b"\r\nH1\t-102056\r\nH2\t-5960\r\nH3\t-102056\r\nH4\t12\r\nH5\t0\r\nH6\t-8125047"
+    b"\r\nH7\t11867\r\nH8\t14520\r\nH9\t61433\r\nH10\t0\r\nH11\t0\r\nH12\t0"
+    b"\r\nH15\t0\r\nH16\t0\r\nH17\t1027\r\nH18\t1280\r\nChecksum\t9"
+    b"\r\nPID\t0xA389\r\nV\t12920\r\nI\t-590\r\nP\t-8\r\nCE\t-1156\r\nSOC\t920"
+    b"\r\nTTG\t4540\r\nAlarm\tOFF\r\nAR\t0\r\nBMV\tSmartShunt 500A/50mV"
+    b"\r\nFW\t0413\r\nMON\t0\r\nChecksum\tZ"
+)
+
+
+def make_tree(root, entries, folder_every=10):
+    """A folder with entries children, every folder_every-th one a folder."""
+    os.makedirs(root, exist_ok=True)
+    for i in range(entries):
+        path = os.path.join(root, f"entry-{i:06d}")
+        if i % folder_every == 0:
+            os.mkdir(path)
+        else:
+            open(path + ".jpg", "w").close()
+
+
+def make_locks(directory, count):
+    """A LockStore with count locks spread over a three-level tree."""
+    path = os.path.join(directory, f"locks-{count}.json")
+    folders = [f"trip-{i % 50}/day-{i % 31}/set-{i}" for i in range(count)]
+    with open(path, "w") as f:
+        json.dump(folders, f)
+    store = LockStore(path)
+    store.folders()  # load once so cases time lookups, not parsing
+    return store
+
+
+def build_cases(workdir, stack, quick=False, only=None):
+    """
+    Case name -> (function taking no arguments, calls per round).
+
+    Only the fixtures of cases matching the only regex are built. Open files
+    are closed when stack (a contextlib.ExitStack) exits.
+    """
+
+    def wanted(*names):
+        return not only or any(re.search(only, name) for name in names)
+
+    cases = {
+        "sanitize_path": (
+            lambda: sanitize_path("Trips/2024%20Baja/day%203/IMG_0412.jpg"),
+            20000,
+        ),
+        "sanitize_path_traversal": (
+            lambda: sanitize_path("Trips/../../etc/passwd"),
+            20000,
+        ),
+        "get_full_path": (
+            lambda: get_full_path("Trips/2024 Baja/day 3/IMG_0412.jpg"),
+            20000,
+        ),
+    }
+
+    if wanted("resolve_path"):
+        tree = os.path.join(workdir, "tree")
+        os.makedirs(os.path.join(tree, "a", "b", "c"))
+        open(os.path.join(tree, "a", "b", "c", "file.jpg"), "w").close()
+        root_fd = os.open(tree, os.O_RDONLY | os.O_DIRECTORY)
+        stack.callback(os.close, root_fd)
+
+        def resolve():
+            with resolve_path("a/b/c/file.jpg", root_fd=root_fd) as target:
+                target.exists()
+
+        cases["resolve_path"] = (resolve, 5000)
+
+    for entries in (10_000,) if quick else (10_000, 100_000):
+        label = f"{entries // 1000}k"
+        names = [f"list_folder_{label}", f"list_folder_{label}_page_by_modified"]
+        if not wanted(*names):
+            continue
+        folder = os.path.join(workdir, f"list-{entries}")
+        make_tree(folder, entries)
+        calls = 1 if entries >= 100_000 else 3
+        cases[names[0]] = (lambda folder=folder: list_folder(folder), calls)
+        cases[names[1]] = (
+            lambda folder=folder: list_folder(folder, sort="modified", limit=100),
+            calls,
+        )
+
+    for count in (1_000, 10_000):
+        label = f"{count // 1000}k"
+        names = [f"locked_ancestors_{label}", f"is_locked_miss_{label}"]
+        if not wanted(*names):
+            continue
+        store = make_locks(workdir, count)
+        cases[names[0]] = (
+            lambda store=store: store.locked_ancestors("trip-7/day-7/set-7/photos"),
+            20000,
+        )
+        cases[names[1]] = (
+            lambda store=store: store.is_locked("trip-7/day-8/set-999999"),
+            20000,
+        )
+
+    cases["smartshunt_frame"] = (
+        lambda: read_frame(io.BytesIO(SMARTSHUNT_STREAM).readline),
+        5000,
+    )
+
+    if wanted("led_rainbow_frame", "led_audio_frame"):
+        # numpy is only installed on the Pi, so only these cases need it
+        import numpy as np
+
+        from led_frames import audio_frame, audio_palette, rainbow_frame
+
+        frame = [(0, 0, 0)] * NUM_LEDS
+        band_index, base = audio_palette(NUM_LEDS, NUM_BANDS)
+        levels = np.linspace(0, 1, NUM_BANDS, dtype=np.float32)
+        cases["led_rainbow_frame"] = (lambda: rainbow_frame(frame, NUM_LEDS, 42), 500)
+        cases["led_audio_frame"] = (
+            lambda: audio_frame(frame, band_index, base, levels),
+            500,
+        )
+
+    cases["command_exact"] = (lambda: match_command("toggle inverter"), 20000)
+    cases["command_fuzzy"] = (lambda: match_command("toggle the inverte"), 200)
+    cases["command_miss"] = (lambda: match_command("what's the weather like"), 200)
+    return {
+        name: case for name, case in cases.items() if not only or re.search(only, name)
+    }
+
+
+def time_case(function, calls, rounds):
+    """Median and 95th percentile of the per-call time over rounds, in us."""
+    function()  # warm up
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        timings.append((time.perf_counter() - start) / calls * 1e6)
+    p95 = timings[0]
+    if len(timings) > 1:
+        p95 = statistics.quantiles(timings, n=20, method="inclusive")[18]
+    return {
+        "median_us": round(statistics.median(timings), 3),
+        "p95_us": round(p95, 3),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns:
+        list of (case, baseline median, current median) for every case
+        slower than its baseline by more than tolerance (0.5 = 50%)
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["median_us"] > before["median_us"] * (1 + tolerance):
+            regressions.append((name, before["median_us"], result["median_us"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--save", action="store_true", help="Write the baseline")
+    parser.add_argument(
+        "--baseline",
+        default=os.path.join(BASELINE_DIR, f"{socket.gethostname()}.json"),
+    )
+    # Run-to-run noise on a busy Pi is up to ~25%, so only flag clear slowdowns
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument(
+        "--quick", action="store_true", help="Skip the 100k-entry listing"
+    )
+    parser.add_argument("--only", help="Regex of case names to run")
+    args = parser.parse_args()
+
+    baseline = {}
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["cases"]
+    except FileNotFoundError:
+        if not args.save:
+            print(f"No baseline at {args.baseline}; run with --save to create one")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, contextlib.ExitStack() as stack:
+        cases = build_cases(workdir, stack, quick=args.quick, only=args.only)
+        for name, (function, calls) in cases.items():
+            results[name] = time_case(function, calls, args.rounds)
+            result = results[name]
+            line = f"{name:40} {result['median_us']:12.2f} us"
+            if name in baseline:
+                change = result["median_us"] / baseline[name]["median_us"] - 1
+                line += f"  {change:+7.1%}"
+            print(line)
+
+    if args.save:
+        # With --only, the other cases keep their saved times
+        cases = {**baseline, **results} if args.only else results
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {
+                    "host": socket.gethostname(),
+                    "machine": platform.machine(),
+                    "python": platform.python_version(),
+                    "saved": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "cases": cases,
+                },
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for name, before, after in regressions:
+        print(f"REGRESSION {name}: {before:.2f} us -> {after:.2f} us")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
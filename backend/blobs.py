@@ -0,0 +1,195 @@
+import errno
+import os
+import threading
+import uuid
+
+from files import UPLOAD_DIR
+
+BLOB_DIR = os.path.join(UPLOAD_DIR, ".vanui-blobs")
+LINK_TEMP_PREFIX = ".vanui-link-"
+# Errors meaning the filesystem can't hardlink (e.g. exFAT SD cards)
+NO_LINK_ERRNOS = (errno.EPERM, errno.EXDEV, errno.ENOTSUP, errno.EMLINK)
+HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+def is_valid_digest(digest):
+    """Check for a lowercase hex SHA-256 digest."""
+    return (
+        isinstance(digest, str) and len(digest) == 64 and set(digest) <= HEX_DIGITS
+    )
+
+
+class BlobStore:
+    """
+    Content-addressed storage for uploaded files.
+
+    Every stored file is a blob named by its SHA-256 under BLOB_DIR, and
+    each folder entry is a hardlink to it, so identical uploads share one
+    copy on disk. The inode link count is the reference count: deleting an
+    entry just drops a link, and blobs left with a single link (their own)
+    are removed by collect(). On filesystems without hardlinks uploads fall
+    back to plain files.
+    """
+
+    def __init__(self, root=BLOB_DIR):
+        self.root = root
+        self.enabled = True
+        self._collect_lock = threading.Lock()
+        self._collect_again = False
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def _place(self, blob_path, name, dir_fd):
+        """Atomically point name at the blob, replacing any existing entry."""
+        tmp_name = f"{LINK_TEMP_PREFIX}{uuid.uuid4().hex}"
+        os.link(blob_path, tmp_name, dst_dir_fd=dir_fd)
+        try:
+            os.replace(tmp_name, name, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+        except BaseException:
+            os.unlink(tmp_name, dir_fd=dir_fd)
+            raise
+
+    def has(self, digest, size):
+        """Check if content with this digest and size is stored already."""
+        if not self.enabled or not is_valid_digest(digest):
+            return False
+        try:
+            return os.stat(self.path(digest)).st_size == size
+        except FileNotFoundError:
+            return False
+
+    def read(self, digest, size, offset, length):
+        """
+        Bytes of a stored blob, to check a client really has the content.
+
+        Returns:
+            bytes, or None if there is no blob with this digest and size
+        """
+        if not self.has(digest, size):
+            return None
+        try:
+            with open(self.path(digest), "rb") as f:
+                f.seek(offset)
+                return f.read(length)
+        except FileNotFoundError:
+            return None
+
+    def link_existing(self, digest, size, name, dir_fd):
+        """
+        Create name in the folder open as dir_fd from an already stored blob.
+
+        Returns:
+            bool: False if there is no blob with this digest and size
+        """
+        if not self.has(digest, size):
+            return False
+        try:
+            self._place(self.path(digest), name, dir_fd)
+        except FileNotFoundError:
+            # Collected in the meantime
+            return False
+        return True
+
+    def commit(self, temp_name, name, digest, dir_fd):
+        """
+        Rename a completely written temp file to name, both in dir_fd.
+
+        New content becomes a blob; if the blob already exists the temp file
+        is dropped and name links to the stored copy instead.
+        """
+        if self.enabled:
+            blob_path = self.path(digest)
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            try:
+                os.link(temp_name, blob_path, src_dir_fd=dir_fd)
+            except FileExistsError:
+                try:
+                    self._place(blob_path, name, dir_fd)
+                    os.unlink(temp_name, dir_fd=dir_fd)
+                    return
+                except FileNotFoundError:
+                    pass
+            except OSError as e:
+                if e.errno not in NO_LINK_ERRNOS:
+                    raise
+                print(f"Hardlinks unsupported, storing uploads without dedup: {e}")
+                self.enabled = False
+        os.replace(temp_name, name, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+
+    def _blobs(self):
+        try:
+            prefixes = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return
+        for prefix in prefixes:
+            if not prefix.is_dir(follow_symlinks=False):
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.is_file(follow_symlinks=False):
+                    yield entry
+
+    def collect(self):
+        """Remove blobs no folder entry links to anymore. Returns bytes freed."""
+        freed = 0
+        for entry in self._blobs():
+            try:
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_nlink == 1:
+                    os.remove(entry.path)
+                    freed += stat.st_size
+            except FileNotFoundError:
+                continue
+        return freed
+
+    def collect_async(self):
+        """Run collect() in the background, coalescing calls made while it runs."""
+        if not self._collect_lock.acquire(blocking=False):
+            self._collect_again = True
+            return
+
+        def run():
+            try:
+                while True:
+                    self._collect_again = False
+                    self.collect()
+                    if not self._collect_again:
+                        break
+            except Exception as e:
+                print(f"Blob collection failed: {e}")
+            finally:
+                self._collect_lock.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stats(self):
+        """
+        Summarize storage use.
+
+        Returns:
+            dict: blob count, bytes on disk, bytes as seen through folder
+                entries, bytes saved by dedup and bytes awaiting collection
+        """
+        blobs = stored = logical = unreferenced = 0
+        for entry in self._blobs():
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            references = stat.st_nlink - 1
+            blobs += 1
+            stored += stat.st_size
+            logical += stat.st_size * references
+            if references == 0:
+                unreferenced += stat.st_size
+        return {
+            "enabled": self.enabled,
+            "blobs": blobs,
+            "stored_bytes": stored,
+            "logical_bytes": logical,
+            "saved_bytes": logical - (stored - unreferenced),
+            "unreferenced_bytes": unreferenced,
+        }
+
+
+blob_store = BlobStore()
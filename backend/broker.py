@@ -0,0 +1,165 @@
+"""
+Hardware broker: one process owns the GPIO pins, the SmartShunt serial port
+and the I2C level sensor, and API workers call into it over a local socket,
+so they never open /dev/ttyUSB0 or claim pins themselves.
+
+serve.py starts the broker and points workers at it by setting
+HARDWARE_SOCKET; app.py then imports the functions below instead of the
+hardware package.
+"""
+
+import os
+import threading
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+HARDWARE_SOCKET = os.getenv("HARDWARE_SOCKET")
+# Seconds to wait for a reply; a SmartShunt frame can take a couple of seconds
+BROKER_TIMEOUT = 10
+
+
+class HardwareError(Exception):
+    pass
+
+
+def _broker_key():
+    # serve.py generates one per run and passes it on through the environment
+    return os.environ["HARDWARE_BROKER_KEY"].encode()
+
+
+def _commands():
+    import hardware
+    from metrics import default_registry
+
+    # Calls on the same bus are serialized; different buses run in parallel
+    return {
+        "metrics": (default_registry.render, "metrics"),
+        "inverter_toggle": (hardware.InverterToggle, "gpio"),
+        "inverter_status": (hardware.getInverterRelayStatus, "gpio"),
+        "fan_toggle": (hardware.FanToggle, "gpio"),
+        "smartshunt": (hardware.Smartshunt, "serial"),
+        "level_sensor": (hardware.LevelSensor, "i2c"),
+    }
+
+
+def _handle(conn, commands, locks):
+    with conn:
+        while True:
+            try:
+                name = conn.recv()
+            except (EOFError, OSError):
+                return
+            command = commands.get(name)
+            if command is None:
+                conn.send((False, f"Unknown command: {name}"))
+                continue
+            function, bus = command
+            try:
+                with locks[bus]:
+                    result = function()
+            except Exception as e:
+                conn.send((False, str(e)))
+            else:
+                conn.send((True, result))
+
+
+def serve(address, commands=None):
+    """
+    Run the broker until the process is killed.
+
+    Args:
+        address: path of the Unix socket to listen on
+        commands: name -> (function, bus); defaults to the hardware package
+    """
+    commands = commands or _commands()
+    locks = {bus: threading.Lock() for _, bus in commands.values()}
+    if os.path.exists(address):
+        os.unlink(address)
+
+    with Listener(address, "AF_UNIX", authkey=_broker_key()) as listener:
+        os.chmod(address, 0o600)
+        print(f"Hardware broker listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, OSError) as e:
+                print(f"Rejected hardware broker connection: {e}")
+                continue
+            threading.Thread(
+                target=_handle, args=(conn, commands, locks), daemon=True
+            ).start()
+
+
+class HardwareClient:
+    """
+    Calls commands on the broker.
+
+    Each thread keeps its own connection, so concurrent requests don't wait
+    on each other's round trips; the broker still serializes per bus. A
+    broken connection is reopened once before giving up.
+    """
+
+    def __init__(self, address=HARDWARE_SOCKET, timeout=BROKER_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, "AF_UNIX", authkey=_broker_key())
+            self._local.conn = conn
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def call(self, name):
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send(name)
+                if not conn.poll(self.timeout):
+                    # The reply would arrive out of step on this connection
+                    self._drop()
+                    raise HardwareError(f"Hardware broker timed out on {name}")
+                ok, result = conn.recv()
+                break
+            except (EOFError, OSError, AuthenticationError) as e:
+                self._drop()
+                if attempt:
+                    raise HardwareError(f"Hardware broker unavailable: {e}")
+        if not ok:
+            raise HardwareError(result)
+        return result
+
+
+hardware_client = HardwareClient()
+
+
+# Same names as the hardware package exports, for app.py
+def InverterToggle():
+    return hardware_client.call("inverter_toggle")
+
+
+def getInverterRelayStatus():
+    return hardware_client.call("inverter_status")
+
+
+def FanToggle():
+    return hardware_client.call("fan_toggle")
+
+
+def Smartshunt():
+    return hardware_client.call("smartshunt")
+
+
+def LevelSensor():
+    return hardware_client.call("level_sensor")
+
+
+def hardware_metrics():
+    """The broker's metrics, in the same text format as /metrics."""
+    return hardware_client.call("metrics")
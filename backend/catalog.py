@@ -0,0 +1,471 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from stat import S_ISDIR, S_ISREG
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from files import CACHE_DIR, UPLOAD_DIR, is_internal_name
+
+CATALOG_PATH = os.path.join(CACHE_DIR, "catalog.db")
+# Full reconciliation scan interval, in seconds
+RECONCILE_INTERVAL = 60 * 60
+SEARCH_SORTS = {
+    "name": "f.name",
+    "modified": "f.mtime",
+    "captured": "COALESCE(f.captured_at, f.mtime)",
+    "size": "f.size",
+}
+
+KIND_EXTENSIONS = {
+    "image": (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".svg", ".heic"),
+    "video": (".mp4", ".mov", ".m4v", ".webm", ".mkv", ".avi"),
+    "audio": (".mp3", ".m4a", ".wav", ".flac", ".ogg", ".aac"),
+    "document": (".pdf", ".txt", ".md", ".doc", ".docx", ".csv"),
+}
+EXIF_EXTENSIONS = (".jpg", ".jpeg", ".tif", ".tiff", ".webp", ".heic")
+EXIF_IFD = 0x8769
+EXIF_DATETIME_ORIGINAL = 36867
+EXIF_DATETIME = 306
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL COLLATE NOCASE,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    captured_at REAL
+);
+CREATE INDEX IF NOT EXISTS files_folder ON files(folder);
+CREATE INDEX IF NOT EXISTS files_name ON files(name);
+CREATE INDEX IF NOT EXISTS files_captured ON files(COALESCE(captured_at, mtime));
+CREATE TABLE IF NOT EXISTS usage (
+    folder TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL,
+    files INTEGER NOT NULL
+);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+    name, content='files', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS files_ai AFTER INSERT ON files BEGIN
+    INSERT INTO files_fts(rowid, name) VALUES (new.rowid, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS files_ad AFTER DELETE ON files BEGIN
+    INSERT INTO files_fts(files_fts, rowid, name)
+    VALUES ('delete', old.rowid, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS files_au AFTER UPDATE OF name ON files BEGIN
+    INSERT INTO files_fts(files_fts, rowid, name)
+    VALUES ('delete', old.rowid, old.name);
+    INSERT INTO files_fts(rowid, name) VALUES (new.rowid, new.name);
+END;
+"""
+
+
+def file_kind(name):
+    lowered = name.lower()
+    for kind, extensions in KIND_EXTENSIONS.items():
+        if lowered.endswith(extensions):
+            return kind
+    return "other"
+
+
+def read_capture_time(full_path):
+    """Return the EXIF capture time of an image as a timestamp, or None."""
+    if Image is None or not full_path.lower().endswith(EXIF_EXTENSIONS):
+        return None
+    try:
+        # Image.open only parses headers, so this doesn't decode the pixels
+        with Image.open(full_path) as img:
+            exif = img.getexif()
+            value = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(
+                EXIF_DATETIME
+            )
+        if not value:
+            return None
+        return datetime.strptime(value.strip("\x00 "), "%Y:%m:%d %H:%M:%S").timestamp()
+    except Exception:
+        return None
+
+
+def _split(path):
+    folder, _, name = path.rpartition("/")
+    return folder, name
+
+
+def ancestor_folders(folder):
+    """Return a folder and every folder above it, from the root ('') down."""
+    folders = [""]
+    parts = folder.split("/") if folder else []
+    for i in range(len(parts)):
+        folders.append("/".join(parts[: i + 1]))
+    return folders
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class Catalog:
+    """
+    SQLite index of everything under UPLOAD_DIR.
+
+    Upload and delete endpoints update it as they go; a background scan
+    reconciles it with the disk on startup and every RECONCILE_INTERVAL, so
+    changes made outside the API are picked up too. Filename search uses an
+    FTS5 trigram index (substring matches of three or more characters);
+    shorter queries and prefix searches fall back to the NOCASE name index.
+
+    Alongside the index it keeps recursive byte and file totals for every
+    folder, adjusted with each change so a folder's size is one lookup.
+    """
+
+    def __init__(self, db_path=CATALOG_PATH, root=UPLOAD_DIR):
+        self.db_path = db_path
+        self.root = root
+        self.fts = True
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._reconcile_thread = None
+        self._schema_ready = False
+
+    def _create_schema(self, db):
+        db.executescript(SCHEMA)
+        try:
+            db.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            print(f"Catalog: trigram search unavailable, using LIKE ({e})")
+            self.fts = False
+        self._schema_ready = True
+
+    def _db(self):
+        """Return this thread's connection, creating the database on first use."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            db = sqlite3.connect(self.db_path, timeout=5)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            with self._write_lock:
+                if not self._schema_ready:
+                    self._create_schema(db)
+            self._local.db = db
+        return db
+
+    def _row(self, path, full_path, stat=None, is_dir=None):
+        stat = stat or os.lstat(full_path)
+        folder, name = _split(path)
+        if is_dir is None:
+            is_dir = S_ISDIR(stat.st_mode)
+        kind = "folder" if is_dir else file_kind(name)
+        # Not through symlinks, which could point anywhere
+        captured = read_capture_time(full_path) if S_ISREG(stat.st_mode) else None
+        size = 0 if is_dir else stat.st_size
+        return (path, folder, name, kind, size, stat.st_mtime, captured)
+
+    def _apply_usage(self, db, deltas):
+        """Add per-folder (bytes, files) deltas to each folder and its ancestors."""
+        totals = {}
+        for folder, (size, count) in deltas.items():
+            for ancestor in ancestor_folders(folder):
+                current = totals.setdefault(ancestor, [0, 0])
+                current[0] += size
+                current[1] += count
+        db.executemany(
+            """
+            INSERT INTO usage (folder, bytes, files) VALUES (?, ?, ?)
+            ON CONFLICT(folder) DO UPDATE SET
+                bytes = bytes + excluded.bytes,
+                files = files + excluded.files
+            """,
+            [(folder, size, count) for folder, (size, count) in totals.items()],
+        )
+
+    def _upsert(self, db, rows):
+        deltas = {}
+        for path, folder, _, kind, size, _, _ in rows:
+            old = db.execute(
+                "SELECT size, kind FROM files WHERE path = ?", (path,)
+            ).fetchone()
+            delta = deltas.setdefault(folder, [0, 0])
+            if kind == "folder":
+                # A file replaced by a folder no longer counts
+                if old is not None and old["kind"] != "folder":
+                    delta[0] -= old["size"]
+                    delta[1] -= 1
+                continue
+            if old is None or old["kind"] == "folder":
+                delta[0] += size
+                delta[1] += 1
+            else:
+                delta[0] += size - old["size"]
+        if deltas:
+            self._apply_usage(db, deltas)
+
+        db.executemany(
+            """
+            INSERT INTO files (path, folder, name, kind, size, mtime, captured_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                kind = excluded.kind,
+                size = excluded.size,
+                mtime = excluded.mtime,
+                captured_at = excluded.captured_at
+            """,
+            rows,
+        )
+
+    def add(self, path):
+        """Record a file or folder (and everything below a folder) after a change."""
+        full_path = os.path.join(self.root, path)
+        rows = [self._row(path, full_path)]
+        if rows[0][3] == "folder":
+            rows.extend(self._walk(path, full_path))
+        with self._write_lock:
+            db = self._db()
+            with db:
+                self._upsert(db, rows)
+
+    def _delete_tree(self, db, path):
+        prefix = f"{path}/"
+        where = "(path = ? OR substr(path, 1, ?) = ?)"
+        params = (path, len(prefix), prefix)
+        removed = db.execute(
+            f"SELECT folder, SUM(size), COUNT(*) FROM files "
+            f"WHERE {where} AND kind != 'folder' GROUP BY folder",
+            params,
+        ).fetchall()
+        if removed:
+            self._apply_usage(
+                db, {folder: (-size, -count) for folder, size, count in removed}
+            )
+        db.execute(f"DELETE FROM files WHERE {where}", params)
+        db.execute(
+            "DELETE FROM usage WHERE folder = ? OR substr(folder, 1, ?) = ?", params
+        )
+
+    def rebuild_usage(self):
+        """Recompute all folder totals from the indexed files."""
+        with self._write_lock:
+            db = self._db()
+            with db:
+                rows = db.execute(
+                    "SELECT folder, SUM(size), COUNT(*) FROM files "
+                    "WHERE kind != 'folder' GROUP BY folder"
+                ).fetchall()
+                db.execute("DELETE FROM usage")
+                self._apply_usage(
+                    db, {folder: (size, count) for folder, size, count in rows}
+                )
+
+    def usage(self, folders):
+        """
+        Look up recursive totals for folders.
+
+        Returns:
+            dict: folder -> (bytes, files), zeros for folders with no files
+        """
+        folders = list(folders)
+        totals = {folder: (0, 0) for folder in folders}
+        db = self._db()
+        # Stay well under SQLite's bound parameter limit
+        for i in range(0, len(folders), 500):
+            batch = folders[i : i + 500]
+            placeholders = ",".join("?" * len(batch))
+            for row in db.execute(
+                f"SELECT folder, bytes, files FROM usage "
+                f"WHERE folder IN ({placeholders})",
+                batch,
+            ):
+                totals[row["folder"]] = (row["bytes"], row["files"])
+        return totals
+
+    def remove(self, path):
+        """Forget a file or folder and everything below it."""
+        with self._write_lock:
+            db = self._db()
+            with db:
+                self._delete_tree(db, path)
+
+    def _walk(self, path, full_path):
+        rows = []
+        try:
+            entries = list(os.scandir(full_path))
+        except OSError:
+            return rows
+        for entry in entries:
+            if is_internal_name(entry.name):
+                continue
+            child = f"{path}/{entry.name}" if path else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                stat = entry.stat(follow_symlinks=False)
+                rows.append(self._row(child, entry.path, stat, is_dir))
+            except OSError:
+                continue
+            if is_dir:
+                rows.extend(self._walk(child, entry.path))
+        return rows
+
+    def reconcile_folder(self, folder):
+        """
+        Bring one folder's direct entries in line with the disk.
+
+        Returns:
+            list of subfolders that exist on disk, for recursive scans
+        """
+        full_path = os.path.join(self.root, folder) if folder else self.root
+        db = self._db()
+        # Held from the snapshot to the writes, so a change recorded by add()
+        # or remove() in between isn't undone from a stale view
+        with self._write_lock:
+            known = {
+                row["name"]: (row["size"], row["mtime"], row["kind"])
+                for row in db.execute(
+                    "SELECT name, size, mtime, kind FROM files WHERE folder = ?",
+                    (folder,),
+                )
+            }
+
+            changed, subfolders, seen = [], [], set()
+            try:
+                entries = list(os.scandir(full_path))
+            except FileNotFoundError:
+                entries = []
+            except OSError as e:
+                # Unreadable for now; leave its rows alone rather than drop them
+                print(f"Catalog couldn't read {full_path}: {e}")
+                return []
+            for entry in entries:
+                if is_internal_name(entry.name):
+                    continue
+                path = f"{folder}/{entry.name}" if folder else entry.name
+                try:
+                    # Symlinks aren't served, and following them could loop
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                seen.add(entry.name)
+                if is_dir:
+                    subfolders.append(path)
+                current = known.get(entry.name)
+                size = 0 if is_dir else stat.st_size
+                if current is None or current[:2] != (size, stat.st_mtime):
+                    changed.append(self._row(path, entry.path, stat, is_dir))
+
+            gone = [name for name in known if name not in seen]
+            if changed or gone:
+                with db:
+                    self._upsert(db, changed)
+                    for name in gone:
+                        self._delete_tree(db, f"{folder}/{name}" if folder else name)
+        return subfolders
+
+    def reconcile(self, folder=""):
+        """Reconcile a folder and everything below it with the disk."""
+        pending = [folder]
+        while pending:
+            pending.extend(self.reconcile_folder(pending.pop()))
+        if not folder:
+            # Totals are kept up to date as rows change; this catches drift
+            self.rebuild_usage()
+
+    def start_reconciler(self, interval=RECONCILE_INTERVAL):
+        """Run a full reconciliation now and then every interval seconds."""
+        if self._reconcile_thread is not None:
+            return
+
+        def run():
+            while True:
+                try:
+                    started = time.monotonic()
+                    self.reconcile()
+                    print(f"Catalog reconciled in {time.monotonic() - started:.1f}s")
+                except Exception as e:
+                    print(f"Catalog reconcile failed: {e}")
+                time.sleep(interval)
+
+        self._reconcile_thread = threading.Thread(target=run, daemon=True)
+        self._reconcile_thread.start()
+
+    def search(
+        self,
+        query="",
+        prefix=False,
+        folder="",
+        recursive=True,
+        kind=None,
+        sort="name",
+        descending=False,
+        limit=100,
+        offset=0,
+        excluded_folders=(),
+    ):
+        """
+        Search file and folder names.
+
+        Args:
+            query: substring to match (or prefix, with prefix=True)
+            folder: only return entries below this folder
+            recursive: include subfolders of folder, not just its own entries
+            kind: 'folder', 'image', 'video', 'audio', 'document' or 'other'
+            sort: 'name', 'modified', 'captured' or 'size'
+            excluded_folders: folders whose contents must not be returned
+
+        Returns:
+            list of sqlite3.Row
+        """
+        if sort not in SEARCH_SORTS:
+            raise ValueError(f"Unknown sort: {sort}")
+        clauses, params = [], []
+        source = "files f"
+
+        if query and prefix:
+            clauses.append("f.name LIKE ? ESCAPE '\\'")
+            params.append(f"{_escape_like(query)}%")
+        elif query and self.fts and len(query) >= 3:
+            source = "files_fts JOIN files f ON f.rowid = files_fts.rowid"
+            clauses.append("files_fts MATCH ?")
+            params.append('"' + query.replace('"', '""') + '"')
+        elif query:
+            clauses.append("f.name LIKE ? ESCAPE '\\'")
+            params.append(f"%{_escape_like(query)}%")
+
+        if not recursive:
+            clauses.append("f.folder = ?")
+            params.append(folder)
+        elif folder:
+            scope = f"{folder}/"
+            clauses.append("(f.folder = ? OR substr(f.folder, 1, ?) = ?)")
+            params.extend([folder, len(scope), scope])
+        if kind:
+            clauses.append("f.kind = ?")
+            params.append(kind)
+        for excluded in excluded_folders:
+            # The locked folder itself stays visible, as in listings
+            scope = f"{excluded}/"
+            clauses.append("substr(f.path, 1, ?) != ?")
+            params.extend([len(scope), scope])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        direction = "DESC" if descending else "ASC"
+        sql = (
+            f"SELECT f.* FROM {source} {where} "
+            f"ORDER BY {SEARCH_SORTS[sort]} {direction}, f.path LIMIT ? OFFSET ?"
+        )
+        return self._db().execute(sql, params + [limit, offset]).fetchall()
+
+
+catalog = Catalog()
@@ -0,0 +1,129 @@
+"""
+Device commands and state changes over one long-lived connection.
+
+Clients send {"id": ..., "command": "inverter.toggle", "args": {...}} and
+get {"type": "ack", "id": ..., "ok": true, "result": ...} back, or ok false
+with an error. Whenever a device changes state, through this channel or the
+HTTP routes, every connected client is sent {"type": "state", "device": ...,
+"state": ...}.
+"""
+
+import inspect
+import json
+import threading
+
+# Largest message a client may send, in bytes
+MAX_MESSAGE_SIZE = 4096
+
+
+class StateSubscription:
+    """One client's unsent state changes; only the newest per device is kept."""
+
+    def __init__(self, hub):
+        self._hub = hub
+        self._changes = {}
+        self._closed = False
+
+    def get(self, timeout=None):
+        """
+        Wait for state changes published since the last call.
+
+        Returns:
+            device -> state, or None if nothing changed within timeout or
+            the subscription was closed
+        """
+        with self._hub._cond:
+            self._hub._cond.wait_for(lambda: self._changes or self._closed, timeout)
+            changes, self._changes = self._changes, {}
+            return changes or None
+
+    def close(self):
+        with self._hub._cond:
+            self._closed = True
+            self._hub._subscriptions.discard(self)
+            self._hub._cond.notify_all()
+
+
+class StateHub:
+    """
+    Latest known state of each device, fanned out to every subscriber.
+
+    Like the folder EventHub, a slow client gets one merged update per device
+    rather than a backlog of every change.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._subscriptions = set()
+        self._states = {}
+
+    def subscribe(self):
+        subscription = StateSubscription(self)
+        with self._cond:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def publish(self, device, state):
+        with self._cond:
+            self._states[device] = state
+            for subscription in self._subscriptions:
+                subscription._changes[device] = state
+            self._cond.notify_all()
+
+    def snapshot(self):
+        """device -> last published state."""
+        with self._cond:
+            return dict(self._states)
+
+    def subscribers(self):
+        with self._cond:
+            return len(self._subscriptions)
+
+
+class CommandError(Exception):
+    """A message that can't be run; the message is sent back to the client."""
+
+
+class ControlChannel:
+    """Turns client messages into command calls and acknowledgements."""
+
+    def __init__(self, commands):
+        # command name -> function taking the message's args as keywords
+        self.commands = commands
+
+    def handle(self, raw):
+        """
+        Run the command in one client message.
+
+        Returns:
+            the ack to send back
+        """
+        request_id = None
+        try:
+            if len(raw) > MAX_MESSAGE_SIZE:
+                raise CommandError("Message too large")
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                raise CommandError("Invalid JSON")
+            if not isinstance(message, dict):
+                raise CommandError("Message must be an object")
+            request_id = message.get("id")
+
+            command = self.commands.get(message.get("command"))
+            if command is None:
+                raise CommandError(f"Unknown command: {message.get('command')}")
+            args = message.get("args") or {}
+            if not isinstance(args, dict):
+                raise CommandError("args must be an object")
+            try:
+                inspect.signature(command).bind(**args)
+            except TypeError as e:
+                raise CommandError(f"Invalid arguments: {e}")
+            result = command(**args)
+        except Exception as e:
+            return {"type": "ack", "id": request_id, "ok": False, "error": str(e)}
+        return {"type": "ack", "id": request_id, "ok": True, "result": result}
+
+
+device_states = StateHub()
@@ -0,0 +1,41 @@
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class Dashboard:
+    """
+    Reads every source at once, each with its own timeout.
+
+    Sources are CachedReadings, so a request takes as long as the slowest
+    read it waits for, not the sum of them. A source that misses its timeout
+    keeps reading in the background; the next request waits on that same
+    read rather than starting another, so a hung device never ties up more
+    than one thread.
+    """
+
+    def __init__(self, sources):
+        # name -> (CachedReading, timeout in seconds)
+        self.sources = sources
+
+    def collect(self):
+        """
+        Returns:
+            name -> CachedReading.snapshot(); error also says when the read
+            timed out, in which case data is the last good reading
+        """
+        started = time.monotonic()
+        pending = {
+            name: reading.request() for name, (reading, _) in self.sources.items()
+        }
+
+        result = {}
+        for name, future in pending.items():
+            reading, timeout = self.sources[name]
+            error = None
+            if future is not None:
+                try:
+                    future.result(timeout=max(0, started + timeout - time.monotonic()))
+                except FutureTimeoutError:
+                    error = f"Timed out after {timeout}s"
+            result[name] = reading.snapshot(error)
+        return result
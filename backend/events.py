@@ -0,0 +1,70 @@
+import threading
+
+
+class Subscription:
+    """One client's pending changes, coalesced until it collects them."""
+
+    def __init__(self, hub):
+        self._hub = hub
+        self._folders = set()
+        self._reset = False
+        self._closed = False
+
+    def get(self, timeout=None):
+        """
+        Wait for changes published since the last call.
+
+        Returns:
+            (set of folders, reset) or None if nothing happened within
+            timeout; reset means everything may have changed
+        """
+        with self._hub._cond:
+            self._hub._cond.wait_for(
+                lambda: self._folders or self._reset or self._closed, timeout
+            )
+            if not (self._folders or self._reset):
+                return None
+            changes = (self._folders, self._reset)
+            self._folders, self._reset = set(), False
+            return changes
+
+    def close(self):
+        with self._hub._cond:
+            self._closed = True
+            self._hub._subscriptions.discard(self)
+            self._hub._cond.notify_all()
+
+
+class EventHub:
+    """
+    Fans folder change events out to connected clients.
+
+    Each subscription keeps the set of folders changed since its client last
+    collected, so a slow client gets one merged update rather than a
+    backlog, and a client with nothing pending just sleeps on the condition.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._subscriptions = set()
+
+    def subscribe(self):
+        subscription = Subscription(self)
+        with self._cond:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def publish(self, folders=(), reset=False):
+        """Record changed folders (or a full reset) for every subscriber."""
+        with self._cond:
+            for subscription in self._subscriptions:
+                subscription._folders.update(folders)
+                subscription._reset = subscription._reset or reset
+            self._cond.notify_all()
+
+    def subscribers(self):
+        with self._cond:
+            return len(self._subscriptions)
+
+
+event_hub = EventHub()
@@ -1,13 +1,27 @@
 import os
 import shutil
 import json
+import base64
+import errno
+import heapq
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
 from pathlib import Path
+from stat import S_ISDIR, S_ISLNK, S_ISREG
 from urllib.parse import unquote
 
-UPLOAD_DIR = "/home/steve/uploads"
+UPLOAD_DIR = os.getenv("VAN_UI_UPLOAD_DIR", "/home/steve/uploads")
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+# Derived data (thumbnails etc.) that can be rebuilt from UPLOAD_DIR at any time
+CACHE_DIR = os.getenv("VAN_UI_CACHE_DIR", "/home/steve/.cache/van-ui")
 LOCKED_FOLDERS_FILE = os.path.join(UPLOAD_DIR, ".locked_folders.json")
 
+# Bookkeeping files the server keeps inside UPLOAD_DIR; never listed
+INTERNAL_PREFIXES = (".locked_folders.", ".vanui-")
+
 
 def ensure_upload_dir():
     """Ensure the upload directory exists."""
@@ -39,10 +53,14 @@ def sanitize_path(path_str):
     # Split and filter out empty parts
     parts = [p for p in path_str.split("/") if p]
 
-    # Validate each part (no special characters that could cause issues)
+    # Validate each part (no special characters that could cause issues).
+    # Server bookkeeping (blobs, trash, upload parts) shares the tree but is
+    # never addressable, so nothing reaches it by path.
     for part in parts:
         if not part or part in (".", "..") or "/" in part or "\\" in part:
             return None
+        if is_internal_name(part):
+            return None
 
     return "/".join(parts)
 
@@ -70,61 +88,604 @@ def is_safe_filename(filename):
     """Check if filename is safe (no path separators or special chars)."""
     if not filename:
         return False
-    return "/" not in filename and "\\" not in filename and ".." not in filename
+    return (
+        "/" not in filename
+        and "\\" not in filename
+        and ".." not in filename
+        and not is_internal_name(filename)
+    )
 
 
-def load_locked_folders():
-    """Load the list of locked folders from JSON file."""
-    if os.path.exists(LOCKED_FOLDERS_FILE):
+# Directories are opened without following symlinks, so a link can't lead
+# a request outside UPLOAD_DIR
+DIR_FLAGS = os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW | os.O_CLOEXEC
+
+_root_fd = None
+_root_fd_lock = threading.Lock()
+
+
+def upload_root_fd():
+    """Return a directory descriptor for UPLOAD_DIR, opened once per process."""
+    global _root_fd
+    if _root_fd is None:
+        with _root_fd_lock:
+            if _root_fd is None:
+                _root_fd = os.open(
+                    UPLOAD_DIR, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC
+                )
+    return _root_fd
+
+
+class ResolvedPath:
+    """
+    A sanitized path under UPLOAD_DIR, resolved once.
+
+    Holds a descriptor for the containing directory plus the final name, and
+    every operation is a *at() call relative to that descriptor (dir_fd), so
+    the parent folders are never looked up again and none of them can be a
+    symlink. The final component isn't followed either; symlinks are
+    treated as absent. The root itself is (root fd, ".").
+
+    If a parent folder doesn't exist, dir_fd is None: exists() is False and
+    every other operation raises FileNotFoundError. Close it (or use it as a
+    context manager) when done.
+    """
+
+    def __init__(self, relative, dir_fd, name, owns_dir_fd, root_fd=None):
+        self.relative = relative
+        self.dir_fd = dir_fd
+        self.name = name
+        self.root_fd = root_fd
+        self._owns_dir_fd = owns_dir_fd
+        self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._owns_dir_fd and self.dir_fd is not None:
+            os.close(self.dir_fd)
+            self.dir_fd = None
+
+    @property
+    def full_path(self):
+        """String path, for code that needs one (e.g. background workers)."""
+        return os.path.join(UPLOAD_DIR, self.relative) if self.relative else UPLOAD_DIR
+
+    def _not_found(self):
+        return FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), self.relative)
+
+    def _require_parent(self):
+        if self.dir_fd is None:
+            raise self._not_found()
+
+    def _openat(self, flags, mode=0o777):
+        self._require_parent()
+        try:
+            return os.open(self.name, flags, mode, dir_fd=self.dir_fd)
+        except OSError as e:
+            # O_NOFOLLOW reports a symlink as ELOOP, or ENOTDIR with O_DIRECTORY
+            if e.errno == errno.ELOOP or (
+                e.errno == errno.ENOTDIR and S_ISLNK(self.lstat().st_mode)
+            ):
+                raise self._not_found() from e
+            raise
+
+    def lstat(self):
+        self._require_parent()
+        return os.stat(self.name, dir_fd=self.dir_fd, follow_symlinks=False)
+
+    def _mode(self):
+        try:
+            return self.lstat().st_mode
+        except FileNotFoundError:
+            return None
+
+    def exists(self):
+        mode = self._mode()
+        return mode is not None and (S_ISDIR(mode) or S_ISREG(mode))
+
+    def is_dir(self):
+        mode = self._mode()
+        return mode is not None and S_ISDIR(mode)
+
+    def is_file(self):
+        mode = self._mode()
+        return mode is not None and S_ISREG(mode)
+
+    def fd(self):
+        """Descriptor for the path itself, which must be a directory."""
+        if self._fd is None:
+            self._fd = self._openat(DIR_FLAGS)
+        return self._fd
+
+    def open(self, flags=os.O_RDONLY, mode=0o644):
+        return self._openat(flags | os.O_NOFOLLOW | os.O_CLOEXEC, mode)
+
+    def open_file(self, mode="rb"):
+        return os.fdopen(self.open(), mode)
+
+    def mkdir(self, exist_ok=False):
+        self._require_parent()
         try:
-            with open(LOCKED_FOLDERS_FILE, "r") as f:
-                return set(json.load(f))
-        except Exception:
-            return set()
-    return set()
+            os.mkdir(self.name, dir_fd=self.dir_fd)
+        except FileExistsError:
+            if not (exist_ok and self.is_dir()):
+                raise
+
+    def unlink(self):
+        self._require_parent()
+        os.unlink(self.name, dir_fd=self.dir_fd)
 
+    def rmtree(self):
+        self._require_parent()
+        shutil.rmtree(self.name, dir_fd=self.dir_fd)
+
+    def makedirs(self):
+        """Create the folder and any missing parents, like os.makedirs."""
+        if self.dir_fd is None:
+            created = resolve_path(self.relative, True, self.root_fd)
+            if created is None:
+                raise NotADirectoryError(
+                    errno.ENOTDIR, os.strerror(errno.ENOTDIR), self.relative
+                )
+            self.dir_fd, self._owns_dir_fd = created.dir_fd, created._owns_dir_fd
+        self.mkdir(exist_ok=True)
+
+
+def resolve_path(path_str, create_parents=False, root_fd=None):
+    """
+    Sanitize a path and resolve its parent folders relative to UPLOAD_DIR.
 
-def save_locked_folders(locked_folders):
-    """Save the list of locked folders to JSON file."""
-    ensure_upload_dir()
+    Args:
+        create_parents: create missing parent folders on the way
+        root_fd: directory to resolve against instead of UPLOAD_DIR
+
+    Returns:
+        ResolvedPath, or None if the path is invalid or runs through a
+        symlink or a file
+    """
+    relative = sanitize_path(path_str)
+    if relative is None:
+        return None
+    parts = relative.split("/") if relative else []
+
+    fd = upload_root_fd() if root_fd is None else root_fd
+    owned = False
     try:
-        with open(LOCKED_FOLDERS_FILE, "w") as f:
-            json.dump(list(locked_folders), f)
-    except Exception as e:
-        print(f"Error saving locked folders: {e}")
+        for part in parts[:-1]:
+            try:
+                next_fd = os.open(part, DIR_FLAGS, dir_fd=fd)
+            except FileNotFoundError:
+                if not create_parents:
+                    if owned:
+                        os.close(fd)
+                    return ResolvedPath(relative, None, parts[-1], False, root_fd)
+                try:
+                    os.mkdir(part, dir_fd=fd)
+                except FileExistsError:
+                    pass
+                next_fd = os.open(part, DIR_FLAGS, dir_fd=fd)
+            if owned:
+                os.close(fd)
+            fd, owned = next_fd, True
+    except OSError as e:
+        if owned:
+            os.close(fd)
+        if e.errno in (errno.ELOOP, errno.ENOTDIR):
+            return None
+        raise
+    return ResolvedPath(relative, fd, parts[-1] if parts else ".", owned, root_fd)
+
+
+class LockStore:
+    """
+    In-memory index of locked folders, backed by LOCKED_FOLDERS_FILE.
+
+    Locks live in a path trie, so a check walks one node per path component
+    and a lock on a folder also covers everything below it. The file is
+    re-read only when its mtime changes (checked at most once per
+    CHECK_INTERVAL seconds) or after invalidate(), and is always replaced
+    atomically so readers never see a partial write.
+    """
+
+    CHECK_INTERVAL = 1.0
+    _LOCKED = None  # trie marker key; path parts are never None
+
+    def __init__(self, path=LOCKED_FOLDERS_FILE):
+        self.path = path
+        self.version = 0
+        self._root = {}
+        self._mtime = None
+        self._checked_at = None
+        self._lock = threading.RLock()
+
+    def invalidate(self):
+        """Force a reload from disk on the next lookup."""
+        with self._lock:
+            self._checked_at = None
+            self._mtime = -1
+
+    def _refresh(self):
+        now = time.monotonic()
+        checked_at = self._checked_at
+        if checked_at is not None and now - checked_at < self.CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+
+        folders = set()
+        if mtime is not None:
+            try:
+                with open(self.path, "r") as f:
+                    folders = set(json.load(f))
+            except Exception:
+                folders = set()
+        self._root = {}
+        for folder in folders:
+            sanitized = sanitize_path(folder)
+            if sanitized:
+                self._node(sanitized, create=True)[self._LOCKED] = True
+        self._mtime = mtime
+        self.version += 1
+
+    def _node(self, folder_path, create=False):
+        node = self._root
+        for part in folder_path.split("/"):
+            child = node.get(part)
+            if child is None:
+                if not create:
+                    return None
+                child = node[part] = {}
+            node = child
+        return node
+
+    def _walk(self, node, prefix, out):
+        if node.get(self._LOCKED):
+            out.add(prefix)
+        for part, child in node.items():
+            if part is not self._LOCKED:
+                self._walk(child, f"{prefix}/{part}" if prefix else part, out)
+
+    def _save(self):
+        folders = set()
+        self._walk(self._root, "", folders)
+        ensure_upload_dir()
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(self.path), prefix=".locked_folders."
+            )
+            with os.fdopen(fd, "w") as f:
+                json.dump(sorted(folders), f)
+            os.replace(tmp_path, self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns
+        except Exception as e:
+            print(f"Error saving locked folders: {e}")
+        self.version += 1
+
+    def current_version(self):
+        """Return a counter that changes whenever the set of locks changes."""
+        with self._lock:
+            self._refresh()
+            return self.version
 
+    def folders(self):
+        """Return the set of explicitly locked folders."""
+        with self._lock:
+            self._refresh()
+            folders = set()
+            self._walk(self._root, "", folders)
+            return folders
 
-def is_folder_locked(folder_path):
-    """Check if a folder is locked."""
-    locked_folders = load_locked_folders()
+    def locked_ancestors(self, folder_path):
+        """Return the locked folders on the path, outermost first, including itself."""
+        with self._lock:
+            self._refresh()
+            locked = []
+            node = self._root
+            prefix = ""
+            for part in folder_path.split("/"):
+                node = node.get(part)
+                if node is None:
+                    break
+                prefix = f"{prefix}/{part}" if prefix else part
+                if node.get(self._LOCKED):
+                    locked.append(prefix)
+            return locked
+
+    def is_locked(self, folder_path, inherited=True):
+        with self._lock:
+            self._refresh()
+            node = self._root
+            for part in folder_path.split("/"):
+                node = node.get(part)
+                if node is None:
+                    return False
+                if inherited and node.get(self._LOCKED):
+                    return True
+            return bool(node.get(self._LOCKED))
+
+    def lock(self, folder_path):
+        with self._lock:
+            self._refresh()
+            self._node(folder_path, create=True)[self._LOCKED] = True
+            self._save()
+
+    def unlock(self, folder_path, recursive=False):
+        with self._lock:
+            self._refresh()
+            parts = folder_path.split("/")
+            parent = self._node("/".join(parts[:-1])) if parts[:-1] else self._root
+            node = parent.get(parts[-1]) if parent is not None else None
+            if node is None:
+                return
+            if recursive:
+                del parent[parts[-1]]
+            else:
+                node.pop(self._LOCKED, None)
+            self._save()
+
+
+lock_store = LockStore()
+
+
+def is_internal_name(name):
+    """Check if a directory entry is server bookkeeping rather than user data."""
+    return name.startswith(INTERNAL_PREFIXES)
+
+
+def load_locked_folders():
+    """Load the set of locked folders."""
+    return lock_store.folders()
+
+
+def is_folder_locked(folder_path, inherited=True):
+    """Check if a folder is locked, either itself or through a locked parent."""
     sanitized = sanitize_path(folder_path)
-    if sanitized is None:
+    if not sanitized:
         return False
-    return sanitized in locked_folders
+    return lock_store.is_locked(sanitized, inherited=inherited)
+
+
+def get_locked_ancestors(folder_path):
+    """Return every locked folder that protects the given path, outermost first."""
+    sanitized = sanitize_path(folder_path)
+    if not sanitized:
+        return []
+    return lock_store.locked_ancestors(sanitized)
 
 
 def lock_folder(folder_path):
     """Lock a folder."""
-    locked_folders = load_locked_folders()
     sanitized = sanitize_path(folder_path)
-    if sanitized is None:
+    if not sanitized:
         return False
-    locked_folders.add(sanitized)
-    save_locked_folders(locked_folders)
+    lock_store.lock(sanitized)
     return True
 
 
-def unlock_folder(folder_path):
-    """Unlock a folder."""
-    locked_folders = load_locked_folders()
+def unlock_folder(folder_path, recursive=False):
+    """Unlock a folder, and with recursive=True every folder below it too."""
     sanitized = sanitize_path(folder_path)
-    if sanitized is None:
+    if not sanitized:
         return False
-    locked_folders.discard(sanitized)
-    save_locked_folders(locked_folders)
+    lock_store.unlock(sanitized, recursive=recursive)
     return True
 
 
+LIST_SORT_KEYS = ("name", "size", "modified")
+
+
+def _sort_key(sort, name, stat):
+    lowered = name.lower()
+    if sort == "size":
+        return [stat.st_size if stat else 0, lowered, name]
+    if sort == "modified":
+        return [stat.st_mtime_ns if stat else 0, lowered, name]
+    return [lowered, name]
+
+
+def encode_cursor(sort, descending, group, key):
+    raw = json.dumps([sort, descending, group, key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort, descending):
+    """
+    Decode a listing cursor, raising ValueError if it is malformed or was
+    handed out for a different sort or order.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_descending, group, key = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if group not in (0, 1) or not isinstance(key, list):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or cursor_descending is not descending:
+        raise ValueError("Cursor is from a different sort order")
+    return group, key
+
+
+def list_folder(
+    full_path, relative_path="", sort="name", descending=False, cursor=None, limit=None
+):
+    """
+    List a folder from os.scandir entries: folders first, then files.
+
+    full_path may also be a directory descriptor. Symlinks are left out.
+
+    Entries are ordered by name, size or modified time, and with a limit
+    only the requested page is selected (heap, not a full sort). When
+    sorting by name, only entries on the page are stat'ed. The cursor is
+    the opaque next_cursor of the previous page.
+
+    Returns:
+        tuple: (items, next_cursor); next_cursor is None on the last page
+    """
+    if sort not in LIST_SORT_KEYS:
+        raise ValueError(f"Unknown sort: {sort}")
+    after_group, after_key = (
+        decode_cursor(cursor, sort, descending) if cursor else (0, None)
+    )
+    needs_stat = sort != "name"
+
+    groups = ([], [])  # (folders, files) as (key, name, entry)
+    with os.scandir(full_path) as entries:
+        for entry in entries:
+            if is_internal_name(entry.name):
+                continue
+            try:
+                if entry.is_symlink():
+                    continue
+                group = 0 if entry.is_dir(follow_symlinks=False) else 1
+                stat = entry.stat() if needs_stat else None
+            except OSError:
+                continue  # removed while listing
+            if group < after_group:
+                continue
+            key = _sort_key(sort, entry.name, stat)
+            if group == after_group and after_key is not None:
+                if (key >= after_key) if descending else (key <= after_key):
+                    continue
+            groups[group].append((key, entry.name, entry))
+
+    page = []
+    for group, candidates in enumerate(groups):
+        remaining = None if limit is None else limit + 1 - len(page)
+        if remaining is not None and remaining <= 0:
+            break
+        if remaining is None or remaining >= len(candidates):
+            candidates.sort(key=lambda c: c[0], reverse=descending)
+        else:
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            candidates = pick(remaining, candidates, key=lambda c: c[0])
+        page.extend((group, c) for c in candidates)
+
+    next_cursor = None
+    if limit is not None and len(page) > limit:
+        page = page[:limit]
+        last_group, (last_key, _, _) = page[-1]
+        next_cursor = encode_cursor(sort, descending, last_group, last_key)
+
+    items = []
+    for group, (_, name, entry) in page:
+        path = f"{relative_path}/{name}" if relative_path else name
+        if group == 0:
+            items.append(
+                {
+                    "name": name,
+                    "type": "folder",
+                    "path": path,
+                    "locked": lock_store.is_locked(path, inherited=False),
+                }
+            )
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        items.append(
+            {
+                "name": name,
+                "type": "file",
+                "size": stat.st_size,
+                "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                "path": path,
+            }
+        )
+    return items, next_cursor
+
+
+class ListingCache:
+    """
+    Bounded LRU of folder listings, limited by the total number of items held.
+
+    A cached listing is valid while its validator matches: the folder's
+    mtime, the lock store version and a per-folder generation that
+    invalidate() bumps for changes the directory mtime doesn't show, such
+    as overwriting a file. The validator costs a single stat, so it doubles
+    as the ETag for conditional requests.
+    """
+
+    def __init__(self, max_items=20000):
+        self.max_items = max_items
+        self._entries = OrderedDict()  # key -> (tag, payload, size)
+        self._generations = {}  # folder -> (generation, invalidated_at)
+        self._size = 0
+        self._boot_id = os.urandom(4).hex()
+        self._lock = threading.Lock()
+
+    def validator(self, folder, full_path):
+        """
+        Return the folder's current state.
+
+        Returns:
+            tuple: (tag, last_modified) where last_modified is a UTC datetime
+        """
+        stat = os.stat(full_path)
+        generation, invalidated_at = self._generations.get(folder, (0, 0))
+        version = lock_store.current_version()
+        tag = f"{self._boot_id}-{stat.st_mtime_ns:x}-{version}-{generation}"
+        modified = max(stat.st_mtime, invalidated_at)
+        return tag, datetime.fromtimestamp(int(modified), timezone.utc)
+
+    def get(self, key, tag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != tag:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, tag, payload, size):
+        if size > self.max_items:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._size -= old[2]
+            self._entries[key] = (tag, payload, size)
+            self._size += size
+            while self._size > self.max_items:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+
+    def invalidate(self, folder, recursive=False):
+        """Drop cached listings of a folder, and with recursive=True its subfolders'."""
+        prefix = f"{folder}/" if folder else ""
+        with self._lock:
+            folders = {folder}
+            if recursive:
+                known = set(self._generations) | {key[0] for key in self._entries}
+                folders |= {f for f in known if f.startswith(prefix)}
+            for f in folders:
+                generation, _ = self._generations.get(f, (0, 0))
+                self._generations[f] = (generation + 1, time.time())
+            for key in list(self._entries):
+                if key[0] == folder or (recursive and key[0].startswith(prefix)):
+                    self._size -= self._entries.pop(key)[2]
+
+
+listing_cache = ListingCache()
+
+
+def parent_folder(path):
+    """Return the folder containing a sanitized path ('' for the root)."""
+    return path.rsplit("/", 1)[0] if "/" in path else ""
+
+
 # Initialize upload directory on module import
 ensure_upload_dir()
 
@@ -16,7 +16,8 @@ except Exception as e2:
 
 parser = argparse.ArgumentParser(description="Use API stubs.")
 parser.add_argument("-m", "--mock", help="API Stub")
-args = parser.parse_args()
+# Entry points such as serve.py have flags of their own
+args, _ = parser.parse_known_args()
 
 
 def is_pi():
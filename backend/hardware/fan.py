@@ -1,10 +1,12 @@
 from gpiozero import LED
 from time import sleep
+from .telemetry import relay_seconds
 
 relay = LED(6)
 
 
 def toggleFan():
-    relay.on()
-    sleep(0.05)
-    relay.off()
+    with relay_seconds.labels("fan").time():
+        relay.on()
+        sleep(0.05)
+        relay.off()
@@ -2,7 +2,13 @@ import board
 import neopixel
 import time
 import math
+import socket
 import threading
+import numpy as np
+
+from led_frames import audio_frame, audio_palette, rainbow_frame
+from voice.config import AUDIO_REACTIVE_PORT
+from .telemetry import led_fps, led_frames, led_show_seconds
 
 
 class LEDController:
@@ -19,34 +25,107 @@ class LEDController:
         self._stop_event = threading.Event()
         self._lock = threading.Lock()
 
+        # Frames are rendered into the back buffer and swapped to the front
+        # buffer, which only the output thread copies to the strip. show()
+        # blocks for several ms, so rendering and request handlers never call it.
+        self._back = [(0, 0, 0)] * num_leds
+        self._front = [(0, 0, 0)] * num_leds
+        self._frame_ready = threading.Condition()
+        self._frame_pending = False
+        # Applied by the output thread with the next frame, never mid-show()
+        self._pending_brightness = None
+        self._output_thread = threading.Thread(target=self._output_loop, daemon=True)
+        self._output_thread.start()
+
+    def _fill(self, color):
+        self._back[:] = [color] * self.num_leds
+
+    def _present(self, wait=False):
+        """
+        Swap the back buffer to the front and wake the output thread.
+
+        With wait=True the caller blocks until the previous frame has been
+        picked up, which paces animations to the strip's refresh rate.
+        Without it a pending frame is simply replaced by the newer one.
+        """
+        with self._frame_ready:
+            if wait:
+                while self._frame_pending:
+                    self._frame_ready.wait()
+            self._front, self._back = self._back, self._front
+            # Keep the back buffer in sync so effects can draw incrementally
+            self._back[:] = self._front
+            self._frame_pending = True
+            self._frame_ready.notify_all()
+
+    def _output_loop(self):
+        frames, window_start = 0, time.monotonic()
+        while True:
+            with self._frame_ready:
+                while not self._frame_pending:
+                    if not self._frame_ready.wait(timeout=1):
+                        # Idle: nothing was shown during the last second
+                        led_fps.set(0)
+                        frames, window_start = 0, time.monotonic()
+                if self._pending_brightness is not None:
+                    self.pixels.brightness = self._pending_brightness
+                    self._pending_brightness = None
+                self.pixels[:] = self._front
+                self._frame_pending = False
+                self._frame_ready.notify_all()
+            # Transmit outside the lock so the next frame renders meanwhile
+            with led_show_seconds.time():
+                self.pixels.show()
+            led_frames.inc()
+
+            frames += 1
+            elapsed = time.monotonic() - window_start
+            if elapsed >= 1:
+                led_fps.set(round(frames / elapsed, 1))
+                frames, window_start = 0, time.monotonic()
+
+    def _stop_preset(self):
+        """
+        Stop the running preset and wait for it to exit. Only the preset
+        thread draws while one runs, so this must come before any other
+        drawing; call it with self._lock held.
+        """
+        self.preset = None
+        if self._preset_thread and self._preset_thread.is_alive():
+            self._stop_event.set()
+            self._preset_thread.join()
+
     def turn_on(self):
-        self.is_on = True
-        self.pixels.fill(self.color)
-        self.pixels.show()
+        with self._lock:
+            self._stop_preset()
+            self.is_on = True
+            self._fill(self.color)
+            self._present()
 
     def turn_off(self):
         with self._lock:
+            self._stop_preset()
             self.is_on = False
-            self.preset = None
-            if self._preset_thread and self._preset_thread.is_alive():
-                self._stop_event.set()
-                self._preset_thread.join()
-            self.pixels.fill((0, 0, 0))
-            self.pixels.show()
+            self._fill((0, 0, 0))
+            self._present()
 
     def set_brightness(self, brightness_percent):
-        self.brightness = max(0.0, min(1.0, brightness_percent / 100))
-        self.pixels.brightness = self.brightness
-        if self.is_on:
-            self.pixels.fill(self.color)
-            self.pixels.show()
+        with self._lock:
+            self.brightness = max(0.0, min(1.0, brightness_percent / 100))
+            with self._frame_ready:
+                self._pending_brightness = self.brightness
+            # A running preset's next frame picks the brightness up
+            if not (self._preset_thread and self._preset_thread.is_alive()):
+                # Show the current frame again at the new brightness
+                self._present()
 
     def set_color(self, r, g, b):
-        self.preset = None
-        self.color = (r, g, b)
-        if self.is_on:
-            self.pixels.fill(self.color)
-            self.pixels.show()
+        with self._lock:
+            self._stop_preset()
+            self.color = (r, g, b)
+            if self.is_on:
+                self._fill(self.color)
+                self._present()
 
     def status(self):
         return {
@@ -59,9 +138,7 @@ class LEDController:
     def run_preset(self, name):
         with self._lock:
             # If a preset is already running, stop it
-            if self._preset_thread and self._preset_thread.is_alive():
-                self._stop_event.set()
-                self._preset_thread.join()
+            self._stop_preset()
 
             # Reset stop event for new preset
             self._stop_event.clear()
@@ -83,37 +160,28 @@ class LEDController:
         elif name == "pulse":
             while not self._stop_event.is_set() and self.preset == "pulse":
                 self._pulse(self.color)
+        elif name == "audio":
+            self._audio_reactive()
         else:
             raise ValueError(f"Unknown preset: {name}")
 
     def _rainbow_cycle(self, wait):
-        def wheel(pos):
-            if pos < 85:
-                return (pos * 3, 255 - pos * 3, 0)
-            elif pos < 170:
-                pos -= 85
-                return (255 - pos * 3, 0, pos * 3)
-            else:
-                pos -= 170
-                return (0, pos * 3, 255 - pos * 3)
-
         for j in range(256):
             if self._stop_event.is_set() or self.preset != "rainbow":
                 break
-            for i in range(self.num_leds):
-                self.pixels[i] = wheel((i * 256 // self.num_leds + j) & 255)
-            self.pixels.show()
+            rainbow_frame(self._back, self.num_leds, j)
+            self._present(wait=True)
             time.sleep(wait)
 
     def _color_chase(self, color, wait):
         for i in range(self.num_leds):
             if self._stop_event.is_set() or self.preset != "chase":
                 break
-            self.pixels[i] = color
-            self.pixels.show()
+            self._back[i] = color
+            self._present(wait=True)
             time.sleep(wait)
-        self.pixels.fill((0, 0, 0))
-        self.pixels.show()
+        self._fill((0, 0, 0))
+        self._present(wait=True)
 
     def _pulse(self, color, steps=50, delay=0.02):
         for i in range(steps):
@@ -121,6 +189,55 @@ class LEDController:
                 break
             factor = math.sin(math.pi * i / steps)
             scaled_color = tuple(int(c * factor) for c in color)
-            self.pixels.fill(scaled_color)
-            self.pixels.show()
+            self._fill(scaled_color)
+            self._present(wait=True)
             time.sleep(delay)
+
+    def _audio_reactive(self, port=AUDIO_REACTIVE_PORT, idle_timeout=1.0):
+        """Render band levels streamed by the voice app from the microphone."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(("127.0.0.1", port))
+        except OSError as e:
+            print(f"Audio preset can't listen on port {port}: {e}")
+            sock.close()
+            self._fill((0, 0, 0))
+            self._present(wait=True)
+            return
+        sock.settimeout(0.1)
+        band_index = base = None
+        palette_bands = 0
+        last_frame = time.monotonic()
+        idle = False
+
+        try:
+            while not self._stop_event.is_set() and self.preset == "audio":
+                try:
+                    data = sock.recv(1024)
+                except socket.timeout:
+                    # Go dark if the voice app stops streaming
+                    if not idle and time.monotonic() - last_frame > idle_timeout:
+                        idle = True
+                        self._fill((0, 0, 0))
+                        self._present(wait=True)
+                    continue
+
+                try:
+                    levels = np.frombuffer(data, dtype=np.float32)
+                except ValueError:
+                    continue  # not whole float32s; not from the voice app
+                if len(levels) == 0:
+                    continue
+                # Out of range levels would wrap around when made colors
+                levels = np.clip(np.nan_to_num(levels), 0.0, 1.0)
+                if len(levels) != palette_bands:
+                    palette_bands = len(levels)
+                    band_index, base = audio_palette(self.num_leds, palette_bands)
+
+                audio_frame(self._back, band_index, base, levels)
+                self._present(wait=True)
+                last_frame = time.monotonic()
+                idle = False
+        finally:
+            sock.close()
@@ -1,3 +1,6 @@
+from .telemetry import level_sensor_seconds
+
+
 def getRating(degree):
     abs_degree = abs(degree)
     if abs_degree < 2:
@@ -16,8 +19,9 @@ def checkLevel():
     CALIBRATION_PITCH_OFFSET = -82.5
     CALIBRATION_ROLL_OFFSET = 8
 
-    sensor = MPU6050(1)
-    accel_data = sensor.get_acceleration()
+    with level_sensor_seconds.time():
+        sensor = MPU6050(1)
+        accel_data = sensor.get_acceleration()
 
     ax = accel_data.x
     ay = accel_data.y
@@ -0,0 +1,27 @@
+from metrics import Counter, Gauge, Histogram
+
+smartshunt_frame_seconds = Histogram(
+    "vanui_smartshunt_frame_read_seconds",
+    "Time to read one VE.Direct frame from the SmartShunt",
+)
+smartshunt_retries = Counter(
+    "vanui_smartshunt_read_retries_total",
+    "Blank or garbled SmartShunt lines that had to be skipped",
+)
+smartshunt_incomplete_frames = Counter(
+    "vanui_smartshunt_incomplete_frames_total",
+    "SmartShunt reads that gave up before the frame's checksum line",
+)
+level_sensor_seconds = Histogram(
+    "vanui_level_sensor_read_seconds", "Time to read the MPU6050 over I2C"
+)
+relay_seconds = Histogram(
+    "vanui_relay_actuation_seconds",
+    "Time to switch a relay, including the settle delay",
+    ["relay"],
+)
+led_frames = Counter("vanui_led_frames_total", "Frames sent to the LED strip")
+led_show_seconds = Histogram(
+    "vanui_led_show_seconds", "Time to transmit one frame to the LED strip"
+)
+led_fps = Gauge("vanui_led_fps", "LED frames per second over the last second")
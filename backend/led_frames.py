@@ -0,0 +1,44 @@
+"""
+Frame rendering for the LED strip effects.
+
+Kept apart from hardware.led_controller, which needs the strip's board
+libraries, so frames can be tested and benchmarked anywhere.
+"""
+
+import numpy as np
+
+
+def wheel(pos):
+    if pos < 85:
+        return (pos * 3, 255 - pos * 3, 0)
+    elif pos < 170:
+        pos -= 85
+        return (255 - pos * 3, 0, pos * 3)
+    else:
+        pos -= 170
+        return (0, pos * 3, 255 - pos * 3)
+
+
+def rainbow_frame(frame, num_leds, step):
+    """Draw step (0-255) of the rainbow cycle into frame."""
+    for i in range(num_leds):
+        frame[i] = wheel((i * 256 // num_leds + step) & 255)
+
+
+def audio_palette(num_leds, num_bands):
+    """Per-LED band index and base color, bass in the middle of the strip."""
+    positions = np.arange(num_leds)
+    center = (num_leds - 1) / 2
+    distance = np.abs(positions - center) / (num_leds / 2)
+    band_index = np.minimum((distance * num_bands).astype(int), num_bands - 1)
+    base = np.array(
+        [wheel(int(band) * 255 // num_bands) for band in band_index],
+        dtype=np.float32,
+    )
+    return band_index, base
+
+
+def audio_frame(frame, band_index, base, levels):
+    """Draw band levels (0-1 per band) into frame."""
+    colors = (base * levels[band_index, None]).astype(np.uint8)
+    frame[:] = [tuple(color) for color in colors.tolist()]
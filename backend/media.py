@@ -0,0 +1,239 @@
+import mimetypes
+import os
+import uuid
+from datetime import datetime, timezone
+
+from flask import Response
+from werkzeug.http import http_date, parse_date
+
+# Block size for reads when the server can't send the file itself
+READ_BLOCK_SIZE = 256 * 1024
+# More ranges than this in one request are answered with the whole file
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(header, size):
+    """
+    Parse a Range header against a file of the given size.
+
+    Overlapping or adjacent ranges are merged. Per RFC 9110 a header that
+    is malformed, uses another unit or asks for too many ranges is ignored.
+
+    Returns:
+        list of (start, end) inclusive byte ranges, or None to send the whole file
+    Raises:
+        RangeNotSatisfiable if the header is valid but no range overlaps the file
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        first, dash, last = part.partition("-")
+        if not dash:
+            return None
+        first, last = first.strip(), last.strip()
+        if (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+
+        if not first:
+            # Suffix range: the last N bytes
+            if not last:
+                return None
+            length = int(last)
+            if length == 0 or size == 0:
+                continue
+            ranges.append((max(size - length, 0), size - 1))
+            continue
+
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            continue
+        end = min(int(last), size - 1) if last else size - 1
+        ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _read_range(f, start, length, close=True):
+    """
+    Yield a byte range with pread, never reading what comes before it.
+
+    Unless close is False, f is closed once the range is sent or the
+    response is closed midway.
+    """
+    fd = f.fileno()
+    offset = start
+    remaining = length
+    try:
+        while remaining > 0:
+            block = os.pread(fd, min(READ_BLOCK_SIZE, remaining), offset)
+            if not block:
+                break
+            offset += len(block)
+            remaining -= len(block)
+            yield block
+    finally:
+        if close:
+            f.close()
+
+
+def _read_multipart(f, parts):
+    for header, start, length in parts:
+        yield header
+        yield from _read_range(f, start, length, close=False)
+        yield b"\r\n"
+
+
+def file_etag(stat):
+    return f"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def send_media(full_path, request, f=None):
+    """
+    Send a file with support for ranges and conditional requests.
+
+    Handles If-None-Match/If-Modified-Since (304), If-Match and
+    If-Unmodified-Since (412), If-Range, single ranges (206),
+    multipart/byteranges for several ranges and 416 for ranges past the end.
+
+    Whole files and single ranges go to the server's wsgi.file_wrapper with
+    the file already positioned at the range and an exact Content-Length.
+    Servers such as gunicorn then transmit it with os.sendfile, so seeking
+    in a large video never copies the skipped bytes through Python. Without
+    a file wrapper, ranges are read with pread.
+
+    Pass an already open binary file as f to serve it instead of opening
+    full_path, which is then only used for the content type. The response
+    takes ownership of it.
+    """
+    if f is None:
+        f = open(full_path, "rb")
+    try:
+        stat = os.fstat(f.fileno())
+        size = stat.st_size
+        etag = file_etag(stat)
+        last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+        mimetype = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+        headers = {
+            "Accept-Ranges": "bytes",
+            "ETag": f'"{etag}"',
+            "Last-Modified": http_date(last_modified),
+        }
+
+        if request.if_match and not request.if_match.contains(etag):
+            f.close()
+            return Response(status=412, headers=headers)
+        unmodified_since = request.if_unmodified_since
+        if unmodified_since and last_modified > unmodified_since:
+            f.close()
+            return Response(status=412, headers=headers)
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            since = request.if_modified_since
+            not_modified = since is not None and last_modified <= since
+        if not_modified:
+            f.close()
+            return Response(status=304, headers=headers)
+
+        range_header = request.headers.get("Range")
+        if_range = request.headers.get("If-Range")
+        if range_header and if_range:
+            # Only honor the range if the client's copy is still current
+            if if_range.startswith('"') or if_range.startswith("W/"):
+                current = if_range == f'"{etag}"'
+            else:
+                current = parse_date(if_range) == last_modified
+            if not current:
+                range_header = None
+
+        try:
+            ranges = parse_range_header(range_header, size)
+        except RangeNotSatisfiable:
+            f.close()
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status=416, headers=headers)
+
+        if ranges is None or len(ranges) == 1:
+            start, end = ranges[0] if ranges else (0, size - 1)
+            length = end - start + 1 if size else 0
+            file_wrapper = request.environ.get("wsgi.file_wrapper")
+            if file_wrapper is not None:
+                f.seek(start)
+                body = file_wrapper(f, READ_BLOCK_SIZE)
+            else:
+                body = _read_range(f, start, length)
+            status = 200
+            if ranges:
+                status = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        else:
+            boundary = uuid.uuid4().hex
+            parts = []
+            length = 0
+            for start, end in ranges:
+                part_header = (
+                    f"--{boundary}\r\n"
+                    f"Content-Type: {mimetype}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+                ).encode()
+                parts.append((part_header, start, end - start + 1))
+                length += len(part_header) + end - start + 1 + 2
+            closing = f"--{boundary}--\r\n".encode()
+            length += len(closing)
+
+            def body_parts():
+                try:
+                    yield from _read_multipart(f, parts)
+                    yield closing
+                finally:
+                    f.close()
+
+            body = body_parts()
+            status = 206
+            mimetype = f"multipart/byteranges; boundary={boundary}"
+
+        headers["Content-Length"] = str(length)
+        if request.method == "HEAD":
+            # The body is never iterated, so nothing else would close f
+            f.close()
+            body = ()
+        # With direct_passthrough the server gets the body itself, so
+        # call_on_close would never run: the body closes f when it's done
+        response = Response(
+            body,
+            status=status,
+            headers=headers,
+            content_type=mimetype,
+            direct_passthrough=True,
+        )
+        return response
+    except BaseException:
+        f.close()
+        raise
@@ -0,0 +1,186 @@
+import cProfile
+import collections
+import os
+import re
+import sys
+import threading
+import time
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from files import CACHE_DIR
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(CACHE_DIR, "profiles"))
+# Only the newest profiles are kept
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 50))
+# Regex of request paths that are always profiled, e.g. ^/files/list
+PROFILE_PATHS = os.getenv("PROFILE_PATHS")
+# "sample" writes collapsed stacks for flamegraph.pl or speedscope;
+# "cprofile" writes pstats files for snakeviz or python -m pstats
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")
+# Seconds between stack samples
+PROFILE_INTERVAL = 0.005
+# Requests carrying a valid token here are profiled too
+PROFILE_HEADER = "X-Profile"
+# Seconds a token stays valid
+TOKEN_MAX_AGE = 24 * 3600
+PROFILE_NAME = re.compile(r"^[\w.-]+\.(folded|prof)$")
+
+
+class StackSampler:
+    """
+    Samples one thread's stack until stopped.
+
+    The profiled thread itself runs untouched; a second thread wakes every
+    PROFILE_INTERVAL to look at its current frame, so the cost is a few
+    microseconds per sample rather than a hook on every call.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                stack.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class CProfiler:
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+        return self
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self, path):
+        self.profile.dump_stats(path)
+
+
+class RequestProfiler:
+    """
+    Profiles selected requests into a bounded directory.
+
+    A request is profiled if its path matches PROFILE_PATHS or it carries a
+    token from token() in the X-Profile header. Every other request only
+    pays for one header lookup.
+    """
+
+    def __init__(
+        self,
+        secret,
+        directory=PROFILE_DIR,
+        keep=PROFILE_KEEP,
+        paths=PROFILE_PATHS,
+        mode=PROFILE_MODE,
+    ):
+        self.directory = directory
+        self.keep = keep
+        self.paths = re.compile(paths) if paths else None
+        self.mode = mode
+        self._serializer = URLSafeTimedSerializer(secret, salt="vanui-profile")
+        self._lock = threading.Lock()
+
+    def token(self):
+        """A token that enables profiling and the profile listing."""
+        return self._serializer.dumps("profile")
+
+    def authorized(self, token):
+        if not token:
+            return False
+        try:
+            return self._serializer.loads(token, max_age=TOKEN_MAX_AGE) == "profile"
+        except BadSignature:
+            return False
+
+    def wants(self, request):
+        header = request.headers.get(PROFILE_HEADER)
+        if header is None and self.paths is None:
+            return False
+        if self.paths is not None and self.paths.search(request.path):
+            return True
+        return self.authorized(header)
+
+    def start(self):
+        if self.mode == "cprofile":
+            return CProfiler().start()
+        return StackSampler(threading.get_ident()).start()
+
+    def finish(self, profiler, request, started):
+        """Stop profiler and save what it recorded. Returns the file name."""
+        profiler.stop()
+        duration_ms = (time.perf_counter() - started) * 1000
+        slug = re.sub(r"[^\w.-]+", "_", request.path.strip("/"))[:60] or "index"
+        suffix = "prof" if isinstance(profiler, CProfiler) else "folded"
+        name = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{threading.get_ident()}"
+            f"-{request.method}-{slug}-{duration_ms:.0f}ms.{suffix}"
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        profiler.write(os.path.join(self.directory, name))
+        self._prune()
+        return name
+
+    def _prune(self):
+        with self._lock:
+            for entry in self.recent()[self.keep :]:
+                try:
+                    os.unlink(os.path.join(self.directory, entry["name"]))
+                except FileNotFoundError:
+                    pass
+
+    def recent(self):
+        """Saved profiles, newest first."""
+        try:
+            entries = [
+                entry
+                for entry in os.scandir(self.directory)
+                if PROFILE_NAME.match(entry.name)
+            ]
+        except FileNotFoundError:
+            return []
+        profiles = []
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            profiles.append(
+                {"name": entry.name, "size": stat.st_size, "modified": stat.st_mtime}
+            )
+        profiles.sort(key=lambda profile: profile["modified"], reverse=True)
+        return profiles
+
+    def path_of(self, name):
+        """Full path of a saved profile, or None if name isn't one."""
+        if not PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
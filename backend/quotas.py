@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from catalog import ancestor_folders, catalog
+from files import UPLOAD_DIR
+from uploads import UploadError
+
+QUOTAS_FILE = os.path.join(UPLOAD_DIR, ".vanui-quotas.json")
+# Limit for the whole uploads tree, in bytes; 0 means only free space counts
+UPLOAD_QUOTA_BYTES = int(os.getenv("UPLOAD_QUOTA_BYTES", 0))
+# Uploads are refused if they would leave less than this free on the disk
+UPLOAD_MIN_FREE_BYTES = int(os.getenv("UPLOAD_MIN_FREE_BYTES", 1024 * 1024 * 1024))
+
+
+class QuotaStore:
+    """
+    Per-folder byte limits, persisted as JSON next to the locked folders.
+
+    A folder's limit covers everything below it, so an upload has to fit
+    under the quota of its folder and of every folder above it, plus leave
+    UPLOAD_MIN_FREE_BYTES free on the disk. Usage comes from the catalog's
+    running totals, so checking never walks the tree.
+    """
+
+    def __init__(
+        self,
+        path=QUOTAS_FILE,
+        usage=catalog,
+        root=UPLOAD_DIR,
+        default_quota=UPLOAD_QUOTA_BYTES,
+        min_free=UPLOAD_MIN_FREE_BYTES,
+    ):
+        self.path = path
+        self.usage = usage
+        self.root = root
+        self.default_quota = default_quota
+        self.min_free = min_free
+        self._quotas = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._quotas, self._mtime = {}, None
+            return
+        if self._quotas is None or mtime != self._mtime:
+            with open(self.path, "r") as f:
+                self._quotas = {k: int(v) for k, v in json.load(f).items()}
+            self._mtime = mtime
+
+    def quotas(self):
+        """Return folder -> limit in bytes, including the tree-wide default."""
+        with self._lock:
+            self._load()
+            quotas = dict(self._quotas)
+        if self.default_quota and "" not in quotas:
+            quotas[""] = self.default_quota
+        return quotas
+
+    def set(self, folder, limit):
+        """Set a folder's limit in bytes, or remove it with None."""
+        with self._lock:
+            self._load()
+            quotas = dict(self._quotas)
+            if limit is None:
+                quotas.pop(folder, None)
+            else:
+                quotas[folder] = int(limit)
+
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(self.path), prefix=".vanui-quotas-"
+            )
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(quotas, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._quotas = quotas
+            self._mtime = os.stat(self.path).st_mtime_ns
+
+    def check(self, folder, size, pending=lambda folder, unwritten=True: 0):
+        """
+        Make sure an upload of size bytes into folder fits.
+
+        Args:
+            pending: returns bytes reserved by unfinished uploads below a
+                folder; with unwritten=False, their whole size
+
+        Raises:
+            UploadError (507) naming the first limit the upload would exceed
+        """
+        free = shutil.disk_usage(self.root).free
+        if free - pending("") - size < self.min_free:
+            raise UploadError("Not enough free space", 507, free_bytes=free)
+
+        quotas = self.quotas()
+        limited = [f for f in ancestor_folders(folder) if f in quotas]
+        if not limited:
+            return
+        totals = self.usage.usage(limited)
+        for limited_folder in limited:
+            used = totals[limited_folder][0] + pending(limited_folder, unwritten=False)
+            if used + size > quotas[limited_folder]:
+                raise UploadError(
+                    f"Quota exceeded for {limited_folder or 'uploads'}",
+                    507,
+                    folder=limited_folder,
+                    quota_bytes=quotas[limited_folder],
+                    used_bytes=used,
+                )
+
+
+quota_store = QuotaStore()
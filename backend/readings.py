@@ -0,0 +1,110 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class CachedReading:
+    """
+    A hardware reading shared by every client.
+
+    A reading younger than ttl is served from memory. Up to stale seconds
+    past that, it is still served at once while one background read
+    refreshes it. Otherwise callers wait for a read, and callers arriving
+    while one is in flight wait on that same read instead of starting
+    another, so the device is read at most about once per ttl however many
+    clients poll it. The last good reading survives failed ones.
+
+    Args:
+        read: function returning the device's current state
+        ttl: seconds a reading is served as current
+        stale: seconds after that it may be served while refreshing
+        accept: optional check that a reading is complete; incomplete ones
+            are treated as failures
+    """
+
+    def __init__(self, read, ttl, stale=0, accept=None):
+        self.read = read
+        self.ttl = ttl
+        self.stale = stale
+        self.accept = accept
+        self.data = None
+        self.read_at = None  # monotonic time of the last good reading
+        self.error = None
+        self.counters = {"hits": 0, "stale": 0, "coalesced": 0, "misses": 0}
+        self._pending = None
+        self._generation = 0  # bumped by invalidate()
+        self._lock = threading.Lock()
+        # One thread: there is never more than one read in flight
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _read(self, generation):
+        try:
+            data = self.read()
+            if self.accept and not self.accept(data):
+                raise ValueError("Incomplete reading")
+        except Exception as e:
+            data, error = None, str(e)
+        else:
+            error = None
+        with self._lock:
+            if generation != self._generation:
+                # Started before invalidate(), so it may predate the change
+                return
+            if error is None:
+                self.data, self.read_at = data, time.monotonic()
+            self.error = error
+
+    def _in_flight(self):
+        return self._pending is not None and not self._pending.done()
+
+    def request(self):
+        """
+        Start a read if one is needed.
+
+        Returns:
+            the read to wait for, or None if the cached reading should be
+            served as it is
+        """
+        with self._lock:
+            age = None if self.read_at is None else time.monotonic() - self.read_at
+            if age is not None and age < self.ttl:
+                self.counters["hits"] += 1
+                return None
+            in_flight = self._in_flight()
+            if not in_flight:
+                self._pending = self._executor.submit(self._read, self._generation)
+            if age is not None and age < self.ttl + self.stale:
+                self.counters["stale"] += 1
+                return None
+            self.counters["coalesced" if in_flight else "misses"] += 1
+            return self._pending
+
+    def snapshot(self, error=None):
+        """
+        Returns:
+            {data, age, error}: age is seconds since data was read (None if
+            it never was); error is why the latest read failed, in which
+            case data is the last good reading
+        """
+        age = None
+        if self.read_at is not None:
+            age = round(time.monotonic() - self.read_at, 1)
+        return {"data": self.data, "age": age, "error": error or self.error}
+
+    def get(self, timeout=None):
+        """request() and wait up to timeout seconds for the result."""
+        pending = self.request()
+        if pending is not None:
+            try:
+                pending.result(timeout=timeout)
+            except FutureTimeoutError:
+                return self.snapshot(f"Timed out after {timeout}s")
+        return self.snapshot()
+
+    def invalidate(self):
+        """Make the next caller read the device, e.g. after switching it."""
+        with self._lock:
+            self.read_at = None
+            self._generation += 1
+            self._pending = None
@@ -0,0 +1,122 @@
+"""
+Production server: gunicorn serving the API from a pool of threads, with
+the hardware owned by a separate broker process (see broker.py).
+
+Usage (from backend/):
+    python serve.py [--bind 0.0.0.0:5000] [--threads 8] [--clients 8] [-m true]
+
+There is a single worker process because upload sessions, the listing
+cache and folder event subscribers live in its memory; concurrency comes
+from its threads.
+
+Long-lived connections hold a thread each for as long as they are open, so
+the pool is --threads for ordinary requests plus CONNECTIONS_PER_CLIENT for
+each of the --clients screens and phones expected at once. Past that, new
+connections wait for a free thread and requests queue behind them.
+"""
+
+import argparse
+import multiprocessing
+import os
+import secrets
+import shutil
+import tempfile
+import time
+
+from gunicorn.app.base import BaseApplication
+
+# Seconds to wait for the broker to open its socket
+BROKER_START_TIMEOUT = 15
+# Threads each connected client can hold: its /control WebSocket and, on the
+# files page, the /files/events stream
+CONNECTIONS_PER_CLIENT = 2
+
+
+class VanUIServer(BaseApplication):
+    def __init__(self, application, options):
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def _post_worker_init(worker):
+    # Background threads belong in the worker, not the gunicorn arbiter
+    from app import start_background_services
+
+    start_background_services()
+
+
+def start_broker(address):
+    import broker
+
+    # spawn, so the broker doesn't inherit anything gunicorn sets up later
+    process = multiprocessing.get_context("spawn").Process(
+        target=broker.serve, args=(address,), name="hardware-broker", daemon=True
+    )
+    process.start()
+    deadline = time.monotonic() + BROKER_START_TIMEOUT
+    while not os.path.exists(address):
+        if not process.is_alive():
+            raise SystemExit("Hardware broker exited during startup")
+        if time.monotonic() > deadline:
+            raise SystemExit(f"Hardware broker didn't open {address}")
+        time.sleep(0.05)
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve van-ui in production.")
+    parser.add_argument("--bind", default="0.0.0.0:5000")
+    parser.add_argument(
+        "--threads", type=int, default=8, help="Threads for ordinary requests"
+    )
+    parser.add_argument(
+        "--clients",
+        type=int,
+        default=8,
+        help="Screens and phones expected to have the UI open at once",
+    )
+    parser.add_argument("-m", "--mock", help="API Stub")
+    args = parser.parse_args()
+
+    socket_dir = None
+    address = os.getenv("HARDWARE_SOCKET")
+    if not address:
+        socket_dir = tempfile.mkdtemp(prefix="vanui-")
+        address = os.path.join(socket_dir, "hardware.sock")
+    os.environ["HARDWARE_SOCKET"] = address
+    os.environ.setdefault("HARDWARE_BROKER_KEY", secrets.token_hex(32))
+    broker_process = start_broker(address)
+
+    # Imported after the environment is set so it talks to the broker
+    from app import app
+
+    try:
+        VanUIServer(
+            app,
+            {
+                "bind": args.bind,
+                "workers": 1,
+                "worker_class": "gthread",
+                "threads": args.threads + args.clients * CONNECTIONS_PER_CLIENT,
+                # Archives and event streams stay open far longer than 30s
+                "timeout": 0,
+                "keepalive": 5,
+                "post_worker_init": _post_worker_init,
+            },
+        ).run()
+    finally:
+        broker_process.terminate()
+        if socket_dir:
+            shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import mimetypes
+import os
+import re
+import threading
+import time
+
+from flask import send_file
+
+# Precompressed variants written next to each asset by the frontend build,
+# in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# webpack's [contenthash]: the name changes whenever the content does
+HASHED_NAME = re.compile(r"\.[0-9a-f]{16,}\.")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# A request for an unknown path rescans dist/ at most this often
+RESCAN_INTERVAL = 1.0
+
+
+class StaticAsset:
+    def __init__(self, path, mimetype, hashed):
+        self.path = path
+        self.mimetype = mimetype
+        self.hashed = hashed
+        self.variants = {}  # encoding -> path of the precompressed file
+
+
+class StaticAssets:
+    """
+    In-memory index of the built frontend.
+
+    dist/ is scanned once, so a request is a dictionary lookup instead of
+    path joins and existence checks for every encoding. Hashed files never
+    change and are cached for a year; everything else (index.html, the
+    manifest, the service worker) is revalidated by ETag on every load.
+    A rebuild is picked up the first time a path is missing.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._assets = None
+        self._scanned_at = 0
+        self._lock = threading.Lock()
+
+    def scan(self):
+        assets = {}
+        compressed = []
+        for folder, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(folder, name)
+                relative = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if relative.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+                    compressed.append((relative, path))
+                    continue
+                mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                assets[relative] = StaticAsset(
+                    path, mimetype, bool(HASHED_NAME.search(name))
+                )
+        for relative, path in compressed:
+            for encoding, suffix in ENCODINGS:
+                asset = assets.get(relative.removesuffix(suffix))
+                if relative.endswith(suffix) and asset is not None:
+                    asset.variants[encoding] = path
+        with self._lock:
+            self._assets = assets
+            self._scanned_at = time.monotonic()
+
+    def lookup(self, relative):
+        if self._assets is None:
+            self.scan()
+        asset = self._assets.get(relative)
+        if asset is None and time.monotonic() - self._scanned_at > RESCAN_INTERVAL:
+            self.scan()
+            asset = self._assets.get(relative)
+        return asset
+
+    def send(self, request, relative):
+        """
+        Response for a file in dist/, or None if there is no such file.
+
+        The smallest variant the client accepts is sent, with the encoding's
+        own ETag so caches never mix them up.
+        """
+        asset = self.lookup(relative)
+        if asset is None:
+            return None
+
+        path, encoding = asset.path, None
+        for candidate, _ in ENCODINGS:
+            if candidate in asset.variants and request.accept_encodings[candidate]:
+                path, encoding = asset.variants[candidate], candidate
+                break
+        try:
+            response = send_file(
+                path,
+                mimetype=asset.mimetype,
+                max_age=IMMUTABLE_MAX_AGE if asset.hashed else None,
+            )
+        except FileNotFoundError:
+            # Replaced by a rebuild since the last scan
+            self._scanned_at = 0
+            self._assets.pop(relative, None)
+            return None
+
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if asset.variants:
+            response.vary.add("Accept-Encoding")
+        if asset.hashed:
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
@@ -0,0 +1,73 @@
+import os
+import unittest
+
+# The hardware stubs still create gpiozero devices
+os.environ.setdefault("GPIOZERO_PIN_FACTORY", "mock")
+
+from flask import session  # noqa: E402
+
+from backend.app import app, is_trash_entry_locked_for_session  # noqa: E402
+
+
+class TestInternalPaths(unittest.TestCase):
+    """Server bookkeeping inside the uploads tree is never served."""
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_internal_folders_are_rejected(self):
+        digest = "ab" * 32
+        for url in [
+            "/files/list?path=.vanui-blobs",
+            f"/files/list?path=.vanui-blobs/{digest[:2]}",
+            f"/files/view/.vanui-blobs/{digest[:2]}/{digest[2:]}",
+            f"/files/thumb/.vanui-blobs/{digest[:2]}/{digest[2:]}",
+            "/files/list?path=.vanui-trash",
+            "/files/archive?path=.vanui-trash",
+            "/files/view/photos/.vanui-upload-1.part",
+            "/files/view/.locked_folders.json",
+        ]:
+            response = self.client.get(url)
+            self.assertIn(response.status_code, (400, 404), url)
+
+    def test_internal_names_cannot_be_created(self):
+        response = self.client.post(
+            "/files/folder", json={"name": ".vanui-trash", "path": ""}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class TestCreateUpload(unittest.TestCase):
+    def test_invalid_size(self):
+        client = app.test_client()
+        for size in ["big", None, [1], "1.5"]:
+            response = client.post(
+                "/files/uploads", json={"filename": "a.jpg", "size": size}
+            )
+            self.assertEqual(response.status_code, 400, size)
+
+
+class TestTrashLocks(unittest.TestCase):
+    """A folder's locks are lifted when it's deleted but still guard the entry."""
+
+    entry = {"path": "trashed", "locks": ["trashed", "trashed/inner"]}
+
+    def is_locked(self, authenticated_folders):
+        with app.test_request_context():
+            session["authenticated_folders"] = authenticated_folders
+            return is_trash_entry_locked_for_session(self.entry)
+
+    def test_locked_entries_need_every_lock(self):
+        self.assertTrue(self.is_locked([]))
+        self.assertTrue(self.is_locked(["trashed"]))
+        self.assertFalse(self.is_locked(["trashed", "trashed/inner"]))
+
+    def test_unlocked_entries_are_open(self):
+        with app.test_request_context():
+            self.assertFalse(
+                is_trash_entry_locked_for_session({"path": "open", "locks": []})
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+from backend.archive import ARCHIVE_BLOCK_SIZE, stream_zip, walk_selection
+from backend.files import resolve_path
+
+
+class TestStreamZip(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, "trip", "private"))
+        os.makedirs(os.path.join(self.root, "trip", "empty"))
+        self.write("trip/notes.txt", b"notes " * 1000)
+        self.write("trip/photo.jpg", os.urandom(3 * ARCHIVE_BLOCK_SIZE))
+        self.write("trip/private/secret.txt", b"secret")
+        self.write("trip/.vanui-upload-1.part", b"partial")
+        self.write("other/notes.txt", b"other")
+        self.root_fd = os.open(self.root, os.O_RDONLY | os.O_DIRECTORY)
+
+    def tearDown(self):
+        os.close(self.root_fd)
+        self.tmp.cleanup()
+
+    def write(self, path, data):
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as f:
+            f.write(data)
+
+    def archive(self, paths, excluded=()):
+        selection = [resolve_path(path, root_fd=self.root_fd) for path in paths]
+        try:
+            chunks = list(stream_zip(walk_selection(selection, excluded)))
+        finally:
+            for target in selection:
+                target.close()
+        return chunks, zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+
+    def test_folder_contents_and_compression(self):
+        chunks, zf = self.archive(["trip"], excluded={"trip/private"})
+        self.assertEqual(
+            zf.namelist(),
+            ["trip/", "trip/empty/", "trip/notes.txt", "trip/photo.jpg"],
+        )
+        self.assertIsNone(zf.testzip())
+        self.assertEqual(zf.getinfo("trip/photo.jpg").compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(
+            zf.getinfo("trip/notes.txt").compress_type, zipfile.ZIP_DEFLATED
+        )
+        # Output is produced as it goes rather than in one piece at the end
+        self.assertLessEqual(max(len(c) for c in chunks), ARCHIVE_BLOCK_SIZE + 1024)
+
+    def test_symlinks_are_left_out(self):
+        os.symlink(
+            os.path.join(self.root, "other"), os.path.join(self.root, "trip/link")
+        )
+        os.symlink(
+            os.path.join(self.root, "other/notes.txt"),
+            os.path.join(self.root, "trip/empty/notes.txt"),
+        )
+        _, zf = self.archive(["trip"], excluded={"trip/private"})
+        self.assertEqual(
+            zf.namelist(),
+            ["trip/", "trip/empty/", "trip/notes.txt", "trip/photo.jpg"],
+        )
+
+    def test_selection_with_duplicate_names(self):
+        _, zf = self.archive(["trip/notes.txt", "other/notes.txt"])
+        self.assertEqual(zf.namelist(), ["notes.txt", "notes (2).txt"])
+        self.assertEqual(zf.read("notes (2).txt"), b"other")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import contextlib
+import os
+import tempfile
+import unittest
+from backend.benchmarks.suite import build_cases, compare, time_case
+
+
+class TestCompare(unittest.TestCase):
+    def test_flags_only_cases_over_tolerance(self):
+        baseline = {
+            "fast": {"median_us": 10.0},
+            "slow": {"median_us": 10.0},
+            "gone": {"median_us": 10.0},
+        }
+        results = {
+            "fast": {"median_us": 14.0},
+            "slow": {"median_us": 16.0},
+            "new": {"median_us": 100.0},
+        }
+        self.assertEqual(compare(results, baseline, 0.5), [("slow", 10.0, 16.0)])
+
+    def test_faster_is_never_a_regression(self):
+        baseline = {"case": {"median_us": 10.0}}
+        results = {"case": {"median_us": 1.0}}
+        self.assertEqual(compare(results, baseline, 0), [])
+
+
+class TestBuildCases(unittest.TestCase):
+    def test_only_builds_selected_cases(self):
+        with tempfile.TemporaryDirectory() as workdir, contextlib.ExitStack() as stack:
+            cases = build_cases(workdir, stack, only="^locked_ancestors_1k$")
+            self.assertEqual(list(cases), ["locked_ancestors_1k"])
+            # No listing trees, resolve tree or other lock files
+            self.assertEqual(os.listdir(workdir), ["locks-1000.json"])
+
+    def test_time_case(self):
+        result = time_case(lambda: None, 10, 3)
+        self.assertLessEqual(result["median_us"], result["p95_us"])
+
+
+if __name__ == "__main__":
+    unittest.main()
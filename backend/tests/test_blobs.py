@@ -0,0 +1,109 @@
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+from backend.blobs import BlobStore
+from backend.uploads import UploadError, UploadManager
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.tmp.name, "photos")
+        os.makedirs(self.folder)
+        self.folder_fd = os.open(self.folder, os.O_RDONLY | os.O_DIRECTORY)
+        self.blobs = BlobStore(os.path.join(self.tmp.name, ".vanui-blobs"))
+        self.uploads = UploadManager(blobs=self.blobs)
+
+    def tearDown(self):
+        os.close(self.folder_fd)
+        self.tmp.cleanup()
+
+    def upload(self, filename, data, sha256=None):
+        session = self.uploads.create(
+            "photos", self.folder_fd, filename, len(data), sha256
+        )
+        if session.proof:
+            offset, length = session.proof
+            self.uploads.prove(session, data[offset : offset + length])
+        if not session.deduplicated:
+            self.uploads.append(session, 0, io.BytesIO(data), len(data))
+        self.uploads.commit(session, self.folder_fd)
+        return session, os.path.join(self.folder, filename)
+
+    def test_identical_uploads_share_one_blob(self):
+        data = os.urandom(1000)
+        _, first = self.upload("a.jpg", data)
+        _, second = self.upload("b.jpg", data)
+        self.assertTrue(os.path.samefile(first, second))
+        self.assertEqual(sorted(os.listdir(self.folder)), ["a.jpg", "b.jpg"])
+
+        stats = self.blobs.stats()
+        self.assertEqual(stats["blobs"], 1)
+        self.assertEqual(stats["stored_bytes"], 1000)
+        self.assertEqual(stats["logical_bytes"], 2000)
+        self.assertEqual(stats["saved_bytes"], 1000)
+
+    def test_known_hash_skips_transfer(self):
+        data = b"same photo"
+        self.upload("a.jpg", data)
+        session, path = self.upload("b.jpg", data, hashlib.sha256(data).hexdigest())
+        self.assertTrue(session.deduplicated)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_hash_alone_gets_no_content(self):
+        secret = os.urandom(10000)
+        self.upload("secret.jpg", secret)
+        digest = hashlib.sha256(secret).hexdigest()
+
+        session = self.uploads.create(
+            "photos", self.folder_fd, "copy.jpg", 10000, digest
+        )
+        self.assertFalse(session.deduplicated)
+        self.assertEqual(session.offset, 0)
+        with self.assertRaises(UploadError) as raised:
+            self.uploads.commit(session, self.folder_fd)
+        self.assertEqual(raised.exception.status, 409)
+
+        # A wrong guess uses up the one attempt
+        with self.assertRaises(UploadError) as raised:
+            self.uploads.prove(session, b"\0" * session.proof[1])
+        self.assertEqual(raised.exception.status, 403)
+        offset, length = 0, 4096
+        with self.assertRaises(UploadError):
+            self.uploads.prove(session, secret[offset : offset + length])
+        with self.assertRaises(UploadError):
+            self.uploads.commit(session, self.folder_fd)
+        self.assertNotIn("copy.jpg", os.listdir(self.folder))
+
+    def test_unknown_or_invalid_hash_requires_data(self):
+        session = self.uploads.create("photos", self.folder_fd, "a.jpg", 3, "0" * 64)
+        self.assertFalse(session.deduplicated)
+        session = self.uploads.create("photos", self.folder_fd, "b.jpg", 3, "../../x")
+        self.assertFalse(session.deduplicated)
+
+    def test_collect_removes_unreferenced_blobs(self):
+        _, first = self.upload("a.jpg", b"one")
+        _, second = self.upload("b.jpg", b"one")
+        os.remove(first)
+        self.assertEqual(self.blobs.collect(), 0)
+        os.remove(second)
+        self.assertEqual(self.blobs.stats()["unreferenced_bytes"], 3)
+        self.assertEqual(self.blobs.collect(), 3)
+        self.assertEqual(self.blobs.stats()["blobs"], 0)
+
+    def test_save_replaces_entry_without_touching_shared_data(self):
+        _, first = self.upload("a.jpg", b"original")
+        self.upload("b.jpg", b"original")
+        self.uploads.save(io.BytesIO(b"replacement"), self.folder_fd, "a.jpg")
+        with open(os.path.join(self.folder, "b.jpg"), "rb") as f:
+            self.assertEqual(f.read(), b"original")
+        with open(first, "rb") as f:
+            self.assertEqual(f.read(), b"replacement")
+        self.assertEqual(sorted(os.listdir(self.folder)), ["a.jpg", "b.jpg"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from backend.broker import HardwareClient, HardwareError, serve
+
+
+def read_shunt():
+    return {"voltage": 12.9}
+
+
+def fail():
+    raise OSError("device busy")
+
+
+class TestBroker(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("HARDWARE_BROKER_KEY", "test-key")
+        cls.address = os.path.join(tempfile.mkdtemp(), "hardware.sock")
+        commands = {"smartshunt": (read_shunt, "serial"), "fan_toggle": (fail, "gpio")}
+        threading.Thread(
+            target=serve, args=(cls.address, commands), daemon=True
+        ).start()
+        deadline = time.monotonic() + 10
+        while not os.path.exists(cls.address) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_calls_hardware_in_broker(self):
+        client = HardwareClient(self.address)
+        self.assertEqual(client.call("smartshunt"), {"voltage": 12.9})
+        self.assertEqual(client.call("smartshunt"), {"voltage": 12.9})
+
+    def test_errors_are_raised_in_client(self):
+        client = HardwareClient(self.address)
+        with self.assertRaisesRegex(HardwareError, "device busy"):
+            client.call("fan_toggle")
+        with self.assertRaises(HardwareError):
+            client.call("self_destruct")
+        # The connection is still usable afterwards
+        self.assertIn("voltage", client.call("smartshunt"))
+
+    def test_socket_is_private(self):
+        self.assertEqual(os.stat(self.address).st_mode & 0o777, 0o600)
+
+    def test_wrong_key_is_rejected(self):
+        client = HardwareClient(self.address)
+        key = os.environ["HARDWARE_BROKER_KEY"]
+        os.environ["HARDWARE_BROKER_KEY"] = "wrong"
+        try:
+            with self.assertRaises(HardwareError):
+                client.call("smartshunt")
+        finally:
+            os.environ["HARDWARE_BROKER_KEY"] = key
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import tempfile
+import unittest
+from backend.catalog import Catalog
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "uploads")
+        os.makedirs(os.path.join(self.root, "trips", "utah"))
+        os.makedirs(os.path.join(self.root, "private"))
+        self.write("trips/utah/arches.jpg", 10)
+        self.write("trips/utah/notes.txt", 3)
+        self.write("trips/Zion_100%.mp4", 50)
+        self.write("private/secret.jpg", 5)
+        self.write(".vanui-upload-abc.part", 1)
+        self.catalog = Catalog(os.path.join(self.tmp.name, "catalog.db"), self.root)
+        self.catalog.reconcile()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, size):
+        with open(os.path.join(self.root, path), "wb") as f:
+            f.write(b"x" * size)
+
+    def paths(self, *args, **kwargs):
+        return [row["path"] for row in self.catalog.search(*args, **kwargs)]
+
+    def test_reconcile_indexes_tree_without_internal_files(self):
+        self.assertEqual(
+            self.paths(),
+            [
+                "trips/utah/arches.jpg",
+                "trips/utah/notes.txt",
+                "private",
+                "private/secret.jpg",
+                "trips",
+                "trips/utah",
+                "trips/Zion_100%.mp4",
+            ],
+        )
+
+    def test_substring_and_prefix_search(self):
+        self.assertEqual(self.paths("RCHE"), ["trips/utah/arches.jpg"])
+        self.assertEqual(self.paths("ar"), ["trips/utah/arches.jpg"])
+        self.assertEqual(self.paths("zi", prefix=True), ["trips/Zion_100%.mp4"])
+        self.assertEqual(self.paths("rches", prefix=True), [])
+        # LIKE wildcards in the query are literal
+        self.assertEqual(self.paths("0%", prefix=False), ["trips/Zion_100%.mp4"])
+        self.assertEqual(self.paths("_", prefix=True), [])
+
+    def test_filters_and_excluded_folders(self):
+        self.assertEqual(
+            self.paths(kind="image"), ["trips/utah/arches.jpg", "private/secret.jpg"]
+        )
+        self.assertEqual(
+            self.paths(folder="trips/utah"),
+            ["trips/utah/arches.jpg", "trips/utah/notes.txt"],
+        )
+        self.assertEqual(
+            self.paths(kind="image", excluded_folders={"private"}),
+            ["trips/utah/arches.jpg"],
+        )
+        self.assertEqual(
+            self.paths(folder="trips", recursive=False),
+            ["trips/utah", "trips/Zion_100%.mp4"],
+        )
+        self.assertEqual(self.paths(recursive=False), ["private", "trips"])
+
+    def test_incremental_add_and_remove(self):
+        self.write("trips/utah/delicate.jpg", 1)
+        self.catalog.add("trips/utah/delicate.jpg")
+        self.assertEqual(self.paths("delicate"), ["trips/utah/delicate.jpg"])
+        self.catalog.remove("trips/utah")
+        self.assertEqual(self.paths(folder="trips"), ["trips/Zion_100%.mp4"])
+
+    def test_reconcile_picks_up_outside_changes(self):
+        os.remove(os.path.join(self.root, "trips/utah/notes.txt"))
+        self.write("trips/utah/arches.jpg", 20)
+        self.catalog.reconcile()
+        self.assertEqual(self.paths("notes"), [])
+        self.assertEqual(self.catalog.search("arches")[0]["size"], 20)
+
+    def test_symlinks_are_not_followed(self):
+        os.symlink(self.root, os.path.join(self.root, "trips/loop"))
+        os.symlink("missing", os.path.join(self.root, "trips/dangling"))
+        self.catalog.reconcile()
+        self.catalog.add("trips")
+        self.assertEqual(self.paths("loop"), ["trips/loop"])
+        self.assertNotEqual(self.catalog.search("loop")[0]["kind"], "folder")
+        self.assertEqual(self.paths("arches"), ["trips/utah/arches.jpg"])
+
+    def test_unreadable_folder_is_skipped(self):
+        # e.g. replaced by a file between being listed and scanned
+        self.assertEqual(self.catalog.reconcile_folder("trips/Zion_100%.mp4"), [])
+        self.assertEqual(self.paths("Zion"), ["trips/Zion_100%.mp4"])
+
+    def test_sort_by_capture_date_falls_back_to_mtime(self):
+        os.utime(os.path.join(self.root, "trips/utah/arches.jpg"), (100, 100))
+        os.utime(os.path.join(self.root, "trips/utah/notes.txt"), (200, 200))
+        self.catalog.reconcile()
+        self.assertEqual(
+            self.paths(folder="trips/utah", sort="captured", descending=True),
+            ["trips/utah/notes.txt", "trips/utah/arches.jpg"],
+        )
+
+    def test_usage_tracks_changes(self):
+        usage = self.catalog.usage(["", "trips", "trips/utah", "private", "none"])
+        self.assertEqual(usage[""], (68, 4))
+        self.assertEqual(usage["trips"], (63, 3))
+        self.assertEqual(usage["trips/utah"], (13, 2))
+        self.assertEqual(usage["none"], (0, 0))
+
+        self.write("trips/utah/arches.jpg", 30)
+        self.write("trips/utah/delicate.jpg", 7)
+        self.catalog.add("trips/utah/arches.jpg")
+        self.catalog.add("trips/utah/delicate.jpg")
+        self.assertEqual(self.catalog.usage(["trips"])["trips"], (90, 4))
+
+        self.catalog.remove("trips/utah")
+        usage = self.catalog.usage(["", "trips", "trips/utah"])
+        self.assertEqual(usage, {"": (55, 2), "trips": (50, 1), "trips/utah": (0, 0)})
+
+    def test_rebuild_usage_matches_incremental_totals(self):
+        self.write("trips/utah/notes.txt", 9)
+        self.catalog.reconcile_folder("trips/utah")
+        folders = ["", "trips", "trips/utah", "private"]
+        incremental = self.catalog.usage(folders)
+        self.catalog.rebuild_usage()
+        self.assertEqual(self.catalog.usage(folders), incremental)
+        self.assertEqual(incremental["trips/utah"], (19, 2))
+
+    def test_file_replaced_by_folder(self):
+        os.remove(os.path.join(self.root, "trips/utah/notes.txt"))
+        os.mkdir(os.path.join(self.root, "trips/utah/notes.txt"))
+        self.catalog.reconcile_folder("trips/utah")
+        usage = self.catalog.usage(["", "trips/utah"])
+        self.assertEqual(usage, {"": (65, 3), "trips/utah": (10, 1)})
+        self.catalog.rebuild_usage()
+        self.assertEqual(self.catalog.usage(["", "trips/utah"]), usage)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import threading
+import unittest
+from backend.control import MAX_MESSAGE_SIZE, ControlChannel, StateHub
+
+
+class TestStateHub(unittest.TestCase):
+    def test_subscribers_get_the_newest_state_per_device(self):
+        hub = StateHub()
+        subscription = hub.subscribe()
+        hub.publish("inverter", {"on": True})
+        hub.publish("inverter", {"on": False})
+        hub.publish("fan", {"toggled_at": 1})
+        self.assertEqual(
+            subscription.get(timeout=0),
+            {"inverter": {"on": False}, "fan": {"toggled_at": 1}},
+        )
+        self.assertIsNone(subscription.get(timeout=0))
+
+    def test_snapshot_keeps_the_last_state(self):
+        hub = StateHub()
+        hub.publish("inverter", {"on": True})
+        self.assertEqual(hub.snapshot(), {"inverter": {"on": True}})
+
+    def test_get_wakes_on_publish(self):
+        hub = StateHub()
+        subscription = hub.subscribe()
+        threading.Timer(0.05, hub.publish, ("fan", {})).start()
+        self.assertEqual(subscription.get(timeout=5), {"fan": {}})
+
+    def test_close_wakes_a_waiting_get(self):
+        hub = StateHub()
+        subscription = hub.subscribe()
+        threading.Timer(0.05, subscription.close).start()
+        self.assertIsNone(subscription.get(timeout=5))
+        self.assertEqual(hub.subscribers(), 0)
+
+
+class TestControlChannel(unittest.TestCase):
+    def setUp(self):
+        def fail():
+            raise RuntimeError("relay stuck")
+
+        self.channel = ControlChannel(
+            {
+                "inverter.toggle": lambda: {"on": True, "success": True},
+                "leds.brightness": lambda percent: percent,
+                "fan.toggle": fail,
+            }
+        )
+
+    def handle(self, message):
+        return self.channel.handle(json.dumps(message))
+
+    def test_acks_with_the_result(self):
+        self.assertEqual(
+            self.handle({"id": 7, "command": "inverter.toggle"}),
+            {
+                "type": "ack",
+                "id": 7,
+                "ok": True,
+                "result": {"on": True, "success": True},
+            },
+        )
+
+    def test_passes_args(self):
+        ack = self.handle(
+            {"id": "a", "command": "leds.brightness", "args": {"percent": 40}}
+        )
+        self.assertEqual(ack["result"], 40)
+
+    def test_errors_are_acked_with_the_request_id(self):
+        for message, error in [
+            ({"id": 1, "command": "nope"}, "Unknown command: nope"),
+            ({"id": 1, "command": "leds.brightness"}, "Invalid arguments"),
+            ({"id": 1, "command": "leds.brightness", "args": [1]}, "args must be"),
+            ({"id": 1, "command": "fan.toggle"}, "relay stuck"),
+        ]:
+            ack = self.handle(message)
+            self.assertEqual((ack["id"], ack["ok"]), (1, False))
+            self.assertIn(error, ack["error"])
+
+    def test_unreadable_messages(self):
+        for raw in ["{", "[]", " " * (MAX_MESSAGE_SIZE + 1)]:
+            ack = self.channel.handle(raw)
+            self.assertEqual((ack["id"], ack["ok"]), (None, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
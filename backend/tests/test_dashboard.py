@@ -0,0 +1,64 @@
+import threading
+import time
+import unittest
+from backend.dashboard import Dashboard
+from backend.readings import CachedReading
+
+
+class TestDashboard(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def tearDown(self):
+        self.release.set()
+
+    def slow(self):
+        self.calls += 1
+        self.release.wait(5)
+        return {"voltage": 12.9}
+
+    def test_sources_are_read_concurrently(self):
+        def sleepy():
+            time.sleep(0.2)
+            return 1
+
+        dashboard = Dashboard(
+            {name: (CachedReading(sleepy, ttl=0), 1) for name in "abc"}
+        )
+        start = time.monotonic()
+        result = dashboard.collect()
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(
+            {name: entry["data"] for name, entry in result.items()},
+            {"a": 1, "b": 1, "c": 1},
+        )
+        self.assertEqual(result["a"]["age"], 0)
+        self.assertIsNone(result["a"]["error"])
+
+    def test_slow_source_returns_partial_results(self):
+        dashboard = Dashboard(
+            {
+                "shunt": (CachedReading(self.slow, ttl=0), 0.1),
+                "inverter": (CachedReading(lambda: {"on": True}, ttl=0), 1),
+            }
+        )
+        result = dashboard.collect()
+        self.assertEqual(result["inverter"]["data"], {"on": True})
+        self.assertIsNone(result["shunt"]["data"])
+        self.assertIsNone(result["shunt"]["age"])
+        self.assertIn("Timed out", result["shunt"]["error"])
+
+        # The hung read is waited on again, not started twice
+        dashboard.collect()
+        self.assertEqual(self.calls, 1)
+
+        self.release.set()
+        time.sleep(0.05)
+        result = dashboard.collect()
+        self.assertEqual(result["shunt"]["data"], {"voltage": 12.9})
+        self.assertIsNone(result["shunt"]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
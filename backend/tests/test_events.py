@@ -0,0 +1,39 @@
+import threading
+import unittest
+from backend.events import EventHub
+
+
+class TestEventHub(unittest.TestCase):
+    def setUp(self):
+        self.hub = EventHub()
+
+    def test_changes_are_merged_until_collected(self):
+        subscription = self.hub.subscribe()
+        self.hub.publish({"a"})
+        self.hub.publish({"a", "b/c"})
+        self.assertEqual(subscription.get(timeout=0), ({"a", "b/c"}, False))
+        self.assertIsNone(subscription.get(timeout=0))
+        self.hub.publish(reset=True)
+        self.assertEqual(subscription.get(timeout=0), (set(), True))
+
+    def test_waiting_subscriber_wakes_on_publish(self):
+        subscription = self.hub.subscribe()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(subscription.get(5)))
+        waiter.start()
+        self.hub.publish({"photos"})
+        waiter.join(timeout=5)
+        self.assertEqual(results, [({"photos"}, False)])
+
+    def test_closed_subscription_stops_receiving(self):
+        first, second = self.hub.subscribe(), self.hub.subscribe()
+        self.assertEqual(self.hub.subscribers(), 2)
+        first.close()
+        self.hub.publish({"a"})
+        self.assertEqual(self.hub.subscribers(), 1)
+        self.assertIsNone(first.get(timeout=0))
+        self.assertEqual(second.get(timeout=0), ({"a"}, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,228 @@
+import os
+import tempfile
+import unittest
+from backend.files import (
+    ListingCache,
+    LockStore,
+    is_safe_filename,
+    list_folder,
+    resolve_path,
+    sanitize_path,
+)
+
+
+class TestSanitizePath(unittest.TestCase):
+    def test_internal_names_are_invalid(self):
+        self.assertIsNone(sanitize_path(".vanui-blobs/ab/cdef"))
+        self.assertIsNone(sanitize_path("photos/.vanui-upload-x.part"))
+        self.assertIsNone(sanitize_path("%2Evanui-trash"))
+        self.assertFalse(is_safe_filename(".locked_folders.json"))
+        self.assertEqual(sanitize_path("photos/.vanuix"), "photos/.vanuix")
+
+
+class TestLockStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, ".locked_folders.json")
+        self.store = LockStore(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lock_is_inherited(self):
+        self.store.lock("photos/private")
+        self.assertTrue(self.store.is_locked("photos/private"))
+        self.assertTrue(self.store.is_locked("photos/private/2024/img.jpg"))
+        self.assertFalse(self.store.is_locked("photos"))
+        self.assertFalse(self.store.is_locked("photos/privateer"))
+        self.assertFalse(self.store.is_locked("photos/private/2024", inherited=False))
+
+    def test_locked_ancestors(self):
+        self.store.lock("a")
+        self.store.lock("a/b/c")
+        self.assertEqual(self.store.locked_ancestors("a/b/c/d"), ["a", "a/b/c"])
+        self.assertEqual(self.store.locked_ancestors("x/y"), [])
+
+    def test_unlock(self):
+        self.store.lock("a")
+        self.store.lock("a/b")
+        self.store.unlock("a")
+        self.assertEqual(self.store.folders(), {"a/b"})
+        self.store.lock("a")
+        self.store.unlock("a", recursive=True)
+        self.assertEqual(self.store.folders(), set())
+
+    def test_persists_and_reloads_on_change(self):
+        self.store.lock("a")
+        self.assertEqual(LockStore(self.path).folders(), {"a"})
+
+        other = LockStore(self.path)
+        other.lock("b")
+        self.store.invalidate()
+        self.assertEqual(self.store.folders(), {"a", "b"})
+        self.assertEqual(os.listdir(self.tmp.name), [".locked_folders.json"])
+
+
+class TestListFolder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for i, size in enumerate([30, 10, 20, 0]):
+            with open(os.path.join(self.tmp.name, f"file{i}.txt"), "w") as f:
+                f.write("x" * size)
+        os.mkdir(os.path.join(self.tmp.name, "b-folder"))
+        os.mkdir(os.path.join(self.tmp.name, "A-folder"))
+        open(os.path.join(self.tmp.name, ".locked_folders.json"), "w").close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def names(self, **kwargs):
+        items, _ = list_folder(self.tmp.name, **kwargs)
+        return [item["name"] for item in items]
+
+    def test_folders_first_sorted_by_name(self):
+        self.assertEqual(
+            self.names(),
+            [
+                "A-folder",
+                "b-folder",
+                "file0.txt",
+                "file1.txt",
+                "file2.txt",
+                "file3.txt",
+            ],
+        )
+
+    def test_sort_by_size_descending(self):
+        self.assertEqual(
+            self.names(sort="size", descending=True)[2:],
+            ["file0.txt", "file2.txt", "file1.txt", "file3.txt"],
+        )
+
+    def test_pages_follow_cursor(self):
+        for sort in ("name", "size", "modified"):
+            expected = self.names(sort=sort)
+            seen, cursor = [], None
+            while True:
+                items, cursor = list_folder(
+                    self.tmp.name, sort=sort, cursor=cursor, limit=4
+                )
+                seen.extend(item["name"] for item in items)
+                if cursor is None:
+                    break
+            self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            list_folder(self.tmp.name, cursor="not-a-cursor", limit=1)
+
+    def test_cursor_from_another_sort(self):
+        _, cursor = list_folder(self.tmp.name, sort="modified", limit=2)
+        for sort, descending in (("name", False), ("modified", True)):
+            with self.assertRaises(ValueError):
+                list_folder(
+                    self.tmp.name,
+                    sort=sort,
+                    descending=descending,
+                    cursor=cursor,
+                    limit=2,
+                )
+
+
+class TestResolvePath(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "uploads")
+        self.outside = os.path.join(self.tmp.name, "outside")
+        os.makedirs(os.path.join(self.root, "photos"))
+        os.makedirs(self.outside)
+        with open(os.path.join(self.root, "photos", "a.jpg"), "w") as f:
+            f.write("photo")
+        with open(os.path.join(self.outside, "secret.txt"), "w") as f:
+            f.write("secret")
+        os.symlink(self.outside, os.path.join(self.root, "escape"))
+        os.symlink(
+            os.path.join(self.outside, "secret.txt"),
+            os.path.join(self.root, "photos", "secret.txt"),
+        )
+        self.root_fd = os.open(self.root, os.O_RDONLY | os.O_DIRECTORY)
+
+    def tearDown(self):
+        os.close(self.root_fd)
+        self.tmp.cleanup()
+
+    def resolve(self, path, **kwargs):
+        target = resolve_path(path, root_fd=self.root_fd, **kwargs)
+        if target is not None:
+            self.addCleanup(target.close)
+        return target
+
+    def test_resolves_files_and_folders(self):
+        target = self.resolve("photos/a.jpg")
+        self.assertEqual((target.relative, target.name), ("photos/a.jpg", "a.jpg"))
+        self.assertTrue(target.is_file())
+        with target.open_file() as f:
+            self.assertEqual(f.read(), b"photo")
+        self.assertTrue(self.resolve("").is_dir())
+        self.assertEqual(
+            sorted(os.listdir(self.resolve("photos").fd())), ["a.jpg", "secret.txt"]
+        )
+
+    def test_symlinks_do_not_escape(self):
+        self.assertIsNone(self.resolve("escape/secret.txt"))
+        self.assertIsNone(self.resolve("photos/a.jpg/x"))
+        for path in ("escape", "photos/secret.txt"):
+            target = self.resolve(path)
+            self.assertFalse(target.exists())
+            with self.assertRaises(FileNotFoundError):
+                target.open()
+        with self.assertRaises(FileNotFoundError):
+            self.resolve("escape").fd()
+
+    def test_missing_parents(self):
+        target = self.resolve("new/deeper/folder")
+        self.assertIsNone(target.dir_fd)
+        self.assertFalse(target.exists())
+        with self.assertRaises(FileNotFoundError):
+            target.mkdir()
+        target.makedirs()
+        self.assertTrue(os.path.isdir(os.path.join(self.root, "new/deeper/folder")))
+        self.assertTrue(self.resolve("new/deeper/folder").is_dir())
+
+
+class TestListingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ListingCache(max_items=10)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_invalidate_changes_validator(self):
+        tag, _ = self.cache.validator("photos", self.tmp.name)
+        self.cache.put(("photos",), tag, ["a"], 1)
+        self.assertEqual(self.cache.get(("photos",), tag), ["a"])
+
+        self.cache.invalidate("photos")
+        new_tag, _ = self.cache.validator("photos", self.tmp.name)
+        self.assertNotEqual(tag, new_tag)
+        self.assertIsNone(self.cache.get(("photos",), tag))
+
+    def test_recursive_invalidate(self):
+        self.cache.put(("a/b",), "t", [], 1)
+        self.cache.put(("ab",), "t", [], 1)
+        self.cache.invalidate("a", recursive=True)
+        self.assertIsNone(self.cache.get(("a/b",), "t"))
+        self.assertEqual(self.cache.get(("ab",), "t"), [])
+
+    def test_evicts_least_recently_used_by_item_count(self):
+        self.cache.put(("a",), "t", [], 6)
+        self.cache.put(("b",), "t", [], 3)
+        self.cache.get(("a",), "t")
+        self.cache.put(("c",), "t", [], 3)
+        self.assertIsNone(self.cache.get(("b",), "t"))
+        self.assertIsNotNone(self.cache.get(("a",), "t"))
+
+
+if __name__ == "__main__":
+    unittest.main()
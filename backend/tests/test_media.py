@@ -0,0 +1,165 @@
+import os
+import tempfile
+import unittest
+from flask import Flask, request
+from backend.media import RangeNotSatisfiable, parse_range_header, send_media
+
+SIZE = 1000
+
+
+class TestParseRangeHeader(unittest.TestCase):
+    def test_no_header(self):
+        self.assertIsNone(parse_range_header(None, SIZE))
+        self.assertIsNone(parse_range_header("", SIZE))
+
+    def test_simple_ranges(self):
+        self.assertEqual(parse_range_header("bytes=0-99", SIZE), [(0, 99)])
+        self.assertEqual(parse_range_header("bytes=500-", SIZE), [(500, 999)])
+        self.assertEqual(parse_range_header("bytes=-100", SIZE), [(900, 999)])
+        self.assertEqual(parse_range_header("bytes=999-999", SIZE), [(999, 999)])
+
+    def test_clamps_to_file_size(self):
+        self.assertEqual(parse_range_header("bytes=900-5000", SIZE), [(900, 999)])
+        self.assertEqual(parse_range_header("bytes=-5000", SIZE), [(0, 999)])
+
+    def test_multiple_ranges_are_sorted_and_merged(self):
+        self.assertEqual(
+            parse_range_header("bytes=500-599, 0-99", SIZE), [(0, 99), (500, 599)]
+        )
+        self.assertEqual(
+            parse_range_header("bytes=0-99,100-199,150-300", SIZE), [(0, 300)]
+        )
+
+    def test_unsatisfiable(self):
+        for header in ("bytes=1000-", "bytes=5000-6000", "bytes=-0"):
+            with self.assertRaises(RangeNotSatisfiable):
+                parse_range_header(header, SIZE)
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range_header("bytes=0-", 0)
+
+    def test_unsatisfiable_parts_are_dropped(self):
+        self.assertEqual(parse_range_header("bytes=0-9,2000-", SIZE), [(0, 9)])
+
+    def test_invalid_headers_are_ignored(self):
+        for header in (
+            "items=0-10",
+            "bytes=",
+            "bytes=abc",
+            "bytes=10-5",
+            "bytes=-",
+            "bytes=1-2-3",
+            "bytes=0x10-20",
+        ):
+            self.assertIsNone(parse_range_header(header, SIZE), header)
+
+    def test_too_many_ranges(self):
+        header = "bytes=" + ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(50))
+        self.assertIsNone(parse_range_header(header, SIZE))
+
+
+class TestSendMedia(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "video.mp4")
+        self.data = bytes(range(256)) * 4
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+
+        app = Flask(__name__)
+
+        @app.route("/view")
+        def view():
+            return send_media(self.path, request)
+
+        @app.route("/open")
+        def view_open():
+            self.opened.append(open(self.path, "rb"))
+            return send_media(self.path, request, self.opened[-1])
+
+        self.opened = []
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def get(self, **headers):
+        return self.client.get("/view", headers=headers)
+
+    def test_full_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.data)
+        self.assertEqual(response.headers["Accept-Ranges"], "bytes")
+        self.assertEqual(response.mimetype, "video/mp4")
+
+    def test_single_range(self):
+        response = self.get(Range="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, self.data[10:20])
+        self.assertEqual(response.headers["Content-Range"], "bytes 10-19/1024")
+        self.assertEqual(response.headers["Content-Length"], "10")
+
+    def test_multiple_ranges(self):
+        response = self.get(Range="bytes=0-1,-2")
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.mimetype.startswith("multipart/byteranges"))
+        boundary = response.mimetype_params["boundary"]
+        self.assertEqual(int(response.headers["Content-Length"]), len(response.data))
+        parts = response.data.split(f"--{boundary}".encode())
+        self.assertIn(b"Content-Range: bytes 0-1/1024\r\n\r\n\x00\x01\r\n", parts[1])
+        self.assertIn(
+            b"Content-Range: bytes 1022-1023/1024\r\n\r\n\xfe\xff\r\n", parts[2]
+        )
+        self.assertEqual(parts[3], b"--\r\n")
+
+    def test_unsatisfiable_range(self):
+        response = self.get(Range="bytes=2000-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["Content-Range"], "bytes */1024")
+
+    def test_conditional_requests(self):
+        etag = self.get().headers["ETag"]
+        self.assertEqual(self.get(**{"If-None-Match": etag}).status_code, 304)
+        self.assertEqual(self.get(**{"If-Match": '"other"'}).status_code, 412)
+        self.assertEqual(self.get(**{"If-Match": etag}).status_code, 200)
+
+    def test_if_range(self):
+        etag = self.get().headers["ETag"]
+        current = self.get(Range="bytes=0-9", **{"If-Range": etag})
+        self.assertEqual(current.status_code, 206)
+        stale = self.get(Range="bytes=0-9", **{"If-Range": '"stale"'})
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(stale.data, self.data)
+
+    def test_file_is_closed_once_sent(self):
+        for method, headers in [
+            ("GET", {}),
+            ("GET", {"Range": "bytes=10-19"}),
+            ("GET", {"Range": "bytes=0-1,-2"}),
+            ("HEAD", {}),
+        ]:
+            response = self.client.open("/open", method=method, headers=headers)
+            self.assertIn(response.status_code, (200, 206))
+            response.get_data()
+            response.close()
+            self.assertTrue(self.opened[-1].closed, (method, headers))
+
+    def test_uses_server_file_wrapper(self):
+        wrapped = []
+
+        def file_wrapper(f, block_size):
+            wrapped.append(f.tell())
+            return iter([f.read(10)])
+
+        response = self.client.get(
+            "/view",
+            headers={"Range": "bytes=100-109"},
+            environ_overrides={"wsgi.file_wrapper": file_wrapper},
+        )
+        self.assertEqual(wrapped, [100])
+        self.assertEqual(response.data, self.data[100:110])
+
+
+if __name__ == "__main__":
+    unittest.main()
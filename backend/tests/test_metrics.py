@@ -0,0 +1,77 @@
+import threading
+import unittest
+from backend.metrics import Counter, Gauge, Histogram, Registry
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_with_labels(self):
+        counter = Counter(
+            "requests_total", "Requests", ["route"], registry=self.registry
+        )
+        counter.labels("/a").inc()
+        counter.labels("/a").inc(2)
+        counter.labels('say "hi"\n').inc()
+        self.assertEqual(
+            self.registry.render(),
+            "# HELP requests_total Requests\n"
+            "# TYPE requests_total counter\n"
+            'requests_total{route="/a"} 3\n'
+            'requests_total{route="say \\"hi\\"\\n"} 1\n',
+        )
+
+    def test_unlabelled_metrics_start_at_zero(self):
+        gauge = Gauge("in_flight", "In flight", registry=self.registry)
+        self.assertIn("in_flight 0\n", self.registry.render())
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        self.assertIn("in_flight 1\n", self.registry.render())
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram(
+            "read_seconds", "Reads", buckets=(0.1, 1), registry=self.registry
+        )
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+        lines = self.registry.render().splitlines()
+        self.assertEqual(
+            lines[2:],
+            [
+                'read_seconds_bucket{le="0.1"} 2',
+                'read_seconds_bucket{le="1"} 3',
+                'read_seconds_bucket{le="+Inf"} 4',
+                "read_seconds_sum 3.65",
+                "read_seconds_count 4",
+            ],
+        )
+
+    def test_concurrent_increments_are_not_lost(self):
+        counter = Counter("hits_total", "Hits", registry=self.registry)
+
+        def hammer():
+            for _ in range(10000):
+                counter.inc()
+
+        threads = [threading.Thread(target=hammer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIn("hits_total 40000\n", self.registry.render())
+
+    def test_names_are_unique(self):
+        Counter("dup_total", "One", registry=self.registry)
+        with self.assertRaises(ValueError):
+            Gauge("dup_total", "Two", registry=self.registry)
+
+    def test_label_count_is_checked(self):
+        counter = Counter("labelled_total", "L", ["a", "b"], registry=self.registry)
+        with self.assertRaises(ValueError):
+            counter.labels("x")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+import unittest
+from flask import Flask, request
+from backend.profiling import CProfiler, RequestProfiler, StackSampler
+
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestRequestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.profiler = RequestProfiler("secret", directory=self.tmp.name, keep=3)
+        self.app = Flask(__name__)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_only_signed_requests_are_profiled(self):
+        token = self.profiler.token()
+        with self.app.test_request_context("/files/list"):
+            self.assertFalse(self.profiler.wants(request))
+        with self.app.test_request_context(headers={"X-Profile": token}):
+            self.assertTrue(self.profiler.wants(request))
+        with self.app.test_request_context(headers={"X-Profile": token + "x"}):
+            self.assertFalse(self.profiler.wants(request))
+        other = RequestProfiler("other secret", directory=self.tmp.name)
+        self.assertFalse(other.authorized(token))
+
+    def test_configured_paths_are_profiled(self):
+        profiler = RequestProfiler("secret", directory=self.tmp.name, paths="^/files/")
+        with self.app.test_request_context("/files/list"):
+            self.assertTrue(profiler.wants(request))
+        with self.app.test_request_context("/dashboard"):
+            self.assertFalse(profiler.wants(request))
+
+    def test_sampler_writes_collapsed_stacks(self):
+        with self.app.test_request_context("/files/list"):
+            started = time.perf_counter()
+            sampler = self.profiler.start()
+            self.assertIsInstance(sampler, StackSampler)
+            busy_wait(0.1)
+            name = self.profiler.finish(sampler, request, started)
+        self.assertIn("-GET-files_list-", name)
+        with open(self.profiler.path_of(name)) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertIn("busy_wait", stack)
+        self.assertGreater(int(count), 5)
+
+    def test_cprofile_mode_writes_pstats(self):
+        profiler = RequestProfiler("secret", directory=self.tmp.name, mode="cprofile")
+        with self.app.test_request_context("/"):
+            active = profiler.start()
+            self.assertIsInstance(active, CProfiler)
+            busy_wait(0.01)
+            name = profiler.finish(active, request, time.perf_counter())
+        self.assertTrue(name.endswith("-GET-index-0ms.prof"))
+
+    def test_directory_is_bounded(self):
+        for i in range(5):
+            with self.app.test_request_context(f"/r{i}"):
+                sampler = self.profiler.start()
+                self.profiler.finish(sampler, request, time.perf_counter())
+            time.sleep(0.01)
+        names = [profile["name"] for profile in self.profiler.recent()]
+        self.assertEqual(len(names), 3)
+        self.assertIn("-r4-", names[0])
+        self.assertEqual(len(os.listdir(self.tmp.name)), 3)
+
+    def test_path_of_rejects_other_files(self):
+        self.assertIsNone(self.profiler.path_of("../secrets.folded"))
+        self.assertIsNone(self.profiler.path_of("missing.folded"))
+
+
+if __name__ == "__main__":
+    unittest.main()
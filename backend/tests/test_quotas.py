@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from backend.quotas import QuotaStore, UploadError
+
+
+class FakeUsage:
+    def __init__(self, totals):
+        self.totals = totals
+
+    def usage(self, folders):
+        return {folder: self.totals.get(folder, (0, 0)) for folder in folders}
+
+
+class TestQuotaStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.usage = FakeUsage({"": (900, 9), "photos": (500, 5)})
+        self.store = QuotaStore(
+            os.path.join(self.tmp.name, ".vanui-quotas.json"),
+            usage=self.usage,
+            root=self.tmp.name,
+            default_quota=0,
+            min_free=0,
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_no_quotas_allows_upload(self):
+        self.store.check("photos/2024", 10**6)
+
+    def test_quota_applies_to_subfolders(self):
+        self.store.set("photos", 600)
+        self.store.check("photos/2024", 100)
+        with self.assertRaises(UploadError) as raised:
+            self.store.check("photos/2024", 101)
+        self.assertEqual(raised.exception.status, 507)
+        self.assertEqual(raised.exception.extra["folder"], "photos")
+        self.store.check("videos", 10**6)
+
+    def test_pending_uploads_count_against_quota(self):
+        self.store.set("photos", 600)
+        pending = {"": 50, "photos": 50}
+        with self.assertRaises(UploadError):
+            self.store.check(
+                "photos", 60, lambda folder, unwritten=True: pending.get(folder, 0)
+            )
+
+    def test_set_persists_and_removes(self):
+        self.store.set("photos", 600)
+        reloaded = QuotaStore(self.store.path, usage=self.usage, default_quota=1000)
+        self.assertEqual(reloaded.quotas(), {"photos": 600, "": 1000})
+        self.store.set("photos", None)
+        self.assertEqual(self.store.quotas(), {})
+
+    def test_min_free_space(self):
+        self.store.min_free = 2**62
+        with self.assertRaises(UploadError):
+            self.store.check("photos", 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import threading
+import time
+import unittest
+from backend.readings import CachedReading
+
+
+class TestCachedReading(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def tearDown(self):
+        self.release.set()
+
+    def read(self):
+        self.calls += 1
+        self.release.wait(5)
+        return {"reading": self.calls}
+
+    def test_fresh_reading_is_served_from_memory(self):
+        reading = CachedReading(self.read, ttl=60)
+        self.assertEqual(reading.get()["data"], {"reading": 1})
+        self.assertEqual(reading.get()["data"], {"reading": 1})
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(reading.counters["misses"], 1)
+        self.assertEqual(reading.counters["hits"], 1)
+
+    def test_concurrent_callers_share_one_read(self):
+        reading = CachedReading(self.read, ttl=60)
+        self.release.clear()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(reading.get(5)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual([result["data"] for result in results], [{"reading": 1}] * 5)
+        self.assertEqual(reading.counters["misses"], 1)
+        self.assertEqual(reading.counters["coalesced"], 4)
+
+    def test_stale_reading_is_served_while_refreshing(self):
+        reading = CachedReading(self.read, ttl=0, stale=60)
+        reading.get()
+        self.release.clear()
+        start = time.monotonic()
+        self.assertEqual(reading.get()["data"], {"reading": 1})
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(reading.counters["stale"], 1)
+        self.release.set()
+        reading._pending.result(5)
+        self.assertEqual(reading.snapshot()["data"], {"reading": 2})
+
+    def test_timeout_keeps_last_good_reading(self):
+        reading = CachedReading(self.read, ttl=0)
+        reading.get()
+        self.release.clear()
+        result = reading.get(timeout=0.05)
+        self.assertEqual(result["data"], {"reading": 1})
+        self.assertIn("Timed out", result["error"])
+
+    def test_failed_reading_keeps_last_good_data(self):
+        readings = [{"voltage": 12.9}, {}, RuntimeError("port busy")]
+
+        def read():
+            reading = readings.pop(0)
+            if isinstance(reading, Exception):
+                raise reading
+            return reading
+
+        reading = CachedReading(read, ttl=0, accept=lambda data: "voltage" in data)
+        self.assertIsNone(reading.get()["error"])
+        self.assertEqual(
+            reading.get(),
+            {"data": {"voltage": 12.9}, "age": 0, "error": "Incomplete reading"},
+        )
+        self.assertEqual(reading.get()["error"], "port busy")
+
+    def test_invalidate_forces_a_new_read(self):
+        reading = CachedReading(self.read, ttl=60)
+        reading.get()
+        reading.invalidate()
+        self.assertEqual(reading.get()["data"], {"reading": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
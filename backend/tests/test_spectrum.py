@@ -0,0 +1,55 @@
+import unittest
+
+try:
+    import numpy as np
+    from backend.voice.spectrum import SpectrumAnalyzer
+except ImportError:  # numpy is only in requirements-pi.txt
+    np = None
+
+RATE = 16000
+BLOCK = 512
+
+
+def pcm(samples):
+    return (samples * 32767).astype(np.int16).tobytes()
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestSpectrumAnalyzer(unittest.TestCase):
+    def feed(self, analyzer, signal):
+        for start in range(0, len(signal), BLOCK):
+            levels = analyzer.process(pcm(signal[start : start + BLOCK]))
+        return levels
+
+    def test_sine_lands_in_its_band(self):
+        t = np.arange(RATE // 4) / RATE
+        edges = np.geomspace(60, RATE / 2, 17)
+        for freq in (200, 1000, 4000):
+            analyzer = SpectrumAnalyzer(rate=RATE)
+            levels = self.feed(analyzer, 0.5 * np.sin(2 * np.pi * freq * t))
+            expected = np.searchsorted(edges, freq) - 1
+            self.assertEqual(int(np.argmax(levels)), expected, freq)
+            self.assertAlmostEqual(float(levels[expected]), 1.0, places=3)
+
+    def test_silence_gives_zero_levels(self):
+        analyzer = SpectrumAnalyzer(rate=RATE)
+        levels = self.feed(analyzer, np.zeros(RATE // 4))
+        self.assertEqual(levels.shape, (16,))
+        self.assertTrue(np.all(levels == 0))
+
+    def test_empty_block_keeps_levels(self):
+        analyzer = SpectrumAnalyzer(rate=RATE)
+        t = np.arange(RATE // 4) / RATE
+        levels = self.feed(analyzer, 0.5 * np.sin(2 * np.pi * 1000 * t)).copy()
+        np.testing.assert_array_equal(analyzer.process(b""), levels)
+
+    def test_levels_fall_back_after_sound_stops(self):
+        analyzer = SpectrumAnalyzer(rate=RATE)
+        t = np.arange(RATE // 4) / RATE
+        loud = self.feed(analyzer, 0.5 * np.sin(2 * np.pi * 1000 * t)).max()
+        quiet = self.feed(analyzer, np.zeros(RATE)).max()
+        self.assertLess(quiet, loud * 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import gzip
+import os
+import tempfile
+import unittest
+from flask import Flask, abort, request
+from backend.static_assets import StaticAssets
+
+BUNDLE = "main.0123456789abcdef0123.js"
+
+
+class TestStaticAssets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.write("index.html", b"<html></html>")
+        self.write(BUNDLE, b"console.log(1);" * 100)
+        self.write(f"{BUNDLE}.gz", gzip.compress(b"console.log(1);" * 100))
+        self.write(f"{BUNDLE}.br", b"brotli")
+        self.assets = StaticAssets(self.tmp.name)
+
+        app = Flask(__name__)
+
+        @app.route("/<path:path>")
+        def static_proxy(path):
+            response = self.assets.send(request, path)
+            if response is None:
+                abort(404)
+            return response
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        with open(os.path.join(self.tmp.name, name), "wb") as f:
+            f.write(data)
+
+    def test_picks_preferred_accepted_encoding(self):
+        response = self.client.get(
+            f"/{BUNDLE}", headers={"Accept-Encoding": "gzip, br"}
+        )
+        self.assertEqual(response.headers["Content-Encoding"], "br")
+        self.assertEqual(response.data, b"brotli")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+
+        response = self.client.get(f"/{BUNDLE}", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.data), b"console.log(1);" * 100)
+        self.assertEqual(response.mimetype, "text/javascript")
+
+        response = self.client.get(f"/{BUNDLE}")
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.data, b"console.log(1);" * 100)
+
+    def test_encodings_have_their_own_etags(self):
+        etags = {
+            self.client.get(
+                f"/{BUNDLE}", headers={"Accept-Encoding": encoding}
+            ).headers["ETag"]
+            for encoding in ("br", "gzip", "identity")
+        }
+        self.assertEqual(len(etags), 3)
+
+    def test_hashed_assets_are_immutable(self):
+        cache_control = self.client.get(f"/{BUNDLE}").headers["Cache-Control"]
+        self.assertIn("immutable", cache_control)
+        self.assertIn("max-age=31536000", cache_control)
+
+    def test_index_is_revalidated(self):
+        response = self.client.get("/index.html")
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+        response = self.client.get(
+            "/index.html", headers={"If-None-Match": response.headers["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_unknown_and_compressed_paths_are_not_found(self):
+        self.assertEqual(self.client.get("/missing.js").status_code, 404)
+        self.assertEqual(self.client.get(f"/{BUNDLE}.gz").status_code, 404)
+        self.assertEqual(self.client.get("/../etc/passwd").status_code, 404)
+
+    def test_rebuild_is_picked_up(self):
+        self.client.get("/index.html")
+        self.write("main.fedcba9876543210fedc.js", b"new")
+        self.assets.scan()
+        self.assertEqual(self.client.get("/main.fedcba9876543210fedc.js").data, b"new")
+
+
+if __name__ == "__main__":
+    unittest.main()
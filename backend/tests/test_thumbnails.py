@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+from PIL import Image
+from backend.thumbnails import ThumbnailCache, snap_width
+
+
+class TestThumbnailCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, "thumbnails")
+        self.cache = ThumbnailCache(self.cache_dir, workers=1)
+        self.photo = self.make_photo("photo.jpg")
+
+    def tearDown(self):
+        self.cache._executor.shutdown()
+        self.tmp.cleanup()
+
+    def make_photo(self, name, size=(800, 600), color=(200, 40, 40)):
+        path = os.path.join(self.tmp.name, name)
+        Image.new("RGB", size, color).save(path, "JPEG")
+        return path
+
+    def read(self, full_path, width, fmt="jpeg"):
+        with self.cache.open(full_path, width, fmt) as f:
+            return f.name, f.read()
+
+    def cached_files(self):
+        return sorted(os.listdir(self.cache_dir))
+
+    def test_snap_width(self):
+        self.assertEqual(snap_width(1), 128)
+        self.assertEqual(snap_width(256), 256)
+        self.assertEqual(snap_width(300), 512)
+        self.assertEqual(snap_width(10000), 1920)
+
+    def test_variants(self):
+        for width, fmt in [(128, "jpeg"), (256, "jpeg"), (256, "webp")]:
+            name, _ = self.read(self.photo, width, fmt)
+            self.assertTrue(name.endswith(f".{fmt}"))
+            with Image.open(name) as img:
+                self.assertEqual(img.format, fmt.upper())
+                self.assertEqual(img.size, (width, width * 3 // 4))
+        self.assertEqual(len(self.cached_files()), 3)
+
+    def test_cache_hit(self):
+        name, data = self.read(self.photo, 256)
+        mtime = os.stat(name).st_mtime_ns
+        self.assertEqual(self.read(self.photo, 256), (name, data))
+        # Served from disk, not rendered again
+        self.assertEqual(os.stat(name).st_mtime_ns, mtime)
+        self.assertEqual(len(self.cached_files()), 1)
+
+    def test_modified_source_gets_a_new_variant(self):
+        old_name, old_data = self.read(self.photo, 256)
+        Image.new("RGB", (800, 600), (40, 40, 200)).save(self.photo, "JPEG")
+        stat = os.stat(self.photo)
+        os.utime(self.photo, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        new_name, new_data = self.read(self.photo, 256)
+        self.assertNotEqual(new_name, old_name)
+        self.assertNotEqual(new_data, old_data)
+
+    def test_eviction_keeps_the_size_bound(self):
+        first, _ = self.read(self.photo, 512)
+        self.cache.max_bytes = os.path.getsize(first) * 2.5
+        photos = [self.make_photo(f"{i}.jpg", color=(i * 40, 0, 0)) for i in range(4)]
+        for photo in photos:
+            self.read(photo, 512)
+
+        self.assertLessEqual(self.cache._total, self.cache.max_bytes)
+        total = sum(
+            os.path.getsize(os.path.join(self.cache_dir, name))
+            for name in self.cached_files()
+        )
+        self.assertEqual(total, self.cache._total)
+        # Least recently used go first
+        self.assertNotIn(os.path.basename(first), self.cached_files())
+        last, _ = self.read(photos[-1], 512)
+        self.assertIn(os.path.basename(last), self.cached_files())
+
+    def test_renders_from_open_source(self):
+        # Variants are keyed by the path, but the image is only read through
+        # the file the caller opened
+        other = self.make_photo("other.jpg", size=(400, 400))
+        with self.cache.open(
+            self.photo, 128, open_source=lambda: open(other, "rb")
+        ) as f:
+            with Image.open(f) as img:
+                self.assertEqual(img.size, (128, 128))
+
+    def test_render_again_is_counted_once(self):
+        name, _ = self.read(self.photo, 256)
+        self.cache._render(open(self.photo, "rb"), os.path.basename(name), 256, "jpeg")
+        self.assertEqual(self.cache._total, os.path.getsize(name))
+        self.assertEqual(len(self.cache._index), 1)
+
+    def test_open_survives_eviction(self):
+        with self.cache.open(self.photo, 256) as f:
+            os.remove(f.name)
+            self.assertGreater(len(f.read()), 0)
+        # Gone from disk: rendered again rather than failing
+        name, data = self.read(self.photo, 256)
+        self.assertTrue(os.path.exists(name))
+        self.assertGreater(len(data), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
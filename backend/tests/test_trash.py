@@ -0,0 +1,101 @@
+import os
+import tempfile
+import time
+import unittest
+from backend.files import resolve_path
+from backend.trash import REAPING_PREFIX, Trash, TrashError
+
+
+class TestTrash(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, "trip", "day1"))
+        for name in ("trip/a.jpg", "trip/day1/b.jpg", "notes.txt"):
+            with open(os.path.join(self.root, name), "w") as f:
+                f.write(name)
+        self.root_fd = os.open(self.root, os.O_RDONLY | os.O_DIRECTORY)
+        self.trash = Trash(os.path.join(self.root, ".vanui-trash"), undo_seconds=60)
+
+    def tearDown(self):
+        os.close(self.root_fd)
+        self.tmp.cleanup()
+
+    def resolve(self, path, **kwargs):
+        target = resolve_path(path, root_fd=self.root_fd, **kwargs)
+        self.addCleanup(target.close)
+        return target
+
+    def test_trash_and_restore_folder(self):
+        entry = self.trash.trash(self.resolve("trip"), locks=["trip/day1"])
+        self.assertFalse(os.path.exists(os.path.join(self.root, "trip")))
+        self.assertEqual(entry["type"], "folder")
+        self.assertEqual(entry["expires_at"], entry["deleted_at"] + 60)
+        [listed] = self.trash.entries()
+        self.assertEqual((listed["path"], listed["state"]), ("trip", "restorable"))
+
+        restored = self.trash.restore(entry["id"], self.resolve("trip"))
+        self.assertEqual(restored["locks"], ["trip/day1"])
+        with open(os.path.join(self.root, "trip/day1/b.jpg")) as f:
+            self.assertEqual(f.read(), "trip/day1/b.jpg")
+        self.assertEqual(self.trash.entries(), [])
+
+    def test_restore_refuses_to_overwrite(self):
+        entry = self.trash.trash(self.resolve("notes.txt"))
+        with open(os.path.join(self.root, "notes.txt"), "w") as f:
+            f.write("new")
+        with self.assertRaises(TrashError) as cm:
+            self.trash.restore(entry["id"], self.resolve("notes.txt"))
+        self.assertEqual(cm.exception.status, 409)
+        with self.assertRaises(TrashError) as cm:
+            self.trash.get("../notes.txt")
+        self.assertEqual(cm.exception.status, 404)
+
+    def test_expired_entries_cannot_be_restored(self):
+        self.trash.undo_seconds = 0
+        entry = self.trash.trash(self.resolve("notes.txt"))
+        [listed] = self.trash.entries()
+        self.assertEqual(listed["state"], "expired")
+        with self.assertRaises(TrashError) as cm:
+            self.trash.restore(entry["id"], self.resolve("notes.txt"))
+        self.assertEqual(cm.exception.status, 410)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "notes.txt")))
+
+    def test_reaps_expired_entries_only(self):
+        kept = self.trash.trash(self.resolve("notes.txt"))
+        self.trash.undo_seconds = 0
+        gone = self.trash.trash(self.resolve("trip"))
+        self.trash.undo_seconds = 60
+        due, wait = self.trash._due()
+        self.assertEqual(due, [])
+        self.assertGreater(wait, 50)
+
+        self.trash.undo_seconds = 0
+        due, _ = self.trash._due()
+        self.assertEqual(due, sorted([kept["id"], gone["id"]]))
+        self.trash.reap(gone["id"])
+        self.assertEqual([e["id"] for e in self.trash.entries()], [kept["id"]])
+
+    def test_recovers_interrupted_deletes(self):
+        # Emptying stopped halfway, and a delete died before the data moved
+        entry = self.trash.trash(self.resolve("trip"))
+        os.rename(
+            os.path.join(self.trash.root, entry["id"]),
+            os.path.join(self.trash.root, f"{REAPING_PREFIX}{entry['id']}"),
+        )
+        os.remove(
+            os.path.join(self.trash.root, f"{REAPING_PREFIX}{entry['id']}/data/a.jpg")
+        )
+        os.mkdir(os.path.join(self.trash.root, f"{int(time.time() * 1000)}-0badc0de"))
+
+        [listed] = self.trash.entries()
+        self.assertEqual(listed["state"], "deleting")
+        due, _ = self.trash._due()
+        self.assertEqual(len(due), 2)
+        for name in due:
+            self.trash.reap(name)
+        self.assertEqual(os.listdir(self.trash.root), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
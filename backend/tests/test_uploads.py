@@ -0,0 +1,200 @@
+import hashlib
+import io
+import os
+import tempfile
+import time
+import unittest
+from backend.blobs import BlobStore
+from backend.uploads import UploadError, UploadManager
+
+
+class TestUploadManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.tmp.name, "photos")
+        os.makedirs(self.folder)
+        self.folder_fd = os.open(self.folder, os.O_RDONLY | os.O_DIRECTORY)
+        self.blobs = BlobStore(os.path.join(self.tmp.name, ".vanui-blobs"))
+        self.uploads = UploadManager(blobs=self.blobs)
+
+    def tearDown(self):
+        os.close(self.folder_fd)
+        self.tmp.cleanup()
+
+    def create(self, data, filename="a.jpg"):
+        return self.uploads.create("photos", self.folder_fd, filename, len(data))
+
+    def test_append_and_resume(self):
+        data = os.urandom(1000)
+        session = self.create(data)
+        self.assertEqual(self.uploads.append(session, 0, io.BytesIO(data[:300])), 300)
+
+        class Dropped(io.BytesIO):
+            """A connection that breaks after 200 bytes of the chunk."""
+
+            def read(self, size=-1):
+                if self.tell() >= 200:
+                    raise ConnectionError("dropped")
+                return super().read(200)
+
+        with self.assertRaises(ConnectionError):
+            self.uploads.append(session, 300, Dropped(data[300:]))
+        # The client asks where to resume and sends the rest from there
+        resumed = self.uploads.get(session.id).status()["offset"]
+        self.assertEqual(resumed, 500)
+        self.uploads.append(session, resumed, io.BytesIO(data[resumed:]))
+        self.uploads.commit(session, self.folder_fd)
+        with open(os.path.join(self.folder, "a.jpg"), "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_wrong_offset(self):
+        session = self.create(b"0123456789")
+        self.uploads.append(session, 0, io.BytesIO(b"01234"))
+        for offset in (0, 3, 7):
+            with self.assertRaises(UploadError) as raised:
+                self.uploads.append(session, offset, io.BytesIO(b"56789"))
+            self.assertEqual(raised.exception.status, 409)
+            self.assertEqual(raised.exception.extra, {"offset": 5})
+        self.assertEqual(session.offset, 5)
+
+    def test_append_after_complete(self):
+        data = os.urandom(1000)
+        first = self.create(data)
+        self.uploads.append(first, 0, io.BytesIO(data))
+        self.uploads.commit(first, self.folder_fd)
+        # The same content again only needs proving, after which there is
+        # no temp file left to append to
+        session = self.uploads.create(
+            "photos",
+            self.folder_fd,
+            "b.jpg",
+            len(data),
+            hashlib.sha256(data).hexdigest(),
+        )
+        offset, length = session.proof
+        self.uploads.prove(session, data[offset : offset + length])
+        for chunk in (b"", data):
+            with self.assertRaises(UploadError) as raised:
+                self.uploads.append(session, 0, io.BytesIO(chunk))
+            self.assertEqual(raised.exception.status, 409)
+            self.assertEqual(raised.exception.extra, {"offset": 1000})
+        self.uploads.commit(session, self.folder_fd)
+        with open(os.path.join(self.folder, "b.jpg"), "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_pending_bytes(self):
+        data = os.urandom(1000)
+        stored = self.create(data)
+        self.uploads.append(stored, 0, io.BytesIO(data))
+        self.uploads.commit(stored, self.folder_fd)
+        proven = self.uploads.create(
+            "photos", self.folder_fd, "b.jpg", 1000, hashlib.sha256(data).hexdigest()
+        )
+        offset, length = proven.proof
+        self.uploads.prove(proven, data[offset : offset + length])
+        partial = self.create(b"x" * 500, "c.jpg")
+        self.uploads.append(partial, 0, io.BytesIO(b"x" * 200))
+
+        # Only bytes not yet on disk, but the whole size for quotas
+        self.assertEqual(self.uploads.pending_bytes(), 300)
+        self.assertEqual(self.uploads.pending_bytes("photos", unwritten=False), 1500)
+        self.assertEqual(self.uploads.pending_bytes("videos"), 0)
+
+    def test_overflow_past_declared_size(self):
+        session = self.create(b"0123456789")
+        # Declared up front
+        with self.assertRaises(UploadError) as raised:
+            self.uploads.append(session, 0, io.BytesIO(b"x" * 11), 11)
+        self.assertEqual(raised.exception.status, 413)
+        self.assertEqual(session.offset, 0)
+        # Or only found out while streaming
+        with self.assertRaises(UploadError) as raised:
+            self.uploads.append(session, 0, io.BytesIO(b"x" * 11))
+        self.assertEqual(raised.exception.status, 413)
+        self.assertEqual(session.offset, 0)
+        temp = os.path.join(self.folder, session.temp_name)
+        self.assertEqual(os.path.getsize(temp), 0)
+
+    def test_commit_when_incomplete(self):
+        session = self.create(b"0123456789")
+        self.uploads.append(session, 0, io.BytesIO(b"01234"))
+        with self.assertRaises(UploadError) as raised:
+            self.uploads.commit(session, self.folder_fd)
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(raised.exception.extra, {"offset": 5})
+        self.assertNotIn("a.jpg", os.listdir(self.folder))
+        # The session is still there to finish
+        self.uploads.append(session, 5, io.BytesIO(b"56789"))
+        self.uploads.commit(session, self.folder_fd)
+        self.assertIn("a.jpg", os.listdir(self.folder))
+
+    def test_sweep_removes_leftover_temp_files(self):
+        nested = os.path.join(self.folder, "2024")
+        os.mkdir(nested)
+        leftovers = [
+            os.path.join(self.folder, ".vanui-upload-old.part"),
+            os.path.join(nested, ".vanui-upload-older.part"),
+        ]
+        kept = [
+            os.path.join(self.folder, "photo.jpg"),
+            os.path.join(self.folder, ".vanui-upload-notes.txt"),
+        ]
+        past = time.time() - 60
+        for path in leftovers + kept:
+            open(path, "w").close()
+            os.utime(path, (past, past))
+        # An upload that started after the server did
+        session = self.create(b"new")
+
+        self.assertEqual(self.uploads.sweep(self.tmp.name), 2)
+        for path in leftovers:
+            self.assertFalse(os.path.exists(path))
+        for path in kept:
+            self.assertTrue(os.path.exists(path))
+        self.uploads.append(session, 0, io.BytesIO(b"new"))
+        self.uploads.commit(session, self.folder_fd)
+
+    def test_expired_session_is_not_closed_twice(self):
+        data = b"photo"
+        session = self.create(data)
+        self.uploads.append(session, 0, io.BytesIO(data))
+        self.uploads.expiry = 0
+        self.uploads.expire_stale()
+
+        # A commit or abort that was waiting on the session finds it gone
+        with self.assertRaises(UploadError) as raised:
+            self.uploads.commit(session, self.folder_fd)
+        self.assertEqual(raised.exception.status, 404)
+        self.uploads.abort(session)
+        with self.assertRaises(UploadError):
+            self.uploads.append(session, 0, io.BytesIO(data))
+        self.assertEqual(os.listdir(self.folder), [])
+
+    def test_commit_fails_once_the_folder_moved(self):
+        data = b"photo"
+        session = self.create(data)
+        self.uploads.append(session, 0, io.BytesIO(data))
+        moved = os.path.join(self.tmp.name, "moved")
+        os.rename(self.folder, moved)
+        os.mkdir(self.folder)
+        replacement_fd = os.open(self.folder, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            with self.assertRaises(UploadError) as raised:
+                self.uploads.commit(session, replacement_fd)
+        finally:
+            os.close(replacement_fd)
+        self.assertEqual(raised.exception.status, 410)
+        self.assertEqual(os.listdir(moved), [])
+        self.assertEqual(os.listdir(self.folder), [])
+        with self.assertRaises(UploadError):
+            self.uploads.get(session.id)
+
+    def test_commit_fails_once_the_folder_is_gone(self):
+        session = self.create(b"")
+        with self.assertRaises(UploadError) as raised:
+            self.uploads.commit(session, None)
+        self.assertEqual(raised.exception.status, 410)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import io
+import unittest
+from backend.vedirect import read_frame
+
+# As the SmartShunt sends it, every field starting with \r\n. The checksum
+# byte is whatever makes the frame sum to zero; a printable one is used here
+FRAME = (
+    b"\r\nPID\t0xA389\r\nV\t12920\r\nI\t-590\r\nP\t-8\r\nCE\t-1156\r\nSOC\t920"
+    b"\r\nTTG\t4540\r\nAlarm\tOFF\r\nAR\t0\r\nBMV\tSmartShunt 500A/50mV"
+    b"\r\nFW\t0413\r\nMON\t0\r\nChecksum\tZ"
+)
+
+
+class PortGone(Exception):
+    pass
+
+
+class TestReadFrame(unittest.TestCase):
+    def test_reads_one_frame(self):
+        data, skipped = read_frame(io.BytesIO(FRAME + FRAME).readline)
+        self.assertEqual(data["voltage"], 12.92)
+        self.assertEqual(data["current"], -0.59)
+        self.assertEqual(data["consumed_ah"], -1.16)
+        self.assertEqual(data["state_of_charge_percent"], "92%")
+        self.assertEqual(data["time_to_go_min"], "3 days")
+        self.assertEqual(data["power"], "-8")
+        self.assertEqual(data["BMV"], "SmartShunt 500A/50mV")
+        self.assertIn("Checksum", data)
+        # The empty line before the first \r\n
+        self.assertEqual(skipped, 1)
+
+    def test_starts_mid_frame(self):
+        stream = FRAME[FRAME.index(b"\r\nSOC") - 3 :] + FRAME
+        data, skipped = read_frame(io.BytesIO(stream).readline)
+        self.assertNotIn("voltage", data)
+        self.assertEqual(data["state_of_charge_percent"], "92%")
+        self.assertEqual(skipped, 1)
+
+    def test_bad_values_are_skipped(self):
+        stream = FRAME.replace(b"V\t12920", b"V\tgarbled")
+        data, skipped = read_frame(io.BytesIO(stream).readline)
+        self.assertNotIn("voltage", data)
+        self.assertIn("Checksum", data)
+        self.assertEqual(skipped, 2)
+
+    def test_gives_up_without_checksum(self):
+        data, skipped = read_frame(io.BytesIO(b"\r\n" * 500).readline, max_lines=10)
+        self.assertEqual(data, {})
+        self.assertEqual(skipped, 10)
+
+    def test_fatal_errors_end_the_frame(self):
+        lines = iter([b"V\t12920\r\n"])
+
+        def readline():
+            line = next(lines, None)
+            if line is None:
+                raise PortGone("device disconnected")
+            return line
+
+        data, _ = read_frame(readline, fatal=(PortGone,))
+        self.assertEqual(data, {"voltage": 12.92})
+
+
+if __name__ == "__main__":
+    unittest.main()
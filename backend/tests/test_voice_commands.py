@@ -0,0 +1,26 @@
+import unittest
+from backend.voice.commands import COMMAND_ALIASES, match_command
+
+
+class TestMatchCommand(unittest.TestCase):
+    def test_exact_phrases(self):
+        self.assertEqual(match_command("Toggle Inverter"), "toggle_inverter")
+        self.assertEqual(match_command("the fan"), "toggle_fan")
+        self.assertEqual(match_command("battery status"), "get_battery_data")
+
+    def test_close_phrases(self):
+        self.assertEqual(match_command("battery statuss"), "get_battery_data")
+        self.assertEqual(match_command("disable listenin"), "disable_listening")
+
+    def test_no_match(self):
+        self.assertIsNone(match_command("open the pod bay doors"))
+        self.assertIsNone(match_command(""))
+
+    def test_every_phrase_matches_its_command(self):
+        for command, phrases in COMMAND_ALIASES.items():
+            for phrase in phrases:
+                self.assertEqual(match_command(phrase), command, phrase)
+
+
+if __name__ == "__main__":
+    unittest.main()
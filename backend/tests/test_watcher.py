@@ -0,0 +1,59 @@
+import os
+import queue
+import tempfile
+import unittest
+from backend.watcher import TreeWatcher
+
+
+class TestTreeWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, "trip", "day1"))
+        self.changes = queue.Queue()
+        self.watcher = TreeWatcher(self.root, quiet=0.05, max_delay=1)
+        self.watcher.on_change = lambda *change: self.changes.put(change)
+        if not self.watcher.start():
+            self.skipTest("inotify unavailable")
+
+    def tearDown(self):
+        self.watcher.stop()
+        self.tmp.cleanup()
+
+    def write(self, path):
+        with open(os.path.join(self.root, path), "w") as f:
+            f.write(path)
+
+    def next_change(self):
+        return self.changes.get(timeout=5)
+
+    def test_burst_is_coalesced_per_folder(self):
+        for i in range(20):
+            self.write(f"trip/day1/{i}.jpg")
+        self.write("trip/notes.txt")
+        self.write(".vanui-upload-x.part")
+        folders, created, reset = self.next_change()
+        self.assertEqual(folders, {"trip", "trip/day1"})
+        self.assertEqual((created, reset), (set(), False))
+        self.assertTrue(self.changes.empty())
+
+    def test_new_folders_are_watched(self):
+        staging = os.path.join(self.tmp.name, ".vanui-staging")
+        os.makedirs(os.path.join(staging, "album", "inner"))
+        os.rename(os.path.join(staging, "album"), os.path.join(self.root, "album"))
+        folders, created, _ = self.next_change()
+        self.assertEqual((folders, created), ({""}, {"album"}))
+
+        self.write("album/inner/a.jpg")
+        self.assertEqual(self.next_change()[0], {"album/inner"})
+
+    def test_removed_folder_is_reported(self):
+        os.rmdir(os.path.join(self.root, "trip", "day1"))
+        folders, _, _ = self.next_change()
+        self.assertEqual(folders, {"trip", "trip/day1"})
+        self.write("trip/a.jpg")
+        self.assertEqual(self.next_change()[0], {"trip"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+from files import CACHE_DIR
+
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, "thumbnails")
+THUMBNAIL_MAX_BYTES = int(os.getenv("THUMBNAIL_MAX_BYTES", 512 * 1024 * 1024))
+# Requested widths are rounded up to one of these to bound the number of variants
+THUMBNAIL_WIDTHS = (128, 256, 512, 1024, 1920)
+THUMBNAIL_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp")
+THUMBNAIL_MIMETYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+def can_thumbnail(filename):
+    """Check if a thumbnail can be generated for the file."""
+    return Image is not None and filename.lower().endswith(THUMBNAIL_EXTENSIONS)
+
+
+def snap_width(width):
+    """Round a requested width up to the nearest supported variant."""
+    for candidate in THUMBNAIL_WIDTHS:
+        if width <= candidate:
+            return candidate
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def supports_webp():
+    return Image is not None and features.check("webp")
+
+
+class ThumbnailCache:
+    """
+    Downscaled JPEG/WebP variants of images, stored on disk.
+
+    Files are named by a hash of the source path, mtime, size, width and
+    format, so a modified source simply gets a new entry and the old one
+    ages out. Total size is bounded with LRU eviction. Variants are rendered
+    on a small worker pool; concurrent requests for the same variant share
+    one render.
+    """
+
+    def __init__(
+        self, cache_dir=THUMBNAIL_DIR, max_bytes=THUMBNAIL_MAX_BYTES, workers=2
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="thumbnail"
+        )
+        self._index = None  # name -> size, least recently used first
+        self._total = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _load_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+        self._index = OrderedDict()
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+        self._total = sum(self._index.values())
+
+    def _name(self, full_path, stat, width, fmt):
+        key = f"{full_path}\0{stat.st_mtime_ns}\0{stat.st_size}\0{width}\0{fmt}"
+        return f"{hashlib.sha1(key.encode()).hexdigest()}.{fmt}"
+
+    def _render(self, source, name, width, fmt):
+        with source, Image.open(source) as img:
+            # Let the JPEG decoder downscale while decoding; much cheaper on a Pi
+            img.draft("RGB", (width, width))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((width, width), Image.LANCZOS)
+            if img.mode not in ("RGB", "RGBA") or fmt == "jpeg":
+                img = img.convert("RGB")
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    img.save(f, fmt.upper(), quality=80)
+                os.replace(tmp_path, os.path.join(self.cache_dir, name))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+        size = os.path.getsize(os.path.join(self.cache_dir, name))
+        with self._lock:
+            # Rendered again after going missing; don't count it twice
+            self._total -= self._index.pop(name, 0)
+            self._index[name] = size
+            self._total += size
+            self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._index) > 1:
+            name, size = self._index.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def _submit(self, full_path, width, fmt, open_source):
+        """Return (path, future); future is None when the variant is cached."""
+        source = open_source()
+        try:
+            name = self._name(full_path, os.fstat(source.fileno()), width, fmt)
+            path = os.path.join(self.cache_dir, name)
+            with self._lock:
+                if self._index is None:
+                    self._load_index()
+                if name in self._index:
+                    self._index.move_to_end(name)
+                    return path, None
+                future = self._pending.get(name)
+                if future is None:
+                    future = self._executor.submit(
+                        self._render, source, name, width, fmt
+                    )
+                    source = None  # closed by the render
+                    self._pending[name] = future
+                    future.add_done_callback(lambda _: self._pending.pop(name, None))
+            return path, future
+        finally:
+            if source is not None:
+                source.close()
+
+    def open(self, full_path, width, fmt="jpeg", timeout=30, open_source=None):
+        """
+        Open the variant for reading, rendering it first if needed.
+
+        The source is read through open_source(), which returns a binary
+        file, so a caller that resolved the path safely can hand over its
+        descriptor instead of having it opened by path. Variants are still
+        keyed by full_path.
+
+        An open file stays readable after eviction removes it, which could
+        otherwise happen between finding the variant and sending it.
+        """
+        open_source = open_source or (lambda: open(full_path, "rb"))
+        for _ in range(3):
+            path, future = self._submit(full_path, width, fmt, open_source)
+            if future is not None:
+                future.result(timeout=timeout)
+            try:
+                return open(path, "rb")
+            except FileNotFoundError:
+                # Evicted since, or removed behind our back; render it again
+                with self._lock:
+                    size = self._index.pop(os.path.basename(path), None)
+                    if size is not None:
+                        self._total -= size
+        raise FileNotFoundError(f"Thumbnail keeps disappearing: {path}")
+
+    def prefetch(self, full_path, width, fmt="jpeg", open_source=None):
+        """Start rendering a variant in the background without waiting for it."""
+        self._submit(
+            full_path, width, fmt, open_source or (lambda: open(full_path, "rb"))
+        )
+
+
+thumbnail_cache = ThumbnailCache()
@@ -0,0 +1,310 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from files import DIR_FLAGS, UPLOAD_DIR
+
+TRASH_DIR = os.path.join(UPLOAD_DIR, ".vanui-trash")
+# Deleted files and folders can be restored for this long before the data goes
+TRASH_UNDO_SECONDS = int(os.getenv("TRASH_UNDO_SECONDS", 10 * 60))
+META_NAME = "meta.json"
+DATA_NAME = "data"
+# Entries being emptied are renamed first, so a restart knows to finish them
+REAPING_PREFIX = "reaping-"
+# Entries removed between pauses, so the reaper doesn't hog the SD card
+REAP_BATCH = 200
+REAP_PAUSE = 0.01
+ENTRY_ID = re.compile(r"\d+-[0-9a-f]{8}")
+
+
+class TrashError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Trash:
+    """
+    Deleted files and folders, kept for an undo window and then removed.
+
+    Deleting is a rename of the file or folder into an entry under TRASH_DIR
+    (the same filesystem, so it is atomic and O(1) however big the folder
+    is). A background reaper at low priority empties entries whose window
+    has passed, a batch of files at a time.
+
+    Each entry is a folder holding meta.json (written before the data moves
+    in) and the data itself. Entries without both are leftovers of a crash
+    mid-delete, and entries renamed to reaping-* were being emptied when the
+    process stopped; the reaper finishes both on startup.
+    """
+
+    def __init__(self, root=TRASH_DIR, undo_seconds=TRASH_UNDO_SECONDS):
+        self.root = root
+        self.undo_seconds = undo_seconds
+        # Called after an entry's data is gone, e.g. to collect blobs
+        self.on_reaped = None
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._reaper = None
+
+    def _root_fd(self):
+        os.makedirs(self.root, exist_ok=True)
+        return os.open(self.root, DIR_FLAGS)
+
+    def _read_meta(self, root_fd, entry_id):
+        try:
+            fd = os.open(
+                f"{entry_id}/{META_NAME}", os.O_RDONLY | os.O_NOFOLLOW, dir_fd=root_fd
+            )
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        with os.fdopen(fd, "r") as f:
+            try:
+                meta = json.load(f)
+            except ValueError:
+                return None
+        meta["expires_at"] = meta["deleted_at"] + self.undo_seconds
+        return meta
+
+    def trash(self, target, locks=()):
+        """
+        Move a ResolvedPath into the trash.
+
+        Args:
+            locks: locked folders at or below the target, restored with it
+
+        Returns:
+            dict: the entry's metadata, including its id and expires_at
+        """
+        entry_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        meta = {
+            "id": entry_id,
+            "path": target.relative,
+            "type": "folder" if target.is_dir() else "file",
+            "deleted_at": time.time(),
+            "locks": sorted(locks),
+        }
+        root_fd = self._root_fd()
+        try:
+            # Held so the reaper never mistakes a half-made entry for a crash
+            with self._wake:
+                os.mkdir(entry_id, dir_fd=root_fd)
+                entry_fd = os.open(entry_id, DIR_FLAGS, dir_fd=root_fd)
+                try:
+                    fd = os.open(
+                        META_NAME, os.O_WRONLY | os.O_CREAT | os.O_EXCL, dir_fd=entry_fd
+                    )
+                    with os.fdopen(fd, "w") as f:
+                        json.dump(meta, f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.rename(
+                        target.name,
+                        DATA_NAME,
+                        src_dir_fd=target.dir_fd,
+                        dst_dir_fd=entry_fd,
+                    )
+                finally:
+                    os.close(entry_fd)
+                self._wake.notify()
+        finally:
+            os.close(root_fd)
+
+        meta["expires_at"] = meta["deleted_at"] + self.undo_seconds
+        return meta
+
+    def entries(self):
+        """
+        List everything in the trash, oldest first.
+
+        Returns:
+            list of dict: entry metadata plus state, "restorable" within the
+                undo window, "expired" after it until the reaper gets to it,
+                and "deleting" once the reaper has it
+        """
+        if not os.path.isdir(self.root):
+            return []
+        root_fd = self._root_fd()
+        try:
+            entries = []
+            now = time.time()
+            for name in sorted(os.listdir(root_fd)):
+                meta = self._read_meta(root_fd, name)
+                if meta is None:
+                    continue
+                if name.startswith(REAPING_PREFIX):
+                    meta["state"] = "deleting"
+                elif meta["expires_at"] <= now:
+                    meta["state"] = "expired"
+                else:
+                    meta["state"] = "restorable"
+                entries.append(meta)
+            return entries
+        finally:
+            os.close(root_fd)
+
+    def get(self, entry_id):
+        """
+        Return a restorable entry's metadata.
+
+        Raises:
+            TrashError: 404 if it isn't in the trash, 410 if its undo window
+                has passed and the reaper just hasn't removed it yet
+        """
+        if not ENTRY_ID.fullmatch(entry_id):
+            raise TrashError("Not in trash", 404)
+        root_fd = self._root_fd()
+        try:
+            meta = self._read_meta(root_fd, entry_id)
+        finally:
+            os.close(root_fd)
+        if meta is None:
+            raise TrashError("Not in trash", 404)
+        if meta["expires_at"] <= time.time():
+            raise TrashError("Too late to restore", 410)
+        return meta
+
+    def restore(self, entry_id, target):
+        """
+        Move an entry's data back to the ResolvedPath it was deleted from.
+
+        Raises:
+            TrashError: 404 if the entry is gone, 410 if it has expired, 409
+                if something else exists at the original path now
+        """
+        meta = self.get(entry_id)
+        try:
+            target.lstat()
+        except FileNotFoundError:
+            pass
+        else:
+            raise TrashError("Something else exists at that path now", 409)
+        root_fd = self._root_fd()
+        try:
+            # Held so the reaper can't start on this entry mid-restore
+            with self._lock:
+                entry_fd = os.open(entry_id, DIR_FLAGS, dir_fd=root_fd)
+                try:
+                    os.rename(
+                        DATA_NAME,
+                        target.name,
+                        src_dir_fd=entry_fd,
+                        dst_dir_fd=target.dir_fd,
+                    )
+                    os.unlink(META_NAME, dir_fd=entry_fd)
+                finally:
+                    os.close(entry_fd)
+                os.rmdir(entry_id, dir_fd=root_fd)
+        except FileNotFoundError:
+            raise TrashError("Not in trash", 404)
+        finally:
+            os.close(root_fd)
+        return meta
+
+    def _remove_tree(self, root_fd, name):
+        removed = 0
+        walk = os.fwalk(name, dir_fd=root_fd, topdown=False)
+        for _, dirs, files, dir_fd in walk:
+            children = [(name, False) for name in files]
+            children += [(name, True) for name in dirs]
+            for child, is_dir in children:
+                try:
+                    if is_dir:
+                        os.rmdir(child, dir_fd=dir_fd)
+                    else:
+                        os.unlink(child, dir_fd=dir_fd)
+                except NotADirectoryError:
+                    # A symlink to a folder; fwalk lists it but doesn't enter
+                    os.unlink(child, dir_fd=dir_fd)
+                removed += 1
+                if removed % REAP_BATCH == 0:
+                    time.sleep(REAP_PAUSE)
+        os.rmdir(name, dir_fd=root_fd)
+
+    def reap(self, entry_id):
+        """Permanently delete an entry's data (or finish a reaping- entry)."""
+        root_fd = self._root_fd()
+        try:
+            name = entry_id
+            if not entry_id.startswith(REAPING_PREFIX):
+                name = f"{REAPING_PREFIX}{entry_id}"
+                with self._lock:
+                    try:
+                        os.rename(
+                            entry_id, name, src_dir_fd=root_fd, dst_dir_fd=root_fd
+                        )
+                    except FileNotFoundError:
+                        # Restored in the meantime
+                        return
+            try:
+                self._remove_tree(root_fd, name)
+            except NotADirectoryError:
+                os.unlink(name, dir_fd=root_fd)
+        finally:
+            os.close(root_fd)
+        if self.on_reaped is not None:
+            self.on_reaped()
+
+    def _complete_entry(self, root_fd, name):
+        """Return a finished entry's metadata, or None for anything to reap."""
+        if name.startswith(REAPING_PREFIX):
+            return None
+        meta = self._read_meta(root_fd, name)
+        if meta is None:
+            return None
+        try:
+            os.stat(f"{name}/{DATA_NAME}", dir_fd=root_fd, follow_symlinks=False)
+        except FileNotFoundError:
+            # Crashed before the data moved in
+            return None
+        return meta
+
+    def _due(self):
+        """Return (entry names to reap now, seconds until the next one is due)."""
+        due, next_at = [], None
+        now = time.time()
+        root_fd = self._root_fd()
+        try:
+            with self._lock:
+                for name in os.listdir(root_fd):
+                    meta = self._complete_entry(root_fd, name)
+                    if meta is None or meta["expires_at"] <= now:
+                        due.append(name)
+                    elif next_at is None or meta["expires_at"] < next_at:
+                        next_at = meta["expires_at"]
+        finally:
+            os.close(root_fd)
+        wait = None if next_at is None else max(next_at - now, 0)
+        return sorted(due), wait
+
+    def start_reaper(self):
+        """Empty expired entries in the background, starting with any left over."""
+        if self._reaper is not None:
+            return
+
+        def run():
+            try:
+                # Linux lets a single thread lower its own priority
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+            except (AttributeError, OSError):
+                pass
+            while True:
+                try:
+                    due, wait = self._due()
+                    for name in due:
+                        self.reap(name)
+                except Exception as e:
+                    print(f"Emptying trash failed: {e}")
+                    due, wait = [], 60
+                if not due:
+                    with self._wake:
+                        self._wake.wait(wait)
+
+        self._reaper = threading.Thread(target=run, daemon=True)
+        self._reaper.start()
+
+
+trash = Trash()
@@ -0,0 +1,370 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+import uuid
+
+from blobs import blob_store
+from files import MAX_FILE_SIZE, UPLOAD_DIR, is_internal_name
+
+# Bytes read from the request per write while appending a chunk
+STREAM_BLOCK_SIZE = 256 * 1024
+# Sessions with no activity for this long are dropped along with their data
+UPLOAD_EXPIRY = 24 * 60 * 60
+UPLOAD_TEMP_PREFIX = ".vanui-upload-"
+# Bytes of a stored file a client has to send back before its upload is
+# deduplicated, so knowing a file's hash isn't enough to get a copy of it
+PROOF_SIZE = 4096
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+class UploadSession:
+    def __init__(self, upload_id, folder, filename, size, dir_fd):
+        self.id = upload_id
+        self.folder = folder
+        self.filename = filename
+        self.size = size
+        self.offset = 0
+        # Hashed as chunks arrive, so commit never rereads the file
+        self.hash = hashlib.sha256()
+        # Set when the content is already stored and no data needs sending
+        self.sha256 = None
+        self.deduplicated = False
+        # (offset, length) the client must prove it has, if it may skip sending
+        self.proof = None
+        # Own descriptor for the target folder, held until commit or abort
+        self.dir_fd = os.dup(dir_fd)
+        self.temp_name = f"{UPLOAD_TEMP_PREFIX}{upload_id}.part"
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def status(self):
+        return {
+            "upload_id": self.id,
+            "folder": self.folder,
+            "filename": self.filename,
+            "size": self.size,
+            "offset": self.offset,
+            "deduplicated": self.deduplicated,
+            "proof": (
+                {"offset": self.proof[0], "length": self.proof[1]}
+                if self.proof
+                else None
+            ),
+        }
+
+
+class UploadManager:
+    """
+    Resumable chunked uploads.
+
+    Each upload writes straight into a hidden temp file in its target
+    folder, so commit is a single atomic rename. Chunks must arrive at the
+    session's current offset; after a dropped connection the client asks
+    for the offset and resends from there. Sessions are independent, so
+    several files can upload in parallel.
+
+    Committed files go through the blob store. A client that sends the
+    file's SHA-256 up front, when that content is stored already, is asked
+    for a server-chosen range of the file instead of all of it. If prove()
+    gets the right bytes the session is complete without sending any data.
+    A hash alone never completes a session, since anyone who has seen one
+    (e.g. of a file in a locked folder) could otherwise copy its content.
+    """
+
+    def __init__(
+        self, max_file_size=MAX_FILE_SIZE, expiry=UPLOAD_EXPIRY, blobs=blob_store
+    ):
+        self.max_file_size = max_file_size
+        self.expiry = expiry
+        self.blobs = blobs
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, folder, dir_fd, filename, size, sha256=None):
+        """Start an upload into the folder open as dir_fd."""
+        if size < 0:
+            raise UploadError("Invalid size")
+        if size > self.max_file_size:
+            raise UploadError(
+                f"File size exceeds {self.max_file_size / (1024*1024)}MB limit", 413
+            )
+        self.expire_stale()
+        known = self.blobs.has(sha256, size)
+
+        upload_id = uuid.uuid4().hex
+        session = UploadSession(upload_id, folder, filename, size, dir_fd)
+        try:
+            self._create_temp(session)
+        except Exception:
+            os.close(session.dir_fd)
+            raise
+        if known:
+            length = min(PROOF_SIZE, size)
+            session.sha256 = sha256
+            session.proof = (secrets.randbelow(size - length + 1), length)
+        with self._lock:
+            self._sessions[session.id] = session
+        return session
+
+    def pending_bytes(self, folder="", unwritten=True):
+        """
+        Bytes still reserved by unfinished uploads in or below a folder.
+
+        By default that is what they have yet to write: the rest is on disk
+        already, and proven uploads write nothing. With unwritten=False it
+        is their whole size, as quotas count it, since the catalog only sees
+        a file once it is committed.
+        """
+        prefix = f"{folder}/"
+        with self._lock:
+            sessions = [
+                s
+                for s in self._sessions.values()
+                if not folder or s.folder == folder or s.folder.startswith(prefix)
+            ]
+        if not unwritten:
+            return sum(s.size for s in sessions)
+        return sum(s.size - s.offset for s in sessions if not s.deduplicated)
+
+    def _create_temp(self, session):
+        fd = os.open(
+            session.temp_name,
+            os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW,
+            0o644,
+            dir_fd=session.dir_fd,
+        )
+        os.close(fd)
+
+    def get(self, upload_id):
+        with self._lock:
+            session = self._sessions.get(upload_id)
+        if session is None:
+            raise UploadError("Upload not found", 404)
+        return session
+
+    def _check_open(self, session):
+        """
+        Raise if the session was committed, aborted or expired while the
+        caller waited for its lock; its dir_fd is closed by then.
+        """
+        with self._lock:
+            if self._sessions.get(session.id) is not session:
+                raise UploadError("Upload not found", 404)
+
+    def _discard(self, session):
+        """Drop a session and its data. The caller holds session.lock."""
+        with self._lock:
+            self._sessions.pop(session.id, None)
+        try:
+            if not session.deduplicated:
+                os.unlink(session.temp_name, dir_fd=session.dir_fd)
+        except FileNotFoundError:
+            pass
+        finally:
+            os.close(session.dir_fd)
+
+    def append(self, session, offset, stream, length=None):
+        """
+        Write a chunk from a stream at the given offset.
+
+        Bytes are counted as they arrive, so a chunk that would run past the
+        declared size is cut off before anything beyond it is written. If
+        the stream breaks midway, the bytes already written still count and
+        the offset reflects them.
+
+        Returns:
+            int: the new offset
+        """
+        if not session.lock.acquire(blocking=False):
+            raise UploadError("Another chunk is being written", 409)
+        try:
+            self._check_open(session)
+            # Proven uploads have no temp file left to write to
+            if session.deduplicated or session.offset == session.size:
+                raise UploadError("Upload is complete", 409, offset=session.offset)
+            if offset != session.offset:
+                raise UploadError("Offset mismatch", 409, offset=session.offset)
+            if length is not None and offset + length > session.size:
+                raise UploadError("Chunk exceeds declared size", 413)
+
+            fd = os.open(
+                session.temp_name, os.O_WRONLY | os.O_NOFOLLOW, dir_fd=session.dir_fd
+            )
+            with os.fdopen(fd, "wb") as f:
+                f.seek(offset)
+                try:
+                    while True:
+                        block = stream.read(STREAM_BLOCK_SIZE)
+                        if not block:
+                            break
+                        if session.offset + len(block) > session.size:
+                            raise UploadError("Chunk exceeds declared size", 413)
+                        f.write(block)
+                        session.hash.update(block)
+                        session.offset += len(block)
+                finally:
+                    f.flush()
+                    session.updated_at = time.monotonic()
+            return session.offset
+        finally:
+            session.lock.release()
+
+    def prove(self, session, data):
+        """
+        Complete a session from stored content, given the bytes of the file
+        in the range session.proof asked for. There is one attempt; after a
+        mismatch the data has to be sent.
+        """
+        with session.lock:
+            self._check_open(session)
+            proof, session.proof = session.proof, None
+            if proof is None or session.offset != 0:
+                raise UploadError("No proof requested", 409)
+            offset, length = proof
+            expected = self.blobs.read(session.sha256, session.size, offset, length)
+            if expected is None or not hmac.compare_digest(data, expected):
+                raise UploadError("Proof does not match", 403, offset=0)
+            try:
+                os.unlink(session.temp_name, dir_fd=session.dir_fd)
+            except FileNotFoundError:
+                pass
+            session.offset = session.size
+            session.deduplicated = True
+            session.updated_at = time.monotonic()
+
+    def commit(self, session, folder_fd):
+        """
+        Move a complete upload into place under its filename.
+
+        Args:
+            folder_fd: the session's folder as its path resolves now, or None
+                if it doesn't. If that's no longer the folder the upload
+                started in (it was moved, deleted or replaced), the upload
+                is dropped rather than landing wherever the folder went.
+        """
+        with session.lock:
+            self._check_open(session)
+            if folder_fd is None or not os.path.samestat(
+                os.fstat(session.dir_fd), os.fstat(folder_fd)
+            ):
+                self._discard(session)
+                raise UploadError("The upload's folder was moved or deleted", 410)
+            if session.offset != session.size:
+                raise UploadError("Upload incomplete", 409, offset=session.offset)
+            if session.deduplicated:
+                if not self.blobs.link_existing(
+                    session.sha256, session.size, session.filename, session.dir_fd
+                ):
+                    # The stored copy went away; the data has to be sent after all
+                    session.deduplicated = False
+                    session.offset = 0
+                    self._create_temp(session)
+                    raise UploadError("Upload incomplete", 409, offset=0)
+            else:
+                fd = os.open(session.temp_name, os.O_RDONLY, dir_fd=session.dir_fd)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                self.blobs.commit(
+                    session.temp_name,
+                    session.filename,
+                    session.hash.hexdigest(),
+                    session.dir_fd,
+                )
+            with self._lock:
+                self._sessions.pop(session.id, None)
+            os.close(session.dir_fd)
+
+    def abort(self, session):
+        with session.lock:
+            try:
+                self._check_open(session)
+            except UploadError:
+                return  # already gone, e.g. expired while we waited
+            self._discard(session)
+
+    def save(self, stream, dir_fd, filename):
+        """Store a whole file from a stream, as for single-request uploads."""
+        temp_name = f"{UPLOAD_TEMP_PREFIX}{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        fd = os.open(
+            temp_name,
+            os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW,
+            0o644,
+            dir_fd=dir_fd,
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    block = stream.read(STREAM_BLOCK_SIZE)
+                    if not block:
+                        break
+                    f.write(block)
+                    digest.update(block)
+                f.flush()
+                os.fsync(f.fileno())
+            self.blobs.commit(temp_name, filename, digest.hexdigest(), dir_fd)
+        except BaseException:
+            try:
+                os.unlink(temp_name, dir_fd=dir_fd)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def sweep(self, root=UPLOAD_DIR):
+        """
+        Remove temp files of uploads that were unfinished when the server
+        last stopped; sessions only live in memory, so they can't resume.
+        Files from after the call started are left alone, so uploads can
+        begin while it runs.
+
+        Returns:
+            int: number of files removed
+        """
+        # File times come from a coarser clock that can lag time.time()
+        cutoff = time.time() - 1
+        removed = 0
+        for _, dirs, files, dir_fd in os.fwalk(root):
+            # The trash and blob store hold no upload temp files of their own
+            dirs[:] = [name for name in dirs if not is_internal_name(name)]
+            for name in files:
+                if not (name.startswith(UPLOAD_TEMP_PREFIX) and name.endswith(".part")):
+                    continue
+                try:
+                    if os.lstat(name, dir_fd=dir_fd).st_mtime < cutoff:
+                        os.unlink(name, dir_fd=dir_fd)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def sweep_async(self):
+        """Run sweep() in the background."""
+
+        def run():
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Upload sweep failed: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def expire_stale(self):
+        cutoff = time.monotonic() - self.expiry
+        with self._lock:
+            stale = [s for s in self._sessions.values() if s.updated_at < cutoff]
+        for session in stale:
+            self.abort(session)
+
+
+upload_manager = UploadManager()
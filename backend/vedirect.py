@@ -0,0 +1,82 @@
+"""
+Parser for the VE.Direct text protocol the SmartShunt speaks over serial.
+
+Kept apart from hardware.smartshunt so it can be tested and benchmarked on
+recorded streams without pyserial or the device.
+"""
+
+from util import (
+    convert_to_float,
+    convert_to_percentage,
+    convert_minutes_to_duration,
+)
+
+readable = {
+    "V": "voltage",
+    "I": "current",
+    "P": "power",
+    "SOC": "state_of_charge_percent",
+    "CE": "consumed_ah",
+    "TTG": "time_to_go_min",
+}
+
+converter_map = {
+    "V": convert_to_float,
+    "I": convert_to_float,
+    "CE": convert_to_float,
+    "SOC": convert_to_percentage,
+    "TTG": convert_minutes_to_duration,
+}
+
+# Maximum number of lines to read before giving up on a frame
+MAX_FRAME_LINES = 100
+
+
+def read_frame(readline, max_lines=MAX_FRAME_LINES, fatal=()):
+    """
+    Read fields until the end of a frame, marked by its Checksum field.
+
+    Args:
+        readline: returns the next line as bytes, like serial.Serial.readline
+        max_lines: lines read before giving up without a Checksum
+        fatal: exceptions from readline that end the frame, e.g. the port
+            going away; any other error only skips the line
+
+    Returns:
+        tuple: (fields by readable name, number of lines skipped)
+    """
+    data = {}
+    lines_read = 0
+    skipped = 0
+
+    while lines_read < max_lines:
+        try:
+            line = readline().decode("utf-8", errors="ignore").strip()
+            if not line or "\t" not in line:
+                lines_read += 1
+                skipped += 1
+                continue
+            key, value = line.split("\t", 1)
+
+            converter = converter_map.get(key)
+            if converter:
+                value = converter(value)
+
+            data[readable.get(key) or key] = value
+
+            # End of a frame is usually marked by 'Checksum'
+            if key == "Checksum":
+                break
+            lines_read += 1
+        except fatal as e:
+            print(f"Serial error reading line: {e}")
+            break  # Break on serial errors (device disconnected, etc.)
+        except Exception as e:
+            print(f"Error reading line: {e}")
+            lines_read += 1
+            skipped += 1
+            continue
+
+    if lines_read >= max_lines:
+        print(f"Warning: Read {max_lines} lines without receiving Checksum")
+    return data, skipped
@@ -4,13 +4,19 @@ import requests
 from .config import API_HOST
 
 
+# One session, so commands reuse the connection to the API instead of
+# setting up a new one (and a TLS handshake) every time
+_session = requests.Session()
+_session.verify = False
+
+
 def _make_request(method, endpoint, json_data=None):
     """Make HTTP request to API."""
     url = f"{API_HOST}{endpoint}"
     if method == "GET":
-        return requests.get(url, verify=False)
+        return _session.get(url)
     elif method == "POST":
-        return requests.post(url, verify=False, json=json_data)
+        return _session.post(url, json=json_data)
     else:
         raise ValueError(f"Unsupported method: {method}")
 
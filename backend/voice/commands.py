@@ -0,0 +1,110 @@
+"""Spoken phrases and how they are matched to commands."""
+
+from difflib import get_close_matches
+
+# Phrases for each command, including what speech recognition tends to hear
+COMMAND_ALIASES = {
+    "toggle_inverter": [
+        "toggle inverter",
+        "toggle her",
+        "toggling her",
+        "try and murder",
+        "time to cook",
+        "time to cut",
+        "let's cook",
+        "let's go",
+        "what's cook",
+        "what cook",
+        "done cooking",
+        "it's correct",
+        "what",
+        "let's go",
+        "that's good",
+        "i'm hungry",
+        "who",
+        "food",
+        "i'm done",
+        "done",
+        "don't okay",
+        "reverse",
+        "reverse the polarity",
+        "the polarity",
+        "turn on lights",
+        "turn off lights",
+        "my",
+        "right",
+        "online",
+        "my",
+        "turn off boy",
+        "like",
+        "right",
+        "lights",
+        "the way",
+        "good night",
+        "the morning",
+    ],
+    "toggle_fan": ["fan", "ben", "then", "bench", "van", "the fan", "there", "when"],
+    "get_inverter_status": [
+        "status",
+        "inverter status",
+        "check inverter",
+        "is inverter on",
+        "inverter on",
+        "inverter off",
+        "what's the inverter",
+        "inverter state",
+        "status inverter",
+    ],
+    "get_battery_data": [
+        "voltage",
+        "numbers",
+        "battery",
+        "battery status",
+        "battery data",
+        "check battery",
+        "battery voltage",
+        "battery charge",
+        "state of charge",
+        "how's the battery",
+        "battery info",
+        "battery level",
+        "what's the battery",
+    ],
+    "disable_listening": [
+        "off",
+        "stop",
+        "quit",
+        "disable listening",
+        "disable microphone",
+        "privacy mode",
+        "stop listening",
+        "turn off microphone",
+        "mute microphone",
+        "disable wake word",
+        "turn off wake word",
+    ],
+}
+
+# Every phrase -> its command; a phrase listed twice belongs to the last one
+PHRASE_TO_COMMAND = {
+    phrase.lower(): command
+    for command, phrases in COMMAND_ALIASES.items()
+    for phrase in phrases
+}
+
+
+def match_command(spoken_text):
+    """
+    The command for a transcript: an exact phrase, or failing that the
+    closest phrase if it's similar enough.
+
+    Returns:
+        command name, or None if nothing matches
+    """
+    spoken_text = spoken_text.lower()
+    if spoken_text in PHRASE_TO_COMMAND:
+        return PHRASE_TO_COMMAND[spoken_text]
+    close = get_close_matches(spoken_text, PHRASE_TO_COMMAND.keys(), n=1, cutoff=0.8)
+    if close:
+        return PHRASE_TO_COMMAND[close[0]]
+    return None
@@ -27,3 +27,7 @@ CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", "0.7"))
 TTS_VOICE_ID = os.getenv("TTS_VOICE_ID", None) or None  # None = system default
 TTS_RATE = int(os.getenv("TTS_RATE", "150"))  # Words per minute
 TTS_VOLUME = float(os.getenv("TTS_VOLUME", "0.9"))  # 0.0 to 1.0
+
+# Audio-reactive LEDs: stream band levels from the microphone to the LED controller
+AUDIO_REACTIVE = os.getenv("AUDIO_REACTIVE", "false").lower() == "true"
+AUDIO_REACTIVE_PORT = int(os.getenv("AUDIO_REACTIVE_PORT", "5055"))
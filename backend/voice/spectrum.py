@@ -0,0 +1,134 @@
+"""Band energy analysis of the microphone stream for audio-reactive LEDs."""
+
+import os
+import queue
+import socket
+import threading
+
+import numpy as np
+
+from .config import RATE, AUDIO_REACTIVE_PORT
+
+
+class SpectrumAnalyzer:
+    """
+    Computes smoothed, normalized band levels from 16-bit PCM blocks.
+
+    Each block is shifted into a sliding window, so with the default
+    1024-sample window and 512-sample capture blocks consecutive FFTs
+    overlap by half and a new set of levels is produced every 32ms at 16kHz.
+    """
+
+    def __init__(
+        self,
+        rate=RATE,
+        window_size=1024,
+        num_bands=16,
+        min_freq=60.0,
+        max_freq=None,
+        decay=0.85,
+        floor_db=-60.0,
+    ):
+        self.num_bands = num_bands
+        self.decay = decay
+        self.floor_db = floor_db
+        self._window = np.hanning(window_size).astype(np.float32)
+        self._samples = np.zeros(window_size, dtype=np.float32)
+        self._levels = np.zeros(num_bands, dtype=np.float32)
+        self._peak_db = floor_db + 1.0
+
+        # Log-spaced band edges mapped to FFT bins once, so each frame is a
+        # single reduceat over the power spectrum instead of a Python loop
+        freqs = np.fft.rfftfreq(window_size, 1.0 / rate)
+        edges = np.geomspace(min_freq, max_freq or rate / 2, num_bands + 1)
+        starts = np.searchsorted(freqs, edges[:-1])
+        for i in range(1, num_bands):
+            # Low bands can be narrower than one bin; give each at least one
+            starts[i] = max(starts[i], starts[i - 1] + 1)
+        self._band_starts = starts
+        widths = np.diff(np.append(starts, len(freqs)))
+        self._band_scale = (1.0 / np.maximum(widths, 1)).astype(np.float32)
+
+    def process(self, pcm):
+        """
+        Shift a block of int16 PCM bytes into the window and analyze it.
+
+        Returns:
+            float32 array of num_bands levels in the range 0.0 to 1.0
+        """
+        block = np.frombuffer(pcm, dtype=np.int16)
+        if len(block) == 0:
+            return self._levels
+        n = min(len(block), len(self._samples))
+        self._samples[:-n] = self._samples[n:]
+        self._samples[-n:] = block[-n:] * (1.0 / 32768.0)
+
+        spectrum = np.fft.rfft(self._samples * self._window)
+        power = spectrum.real**2 + spectrum.imag**2
+        energies = np.add.reduceat(power, self._band_starts) * self._band_scale
+        db = 10.0 * np.log10(energies + 1e-12)
+
+        # Automatic gain: follow the loudest band, falling back slowly
+        released = self._peak_db * self.decay + self.floor_db * (1 - self.decay)
+        self._peak_db = max(float(db.max()), released)
+        span = max(self._peak_db - self.floor_db, 1.0)
+        levels = np.clip((db - self.floor_db) / span, 0.0, 1.0).astype(np.float32)
+
+        # Fast attack, slow release keeps the strip from flickering
+        np.maximum(levels, self._levels * self.decay, out=self._levels)
+        return self._levels
+
+
+class LevelsPublisher:
+    """Sends band levels to the LED controller as UDP datagrams."""
+
+    def __init__(self, host="127.0.0.1", port=AUDIO_REACTIVE_PORT):
+        self.address = (host, port)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    def send(self, levels):
+        try:
+            self._sock.sendto(levels.astype(np.float32).tobytes(), self.address)
+        except OSError:
+            # Nobody listening or buffer full; drop the frame
+            pass
+
+
+class AudioReactiveWorker:
+    """
+    Runs the analyzer on its own low-priority thread.
+
+    The audio callback only hands blocks over through a small bounded queue
+    and never waits, so wake word detection keeps its own queue untouched.
+    """
+
+    def __init__(self, analyzer=None, publisher=None, max_pending=4):
+        self.analyzer = analyzer or SpectrumAnalyzer()
+        self.publisher = publisher or LevelsPublisher()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def put(self, pcm):
+        """Queue a PCM block for analysis, dropping it if the worker is behind."""
+        try:
+            self._queue.put_nowait(pcm)
+        except queue.Full:
+            pass
+
+    def _run(self):
+        try:
+            # Linux applies nice values per thread
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (AttributeError, OSError):
+            pass
+
+        while True:
+            pcm = self._queue.get()
+            try:
+                self.publisher.send(self.analyzer.process(pcm))
+            except Exception as e:
+                print(f"Audio reactive analysis failed: {e}")
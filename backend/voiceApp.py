@@ -9,103 +9,22 @@ import os
 from dotenv import load_dotenv
 from time import sleep
 from threading import Timer
-from difflib import get_close_matches
 
 from voice.config import (
     VOSK_MODEL_PATH,
     WAKE_WORD,
     RATE,
     CHANNELS,
+    AUDIO_REACTIVE,
 )
 from voice.audio_manager import AudioQueue
 from voice.tts_service import TTSService
 from voice.command_executor import execute_command
 from voice.llm_service import LLMService
+from voice.commands import match_command
 
 load_dotenv()
 
-# Command mapping for voice commands
-COMMAND_ALIASES = {
-    "toggle_inverter": [
-        "toggle inverter",
-        "toggle her",
-        "toggling her",
-        "try and murder",
-        "time to cook",
-        "time to cut",
-        "let's cook",
-        "let's go",
-        "what's cook",
-        "what cook",
-        "done cooking",
-        "it's correct",
-        "what",
-        "let's go",
-        "that's good",
-        "i'm hungry",
-        "who",
-        "food",
-        "i'm done",
-        "done",
-        "don't okay",
-        "reverse",
-        "reverse the polarity",
-        "the polarity",
-        "turn on lights",
-        "turn off lights",
-        "my",
-        "right",
-        "online",
-        "my",
-        "turn off boy",
-        "like",
-        "right",
-        "lights",
-        "the way",
-        "good night",
-        "the morning",
-    ],
-    "toggle_fan": ["fan", "ben", "then", "bench", "van", "the fan", "there", "when"],
-    "get_inverter_status": [
-        "status",
-        "inverter status",
-        "check inverter",
-        "is inverter on",
-        "inverter on",
-        "inverter off",
-        "what's the inverter",
-        "inverter state",
-        "status inverter",
-    ],
-    "get_battery_data": [
-        "voltage",
-        "numbers",
-        "battery",
-        "battery status",
-        "battery data",
-        "check battery",
-        "battery voltage",
-        "battery charge",
-        "state of charge",
-        "how's the battery",
-        "battery info",
-        "battery level",
-        "what's the battery",
-    ],
-    "disable_listening": [
-        "off",
-        "stop",
-        "quit",
-        "disable listening",
-        "disable microphone",
-        "privacy mode",
-        "stop listening",
-        "turn off microphone",
-        "mute microphone",
-        "disable wake word",
-        "turn off wake word",
-    ],
-}
 
 def disable_listening():
     """Disable wake word listening for 60 minutes."""
@@ -137,15 +56,6 @@ COMMAND_FUNCTIONS = {
     "disable_listening": disable_listening,
 }
 
-COMMAND_MAP = {}
-# Map handler functions back to command names for logging
-HANDLER_TO_COMMAND = {}
-for command_key, phrases in COMMAND_ALIASES.items():
-    func = COMMAND_FUNCTIONS[command_key]
-    HANDLER_TO_COMMAND[func] = command_key
-    for phrase in phrases:
-        COMMAND_MAP[phrase.lower()] = func
-
 
 def get_command_handler(spoken_text):
     """
@@ -154,28 +64,18 @@ def get_command_handler(spoken_text):
     Returns:
         tuple: (handler_function, command_name) or (None, None) if no match
     """
-    spoken_text = spoken_text.lower()
-    handler = None
-    matched_phrase = None
-
-    if spoken_text in COMMAND_MAP:
-        handler = COMMAND_MAP[spoken_text]
-        matched_phrase = spoken_text
-    else:
-        close = get_close_matches(spoken_text, COMMAND_MAP.keys(), n=1, cutoff=0.8)
-        if close:
-            matched_phrase = close[0]
-            handler = COMMAND_MAP[matched_phrase]
-
-    if handler:
-        command_name = HANDLER_TO_COMMAND.get(handler, "unknown")
-        return (handler, command_name)
-    return (None, None)
+    command_name = match_command(spoken_text)
+    if command_name is None:
+        return (None, None)
+    return (COMMAND_FUNCTIONS[command_name], command_name)
 
 
 # Global audio queue (initialized in main)
 audio_queue = None
 
+# Audio-reactive LED analyzer fed from the same capture (initialized in main)
+audio_reactive = None
+
 # Global flag to prevent wake word detection during command processing
 command_in_progress = False
 
@@ -245,8 +145,11 @@ def safe_speak(tts_service, text, blocking=False, cooldown=0.8):
 
 def audio_callback(indata, frames, time, status):
     """Audio callback for sounddevice."""
+    pcm = bytes(indata)
     if audio_queue:
-        audio_queue.put(bytes(indata))
+        audio_queue.put(pcm)
+    if audio_reactive:
+        audio_reactive.put(pcm)
 
 
 def _listen_for_speech(recognizer, audio_queue, timeout=4):
@@ -453,9 +356,16 @@ def main():
     print("Initializing LLM service...")
     llm_service = LLMService()
 
-    global audio_queue
+    global audio_queue, audio_reactive
     audio_queue = AudioQueue()
 
+    if AUDIO_REACTIVE:
+        from voice.spectrum import AudioReactiveWorker
+
+        print("Starting audio-reactive LED analyzer...")
+        audio_reactive = AudioReactiveWorker()
+        audio_reactive.start()
+
     print("Ready and listening...")
 
     with sd.RawInputStream(
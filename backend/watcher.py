@@ -0,0 +1,232 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+import time
+
+from files import UPLOAD_DIR, is_internal_name
+
+# Changes are delivered once the tree has been quiet for this long...
+WATCH_QUIET_SECONDS = 0.5
+# ...or this long after the first one, so a long copy still shows progress
+WATCH_MAX_DELAY_SECONDS = 2.0
+
+# From <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+# Writes in progress (IN_MODIFY) are left out; a file counts once it's closed
+WATCH_MASK = (
+    IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_ONLYDIR
+    | IN_DONT_FOLLOW
+)
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+def _load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_libc = _load_libc()
+
+
+def _join(folder, name):
+    return f"{folder}/{name}" if folder else name
+
+
+class TreeWatcher:
+    """
+    Watches UPLOAD_DIR and every folder below it with inotify.
+
+    Events are folded into the set of folders whose direct contents changed
+    and handed to on_change(folders, created, reset) once the tree has been
+    quiet for WATCH_QUIET_SECONDS, or WATCH_MAX_DELAY_SECONDS into a burst.
+    created holds folders that appeared along with their contents (e.g.
+    moved in); reset means the kernel queue overflowed and anything may have
+    changed. Internal files and folders are ignored. Between changes the
+    thread sleeps in poll() without a timeout.
+    """
+
+    def __init__(
+        self,
+        root=UPLOAD_DIR,
+        quiet=WATCH_QUIET_SECONDS,
+        max_delay=WATCH_MAX_DELAY_SECONDS,
+    ):
+        self.root = root
+        self.quiet = quiet
+        self.max_delay = max_delay
+        self.on_change = None
+        self._fd = None
+        self._wake_r = self._wake_w = None
+        self._wds = {}  # watch descriptor -> folder
+        self._thread = None
+        self._stopping = False
+
+    def _add_watch(self, folder):
+        full_path = os.path.join(self.root, folder) if folder else self.root
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(full_path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                print(
+                    "inotify watch limit reached, some folders aren't watched; "
+                    "raise fs.inotify.max_user_watches"
+                )
+            # Anything else means it is gone or became a symlink or a file
+            return False
+        self._wds[wd] = folder
+        return True
+
+    def _add_tree(self, folder):
+        """Watch folder and every folder below it."""
+        pending = [folder]
+        while pending:
+            current = pending.pop()
+            # Watch before listing, so nothing created in between is missed
+            if not self._add_watch(current):
+                continue
+            full_path = os.path.join(self.root, current) if current else self.root
+            try:
+                with os.scandir(full_path) as it:
+                    for entry in it:
+                        if is_internal_name(entry.name):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(_join(current, entry.name))
+            except OSError:
+                continue
+
+    def _forget_tree(self, folder):
+        prefix = f"{folder}/"
+        for wd, watched in list(self._wds.items()):
+            if watched == folder or watched.startswith(prefix):
+                del self._wds[wd]
+                _libc.inotify_rm_watch(self._fd, wd)
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            yield wd, mask, name
+
+    def _handle(self, wd, mask, name, folders, created):
+        """Fold one event into folders/created. Returns True on overflow."""
+        if mask & IN_Q_OVERFLOW:
+            return True
+        folder = self._wds.get(wd)
+        if folder is None:
+            return False
+        if mask & IN_IGNORED:
+            # The folder itself was removed or moved away
+            del self._wds[wd]
+            return False
+        if not name or is_internal_name(name):
+            return False
+
+        folders.add(folder)
+        if mask & IN_ISDIR:
+            child = _join(folder, name)
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(child)
+                created.add(child)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._forget_tree(child)
+                # Clients looking at it need to know it's gone
+                folders.add(child)
+        return False
+
+    def _run(self):
+        poller = select.poll()
+        poller.register(self._fd, select.POLLIN)
+        poller.register(self._wake_r, select.POLLIN)
+        while not self._stopping:
+            poller.poll()
+            folders, created, reset = set(), set(), False
+            deadline = time.monotonic() + self.max_delay
+            while not self._stopping:
+                for wd, mask, name in self._read_events():
+                    reset = self._handle(wd, mask, name, folders, created) or reset
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                ready = poller.poll(min(self.quiet, remaining) * 1000)
+                if not any(fd == self._fd for fd, _ in ready):
+                    break
+            if self._stopping:
+                break
+            if reset:
+                # Folders created during the overflow may be unwatched
+                self._add_tree("")
+            if (folders or created or reset) and self.on_change is not None:
+                try:
+                    self.on_change(folders, created, reset)
+                except Exception as e:
+                    print(f"Handling upload changes failed: {e}")
+        os.close(self._fd)
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def start(self):
+        """Start watching in the background. Returns False without inotify."""
+        if self._thread is not None:
+            return True
+        if _libc is None:
+            print("inotify unavailable, upload changes won't be pushed")
+            return False
+        fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            print(f"inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+            return False
+        self._fd = fd
+        self._wake_r, self._wake_w = os.pipe()
+        self._add_tree("")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping = True
+        os.write(self._wake_w, b"x")
+        self._thread.join()
+        self._thread = None
+
+
+watcher = TreeWatcher()
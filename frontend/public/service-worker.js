@@ -1,4 +1,4 @@
-const CACHE_NAME = 'van-ui-cache-v1';
+const CACHE_NAME = 'van-ui-cache-v2';
 const ASSETS = ['/', '/index.html', '/manifest.json', '/icons/192x192.png'];
 
 self.addEventListener('install', (event) => {
@@ -9,7 +9,37 @@ self.addEventListener('install', (event) => {
   );
 });
 
+self.addEventListener('activate', (event) => {
+  event.waitUntil(
+    caches
+      .keys()
+      .then((names) =>
+        Promise.all(
+          names
+            .filter((name) => name !== CACHE_NAME)
+            .map((name) => caches.delete(name))
+        )
+      )
+  );
+});
+
 self.addEventListener('fetch', (event) => {
+  // Pages come from the network first: they name the current hashed
+  // bundle, which a rebuild replaces. The cached copy is for offline only.
+  if (event.request.mode === 'navigate') {
+    event.respondWith(
+      fetch(event.request)
+        .then((response) => {
+          if (response.ok) {
+            const copy = response.clone();
+            caches.open(CACHE_NAME).then((cache) => cache.put('/', copy));
+          }
+          return response;
+        })
+        .catch(() => caches.match('/'))
+    );
+    return;
+  }
   event.respondWith(
     caches
       .match(event.request)
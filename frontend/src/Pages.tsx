@@ -9,12 +9,14 @@ import LogoColor from '@root/assets/images/logo3.png';
 import {theme} from '@root/App';
 import Battery from '@root/features/battery/Battery';
 import FileManager from '@root/features/files/FileManager';
+import useDeviceStates from '@root/features/control/useDeviceStates';
 import {useKillAppMutation} from './api';
 
 const Pages = () => {
   const [pageNumber, setPageNumber] = useState(1);
 
   const [killApp] = useKillAppMutation();
+  useDeviceStates();
   return (
     <Box
       sx={{
@@ -0,0 +1,129 @@
+import {createBaseUrl} from '@root/util/api';
+
+export const CONTROL_URL = '/control';
+
+// Milliseconds to wait for an ack before giving up on a command
+const COMMAND_TIMEOUT = 5000;
+const MAX_RECONNECT_DELAY = 10000;
+
+export type ControlCommand =
+  | 'inverter.toggle'
+  | 'inverter.status'
+  | 'fan.toggle';
+
+export type ControlMessage =
+  | {type: 'hello'; state: Record<string, unknown>}
+  | {type: 'state'; device: string; state: unknown}
+  | {
+      type: 'ack';
+      id: number | null;
+      ok: boolean;
+      result?: unknown;
+      error?: string;
+    };
+
+type StateListener = (device: string, state: unknown) => void;
+
+interface Pending {
+  resolve: (result: unknown) => void;
+  reject: (error: Error) => void;
+  timer: ReturnType<typeof setTimeout>;
+}
+
+const controlUrl = () => {
+  const url = new URL(createBaseUrl(CONTROL_URL), window.location.href);
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+  return url.toString();
+};
+
+// One WebSocket for the page: device commands go out with an id and resolve
+// when the server acks them, and state changes from any client come back as
+// events. Reconnects with backoff whenever the connection drops.
+class ControlChannel {
+  private socket: WebSocket | null = null;
+  private nextId = 1;
+  private pending = new Map<number, Pending>();
+  private listeners = new Set<StateListener>();
+  private reconnectDelay = 500;
+
+  isOpen() {
+    return this.socket?.readyState === WebSocket.OPEN;
+  }
+
+  connect() {
+    if (typeof WebSocket === 'undefined' || this.socket) {
+      return;
+    }
+    const socket = new WebSocket(controlUrl());
+    this.socket = socket;
+    socket.onopen = () => {
+      this.reconnectDelay = 500;
+    };
+    socket.onmessage = (event) =>
+      this.receive(JSON.parse(event.data) as ControlMessage);
+    socket.onclose = () => {
+      this.socket = null;
+      this.pending.forEach(({reject, timer}) => {
+        clearTimeout(timer);
+        reject(new Error('Control channel closed'));
+      });
+      this.pending.clear();
+      setTimeout(() => this.connect(), this.reconnectDelay);
+      this.reconnectDelay = Math.min(
+        this.reconnectDelay * 2,
+        MAX_RECONNECT_DELAY
+      );
+    };
+  }
+
+  send<T>(command: ControlCommand, args?: Record<string, unknown>): Promise<T> {
+    if (!this.socket || !this.isOpen()) {
+      return Promise.reject(new Error('Control channel is not connected'));
+    }
+    const id = this.nextId++;
+    const socket = this.socket;
+    return new Promise<T>((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`No reply to ${command}`));
+      }, COMMAND_TIMEOUT);
+      this.pending.set(id, {
+        resolve: resolve as (result: unknown) => void,
+        reject,
+        timer,
+      });
+      socket.send(JSON.stringify({id, command, args}));
+    });
+  }
+
+  // Calls listener with every device state change; returns an unsubscribe
+  onState(listener: StateListener) {
+    this.listeners.add(listener);
+    return () => {
+      this.listeners.delete(listener);
+    };
+  }
+
+  private receive(message: ControlMessage) {
+    if (message.type === 'hello') {
+      Object.entries(message.state).forEach(([device, state]) =>
+        this.listeners.forEach((listener) => listener(device, state))
+      );
+    } else if (message.type === 'state') {
+      this.listeners.forEach((listener) =>
+        listener(message.device, message.state)
+      );
+    } else if (message.id !== null && this.pending.has(message.id)) {
+      const {resolve, reject, timer} = this.pending.get(message.id)!;
+      this.pending.delete(message.id);
+      clearTimeout(timer);
+      if (message.ok) {
+        resolve(message.result);
+      } else {
+        reject(new Error(message.error));
+      }
+    }
+  }
+}
+
+export const controlChannel = new ControlChannel();
@@ -0,0 +1,33 @@
+import {useEffect} from 'react';
+import {useDispatch} from 'react-redux';
+import dashboardApi from '@root/features/dashboard/api';
+import {AppDispatch} from '@root/store';
+import {controlChannel} from './channel';
+
+// Opens the control channel and applies state changes pushed by the server,
+// including ones made from other screens or by voice, to the cached
+// dashboard, so every client shows them without waiting for the next poll.
+const useDeviceStates = () => {
+  const dispatch = useDispatch<AppDispatch>();
+
+  useEffect(() => {
+    controlChannel.connect();
+    return controlChannel.onState((device, state) => {
+      if (device !== 'inverter') {
+        return;
+      }
+      const inverter = {data: state as {on: boolean}, age: 0, error: null};
+      dispatch(
+        dashboardApi.util.updateQueryData(
+          'getDashboard',
+          undefined,
+          (draft) => {
+            draft.inverter = inverter;
+          }
+        )
+      );
+    });
+  }, [dispatch]);
+};
+
+export default useDeviceStates;
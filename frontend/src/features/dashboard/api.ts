@@ -0,0 +1,36 @@
+import {createApi, fetchBaseQuery} from '@reduxjs/toolkit/query/react';
+import {createBaseUrl} from '@root/util/api';
+import {SmartShuntData} from '@root/features/smartshunt/api';
+import {LevelSensorData} from '@root/features/level_sensor/api';
+
+export const BASE_URL = '/dashboard';
+
+export interface SourceState<T> {
+  // Last good reading, kept when a later one fails or times out
+  data: T | null;
+  // Seconds since data was read, null if it never was
+  age: number | null;
+  error: string | null;
+}
+
+export interface DashboardData {
+  smartshunt: SourceState<SmartShuntData>;
+  level_sensor: SourceState<LevelSensorData>;
+  inverter: SourceState<{on: boolean}>;
+}
+
+const dashboardApi = createApi({
+  reducerPath: 'dashboard',
+  baseQuery: fetchBaseQuery({
+    baseUrl: createBaseUrl(BASE_URL),
+  }),
+  endpoints: (build) => ({
+    getDashboard: build.query<DashboardData, void>({
+      query: () => ({url: ``}),
+    }),
+  }),
+});
+
+export default dashboardApi;
+
+export const {useGetDashboardQuery} = dashboardApi;
@@ -55,9 +55,12 @@ export const FileItemCard = ({
         <Box sx={{textAlign: 'center', wordBreak: 'break-word'}}>
           <Text size="small">{file.name}</Text>
         </Box>
-        {file.type === 'file' && file.size && (
+        {!!file.size && (
           <Box sx={{opacity: 0.7}}>
-            <Text size="small">{formatFileSize(file.size)}</Text>
+            <Text size="small">
+              {formatFileSize(file.size)}
+              {file.type === 'folder' && file.files ? ` · ${file.files} files` : ''}
+            </Text>
           </Box>
         )}
         <Stack
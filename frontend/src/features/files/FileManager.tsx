@@ -24,6 +24,7 @@ import {CreateFolderDialog} from './CreateFolderDialog';
 import {PasswordDialog} from './PasswordDialog';
 import {DeleteConfirmDialog} from './DeleteConfirmDialog';
 import {Slideshow} from './Slideshow';
+import useFolderEvents from './useFolderEvents';
 
 const BASE_URL = '/files';
 
@@ -38,7 +39,6 @@ const FileManager = () => {
   const [lockedFolderToAccess, setLockedFolderToAccess] = useState<FileItem | null>(null);
   const [unlockTarget, setUnlockTarget] = useState<FileItem | null>(null);
   const [slideshowOpen, setSlideshowOpen] = useState(false);
-  const [currentSlideIndex, setCurrentSlideIndex] = useState(0);
   const toast = useToast();
 
   const {
@@ -47,6 +47,8 @@ const FileManager = () => {
     error: listError,
     refetch,
   } = useListFilesQuery(currentPath || undefined);
+  // Pick up changes made elsewhere without polling
+  useFolderEvents(currentPath, refetch);
 
   const [uploadFile] = useUploadFileMutation();
   const [createFolder] = useCreateFolderMutation();
@@ -251,7 +253,6 @@ const FileManager = () => {
       toast({message: 'No images in this folder', status: 'error'});
       return;
     }
-    setCurrentSlideIndex(0);
     setSlideshowOpen(true);
   }, [imageFiles.length, toast]);
 
@@ -328,13 +329,8 @@ const FileManager = () => {
 
       <Slideshow
         open={slideshowOpen}
-        images={imageFiles}
-        currentIndex={currentSlideIndex}
-        onClose={() => {
-          setSlideshowOpen(false);
-          setCurrentSlideIndex(0);
-        }}
-        onIndexChange={setCurrentSlideIndex}
+        path={currentPath}
+        onClose={() => setSlideshowOpen(false)}
       />
 
       <DeleteConfirmDialog
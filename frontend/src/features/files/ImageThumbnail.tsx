@@ -12,10 +12,10 @@ interface ImageThumbnailProps {
 
 export const ImageThumbnail = ({file}: ImageThumbnailProps) => {
   const [imageError, setImageError] = useState(false);
-  const imageUrl = `${createBaseUrl(BASE_URL)}/view/${file.path
+  const imageUrl = `${createBaseUrl(BASE_URL)}/thumb/${file.path
     .split('/')
     .map((segment) => encodeURIComponent(segment))
-    .join('/')}`;
+    .join('/')}?w=256`;
 
   if (imageError) {
     return <FileIcon width={48} height={48} />;
@@ -1,47 +1,94 @@
 import {Box, IconButton} from '@mui/material';
-import {useEffect} from 'react';
-import {FileItem} from './api';
-import {createBaseUrl} from '@root/util/api';
+import {useCallback, useEffect, useMemo, useRef, useState} from 'react';
+import filesApi, {SlideshowRequest, useGetSlideshowQuery} from './api';
 import {CloseIcon} from './icons';
 
-const BASE_URL = '/files';
+const SLIDE_INTERVAL = 5000;
+const PAGE_SIZE = 20;
+// Slides downloaded ahead of time so transitions never wait on the network
+const PRELOAD_COUNT = 3;
 
 interface SlideshowProps {
   open: boolean;
-  images: FileItem[];
-  currentIndex: number;
+  path: string;
+  recursive?: boolean;
+  order?: SlideshowRequest['order'];
   onClose: () => void;
-  onIndexChange: (index: number) => void;
 }
 
-export const Slideshow = ({
-  open,
-  images,
-  currentIndex,
-  onClose,
-  onIndexChange,
-}: SlideshowProps) => {
+export const Slideshow = ({open, path, recursive, order, onClose}: SlideshowProps) => {
+  const [offset, setOffset] = useState(0);
+  const [index, setIndex] = useState(0);
+  const preloaded = useRef<HTMLImageElement[]>([]);
+  const prefetchPage = filesApi.usePrefetch('getSlideshow');
+
+  // Sized for the display rather than the original photo
+  const width = useMemo(
+    () => Math.round(window.screen.width * (window.devicePixelRatio || 1)),
+    []
+  );
+  const pageRequest = useCallback(
+    (pageOffset: number): SlideshowRequest => ({
+      path: path || undefined,
+      recursive,
+      order,
+      offset: pageOffset,
+      limit: PAGE_SIZE,
+      w: width,
+      preload: PRELOAD_COUNT,
+    }),
+    [path, recursive, order, width]
+  );
+
+  const {currentData: page} = useGetSlideshowQuery(pageRequest(offset), {skip: !open});
+  const items = useMemo(() => page?.items ?? [], [page]);
+  // Start over from the first page after the last one
+  const nextOffset = page?.next_offset ?? 0;
+
   useEffect(() => {
-    if (!open || images.length === 0) {
-      return;
+    if (open) {
+      setOffset(0);
+      setIndex(0);
+    }
+  }, [open, path]);
+
+  const advance = useCallback(() => {
+    if (index + 1 < items.length) {
+      setIndex(index + 1);
+    } else {
+      setOffset(nextOffset);
+      setIndex(0);
     }
+  }, [index, items.length, nextOffset]);
 
-    const interval = setInterval(() => {
-      onIndexChange((currentIndex + 1) % images.length);
-    }, 5000);
+  useEffect(() => {
+    if (!open || items.length === 0) {
+      return;
+    }
+    const timeout = setTimeout(advance, SLIDE_INTERVAL);
+    return () => clearTimeout(timeout);
+  }, [open, items.length, advance]);
 
-    return () => clearInterval(interval);
-  }, [open, images.length, currentIndex, onIndexChange]);
+  // Load the next few slides, and the next page before it is needed
+  useEffect(() => {
+    if (!open || items.length === 0) {
+      return;
+    }
+    preloaded.current = items.slice(index + 1, index + 1 + PRELOAD_COUNT).map((item) => {
+      const img = new Image();
+      img.src = item.src;
+      return img;
+    });
+    if (index + PRELOAD_COUNT >= items.length - 1 && nextOffset !== offset) {
+      prefetchPage(pageRequest(nextOffset));
+    }
+  }, [open, items, index, offset, nextOffset, pageRequest, prefetchPage]);
 
-  if (!open || images.length === 0) {
+  if (!open || items.length === 0) {
     return null;
   }
 
-  const currentImage = images[currentIndex];
-  const imageUrl = `${createBaseUrl(BASE_URL)}/view/${currentImage.path
-    .split('/')
-    .map((segment) => encodeURIComponent(segment))
-    .join('/')}`;
+  const currentImage = items[Math.min(index, items.length - 1)];
 
   return (
     <Box
@@ -70,7 +117,7 @@ export const Slideshow = ({
       >
         <Box
           component="img"
-          src={imageUrl}
+          src={currentImage.src}
           alt={currentImage.name}
           sx={{
             maxWidth: '100%',
@@ -79,9 +126,7 @@ export const Slideshow = ({
           }}
           onError={() => {
             // Skip to next image if current one fails to load
-            setTimeout(() => {
-              onIndexChange((currentIndex + 1) % images.length);
-            }, 100);
+            setTimeout(advance, 100);
           }}
         />
         <IconButton
@@ -103,4 +148,3 @@ export const Slideshow = ({
     </Box>
   );
 };
-
@@ -3,6 +3,24 @@ import {createBaseUrl} from '@root/util/api';
 
 export const BASE_URL = '/files';
 
+// Uploads are sent in chunks so a dropped connection only resends one chunk
+const UPLOAD_CHUNK_SIZE = 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 5;
+// Larger files aren't hashed up front; hashing needs the whole file in memory
+const UPLOAD_HASH_MAX_SIZE = 256 * 1024 * 1024;
+
+// Lets the server skip the transfer when it already stores this content.
+// crypto.subtle only exists in secure contexts (https or localhost).
+const hashFile = async (file: File): Promise<string | undefined> => {
+  if (!window.crypto?.subtle || file.size > UPLOAD_HASH_MAX_SIZE) {
+    return undefined;
+  }
+  const digest = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, '0'))
+    .join('');
+};
+
 export interface FileItem {
   name: string;
   type: 'file' | 'folder';
@@ -10,6 +28,59 @@ export interface FileItem {
   modified?: string;
   path: string;
   locked?: boolean;
+  // Folders only: total files below them
+  files?: number;
+}
+
+export interface SearchItem extends FileItem {
+  kind: 'folder' | 'image' | 'video' | 'audio' | 'document' | 'other';
+  folder: string;
+  captured?: string;
+}
+
+export interface SearchFilesRequest {
+  q?: string;
+  prefix?: boolean;
+  path?: string;
+  type?: SearchItem['kind'];
+  sort?: 'name' | 'modified' | 'captured' | 'size';
+  order?: 'asc' | 'desc';
+  limit?: number;
+  offset?: number;
+}
+
+export interface SlideshowItem extends SearchItem {
+  // Display-sized image URL
+  src: string;
+}
+
+export interface SlideshowRequest {
+  path?: string;
+  recursive?: boolean;
+  order?: 'name' | 'captured';
+  offset?: number;
+  limit?: number;
+  // Display width in pixels; the server rounds it to a cached size
+  w?: number;
+  preload?: number;
+}
+
+export interface SlideshowPage {
+  items: SlideshowItem[];
+  offset: number;
+  limit: number;
+  next_offset: number | null;
+  width: number;
+}
+
+// Deleted files and folders stay restorable until expires_at (seconds)
+export interface TrashEntry {
+  id: string;
+  path: string;
+  type: 'file' | 'folder';
+  deleted_at: number;
+  expires_at: number;
+  state?: 'restorable' | 'expired' | 'deleting';
 }
 
 export interface UploadFileRequest {
@@ -17,6 +88,17 @@ export interface UploadFileRequest {
   folder?: string;
 }
 
+export interface UploadSession {
+  upload_id: string;
+  folder: string;
+  filename: string;
+  size: number;
+  offset: number;
+  deduplicated: boolean;
+  // Range of the file to send back when the server has its content already
+  proof: {offset: number; length: number} | null;
+}
+
 export interface CreateFolderRequest {
   name: string;
   path?: string;
@@ -38,18 +120,88 @@ const filesApi = createApi({
         params: path ? {path} : undefined,
       }),
     }),
+    searchFiles: build.query<{items: SearchItem[]; offset: number; limit: number}, SearchFilesRequest>({
+      query: ({prefix, ...params}) => ({
+        url: `/search`,
+        params: prefix ? {...params, prefix: 'true'} : params,
+      }),
+    }),
+    getSlideshow: build.query<SlideshowPage, SlideshowRequest>({
+      query: ({recursive, ...params}) => ({
+        url: `/slideshow`,
+        params: recursive ? {...params, recursive: 'true'} : params,
+      }),
+    }),
     uploadFile: build.mutation<{success: boolean; filename: string; path: string}, UploadFileRequest>({
-      query: ({file, folder = ''}) => {
-        const formData = new FormData();
-        formData.append('file', file);
-        if (folder) {
-          formData.append('folder', folder);
-        }
-        return {
-          url: `/upload`,
+      queryFn: async ({file, folder = ''}, _api, _extraOptions, baseQuery) => {
+        const init = await baseQuery({
+          url: `/uploads`,
           method: 'post',
-          body: formData,
-        };
+          body: {folder, filename: file.name, size: file.size, sha256: await hashFile(file)},
+        });
+        if (init.error) {
+          return {error: init.error};
+        }
+        const {upload_id: uploadId, proof} = init.data as UploadSession;
+
+        // Content the server has stored already only needs proving, not sending
+        let offset = 0;
+        if (proof) {
+          const proved = await baseQuery({
+            url: `/uploads/${uploadId}/proof`,
+            method: 'post',
+            headers: {'Content-Type': 'application/octet-stream'},
+            body: file.slice(proof.offset, proof.offset + proof.length),
+          });
+          if (!proved.error) {
+            offset = (proved.data as UploadSession).offset;
+          }
+        }
+        let retries = 0;
+        for (;;) {
+          while (offset < file.size) {
+            const chunk = await baseQuery({
+              url: `/uploads/${uploadId}`,
+              method: 'PATCH',
+              params: {offset},
+              headers: {'Content-Type': 'application/octet-stream'},
+              body: file.slice(offset, offset + UPLOAD_CHUNK_SIZE),
+            });
+            if (!chunk.error) {
+              offset = (chunk.data as UploadSession).offset;
+              retries = 0;
+              continue;
+            }
+            const {status} = chunk.error;
+            const retryable = typeof status !== 'number' || status === 409 || status >= 500;
+            if (!retryable || retries >= UPLOAD_MAX_RETRIES) {
+              return {error: chunk.error};
+            }
+            retries += 1;
+            await new Promise((resolve) => setTimeout(resolve, retries * 1000));
+            // Part of the chunk may have landed; resume from the server's offset
+            const current = await baseQuery({url: `/uploads/${uploadId}`});
+            if (!current.error) {
+              offset = (current.data as UploadSession).offset;
+            }
+          }
+
+          const commit = await baseQuery({
+            url: `/uploads/${uploadId}/commit`,
+            method: 'post',
+          });
+          if (!commit.error) {
+            return {
+              data: commit.data as {success: boolean; filename: string; path: string},
+            };
+          }
+          // A stored copy vanished before commit; send the data after all
+          if (commit.error.status !== 409 || retries >= UPLOAD_MAX_RETRIES) {
+            return {error: commit.error};
+          }
+          retries += 1;
+          offset = (commit.error.data as UploadSession).offset;
+        }
       },
     }),
     createFolder: build.mutation<{success: boolean; path: string}, CreateFolderRequest>({
@@ -59,13 +211,22 @@ const filesApi = createApi({
         body,
       }),
     }),
-    deleteFile: build.mutation<{success: boolean}, DeleteFileRequest>({
+    deleteFile: build.mutation<{success: boolean; trash: TrashEntry}, DeleteFileRequest>({
       query: (body) => ({
         url: `/delete`,
         method: 'delete',
         body,
       }),
     }),
+    listTrash: build.query<TrashEntry[], void>({
+      query: () => `/trash`,
+    }),
+    restoreFromTrash: build.mutation<{success: boolean; path: string}, string>({
+      query: (id) => ({
+        url: `/trash/${encodeURIComponent(id)}/restore`,
+        method: 'post',
+      }),
+    }),
     authenticateFolder: build.mutation<{success: boolean}, {password: string; path: string}>({
       query: (body) => ({
         url: `/authenticate`,
@@ -94,9 +255,13 @@ export default filesApi;
 
 export const {
   useListFilesQuery,
+  useSearchFilesQuery,
+  useGetSlideshowQuery,
   useUploadFileMutation,
   useCreateFolderMutation,
   useDeleteFileMutation,
+  useListTrashQuery,
+  useRestoreFromTrashMutation,
   useAuthenticateFolderMutation,
   useLockFolderMutation,
   useUnlockFolderMutation,
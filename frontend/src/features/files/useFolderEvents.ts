@@ -0,0 +1,31 @@
+import {useEffect, useRef} from 'react';
+import {createBaseUrl} from '@root/util/api';
+
+const BASE_URL = '/files';
+
+// Calls onChange when the server reports that the folder's contents changed
+// (including uploads from other devices). reset means anything may have.
+const useFolderEvents = (folder: string, onChange: () => void) => {
+  const onChangeRef = useRef(onChange);
+  onChangeRef.current = onChange;
+  const folderRef = useRef(folder);
+  folderRef.current = folder;
+
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') {
+      return;
+    }
+    // One connection for the page; the browser reconnects it on its own
+    const source = new EventSource(`${createBaseUrl(BASE_URL)}/events`);
+    source.addEventListener('change', (event) => {
+      const {folders} = JSON.parse((event as MessageEvent).data) as {folders: string[]};
+      if (folders.includes(folderRef.current)) {
+        onChangeRef.current();
+      }
+    });
+    source.addEventListener('reset', () => onChangeRef.current());
+    return () => source.close();
+  }, []);
+};
+
+export default useFolderEvents;
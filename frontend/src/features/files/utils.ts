@@ -11,7 +11,12 @@ export const formatFileSize = (bytes?: number): string => {
         if (bytes < 1024 * 1024) {
           return `${(bytes / 1024).toFixed(1)} KB`;
         }
-        return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+        return (() => {
+          if (bytes < 1024 * 1024 * 1024) {
+            return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+          }
+          return `${(bytes / (1024 * 1024 * 1024)).toFixed(1)} GB`;
+        })();
       })();
     })();
   })();
@@ -1,4 +1,5 @@
-import {useGetInverterStatusQuery, useToggleInverterMutation} from './api';
+import {useToggleInverterMutation} from './api';
+import {useGetDashboardQuery} from '@root/features/dashboard/api';
 import {useEffect} from 'react';
 import useToast from '@root/features/toast/useToast';
 import Text from '@root/components/Text';
@@ -6,7 +7,7 @@ import Button from '@root/components/Button';
 import RtkQueryGate from '@root/components/RtkQueryGate';
 
 const ToggleInverter = () => {
-  const inverterStatusResponse = useGetInverterStatusQuery(undefined, {
+  const inverterStatusResponse = useGetDashboardQuery(undefined, {
     refetchOnMountOrArgChange: true,
   });
   const [toggle, response] = useToggleInverterMutation();
@@ -22,11 +23,13 @@ const ToggleInverter = () => {
         status: response.data.success ? 'success' : 'error',
       });
     }
+    if (response.error) {
+      setToast({message: 'Could not toggle the inverter', status: 'error'});
+    }
   }, [response, setToast]);
 
-  const isOn = response.data
-    ? response.data?.on
-    : inverterStatusResponse.data?.on;
+  // Toggles from here and from other clients both land in the dashboard
+  const isOn = inverterStatusResponse.data?.inverter.data?.on;
 
   return (
     <RtkQueryGate {...inverterStatusResponse}>
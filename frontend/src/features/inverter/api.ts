@@ -1,5 +1,7 @@
 import {createApi, fetchBaseQuery} from '@reduxjs/toolkit/query/react';
 import {createBaseUrl} from '@root/util/api';
+import dashboardApi from '@root/features/dashboard/api';
+import {controlChannel} from '@root/features/control/channel';
 
 export const BASE_URL = '/inverter';
 
@@ -16,7 +18,39 @@ const inverterApi = createApi({
   }),
   endpoints: (build) => ({
     toggleInverter: build.mutation<ToggleResponse, void>({
-      query: () => ({url: `/toggle`, method: 'post'}),
+      // Over the control channel when it's up, otherwise a plain request.
+      // A command that was sent is never retried over HTTP, since it may
+      // have switched the relay even if the ack was lost.
+      queryFn: async (_arg, _api, _extraOptions, baseQuery) => {
+        if (!controlChannel.isOpen()) {
+          return (await baseQuery({url: `/toggle`, method: 'post'})) as {
+            data: ToggleResponse;
+          };
+        }
+        try {
+          return {
+            data: await controlChannel.send<ToggleResponse>('inverter.toggle'),
+          };
+        } catch (error) {
+          return {error: {status: 'CUSTOM_ERROR', error: String(error)}};
+        }
+      },
+      onQueryStarted: async (_arg, {dispatch, queryFulfilled}) => {
+        try {
+          const {data} = await queryFulfilled;
+          dispatch(
+            dashboardApi.util.updateQueryData(
+              'getDashboard',
+              undefined,
+              (draft) => {
+                draft.inverter = {data: {on: data.on}, age: 0, error: null};
+              }
+            )
+          );
+        } catch {
+          // The toast reports it
+        }
+      },
     }),
     getInverterStatus: build.query<{on: boolean}, void>({
       query: () => ({url: ``}),
@@ -174,6 +174,12 @@ const LedControllerForm = ({data}: {data: LedResponse}) => {
             >
               <Text size="large">Pulse</Text>
             </Button>
+            <Button
+              isActive={preset === 'audio'}
+              onClick={() => setPreset('audio')}
+            >
+              <Text size="large">Music</Text>
+            </Button>
           </Stack>
         </Container>
       </Grid2>
@@ -3,7 +3,7 @@ import {createBaseUrl} from '@root/util/api';
 
 export const BASE_URL = '/leds';
 
-export type LEDPreset = 'rainbow' | 'pulse' | 'chase';
+export type LEDPreset = 'rainbow' | 'pulse' | 'chase' | 'audio';
 
 export interface LedResponse {
   on?: boolean;
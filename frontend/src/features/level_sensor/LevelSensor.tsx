@@ -1,5 +1,6 @@
 import RtkQueryGate from '@root/components/RtkQueryGate';
-import {LevelRating, useGetLevelSensorDataQuery} from './api';
+import {LevelRating} from './api';
+import {useGetDashboardQuery} from '@root/features/dashboard/api';
 import {Box, Stack} from '@mui/material';
 import Text from '@root/components/Text';
 import PillBox from '@root/components/PillBox';
@@ -67,9 +68,10 @@ const LevelData = ({
 };
 
 const LevelSensor = () => {
-  const response = useGetLevelSensorDataQuery(undefined, {
+  const response = useGetDashboardQuery(undefined, {
     pollingInterval: 15000,
   });
+  const data = response.data?.level_sensor.data;
 
   return (
     <Container
@@ -80,7 +82,7 @@ const LevelSensor = () => {
             <RefreshIcon />
           </Box>
           <PillBox gradiantDirection="180deg">
-            <Text size="body">{response.data?.level_percent}%</Text>
+            <Text size="body">{data?.level_percent}%</Text>
           </PillBox>
         </Stack>
       }
@@ -88,20 +90,20 @@ const LevelSensor = () => {
       <RtkQueryGate {...response}>
         <Stack spacing={4} useFlexGap alignItems="center">
           <LevelData
-            rating={response.data?.pitch_rating}
+            rating={data?.pitch_rating}
             image={<img width="80%" src={van_side} />}
-            rotateStyle={{transform: `rotate(${response.data?.pitch}deg)`}}
+            rotateStyle={{transform: `rotate(${data?.pitch}deg)`}}
           >
             <Text size="body">Pitch</Text>
-            <Text size="body">{response.data?.pitch}</Text>
+            <Text size="body">{data?.pitch}</Text>
           </LevelData>
           <LevelData
-            rating={response.data?.roll_rating}
+            rating={data?.roll_rating}
             image={<img width="55%" src={van_front} />}
-            rotateStyle={{transform: `rotate(${response.data?.roll}deg)`}}
+            rotateStyle={{transform: `rotate(${data?.roll}deg)`}}
           >
             <Text size="body">Roll</Text>
-            <Text size="body">{response.data?.roll}</Text>
+            <Text size="body">{data?.roll}</Text>
           </LevelData>
         </Stack>
       </RtkQueryGate>
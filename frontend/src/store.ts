@@ -5,6 +5,7 @@ import smartshuntApi from '@root/features/smartshunt/api';
 import levelsensorApi from '@root/features/level_sensor/api';
 import ledsApi from '@root/features/leds/api';
 import filesApi from '@root/features/files/api';
+import dashboardApi from '@root/features/dashboard/api';
 import {setupListeners} from '@reduxjs/toolkit/query';
 import appApi from './api';
 
@@ -17,6 +18,7 @@ export const createStore = (preloadedState?: Record<string, unknown>) => {
       [levelsensorApi.reducerPath]: levelsensorApi.reducer,
       [ledsApi.reducerPath]: ledsApi.reducer,
       [filesApi.reducerPath]: filesApi.reducer,
+      [dashboardApi.reducerPath]: dashboardApi.reducer,
       [appApi.reducerPath]: appApi.reducer,
     },
     middleware: (getDefaultMiddleware) => [
@@ -26,6 +28,7 @@ export const createStore = (preloadedState?: Record<string, unknown>) => {
       levelsensorApi.middleware,
       ledsApi.middleware,
       filesApi.middleware,
+      dashboardApi.middleware,
       appApi.middleware,
     ],
   };
@@ -1,12 +1,57 @@
 const path = require('path');
+const zlib = require('zlib');
+const {Compilation, sources} = require('webpack');
 const HtmlWebpackPlugin = require('html-webpack-plugin');
 const CopyPlugin = require('copy-webpack-plugin');
 
-module.exports = {
+// Writes .br and .gz next to each text asset so the backend can send them
+// as-is instead of compressing on every request
+const PRECOMPRESS_TEST = /\.(js|css|html|json|svg|txt)$/;
+const PRECOMPRESS_MIN_SIZE = 1024;
+
+class PrecompressPlugin {
+  apply(compiler) {
+    compiler.hooks.thisCompilation.tap('PrecompressPlugin', (compilation) => {
+      compilation.hooks.processAssets.tap(
+        {
+          name: 'PrecompressPlugin',
+          stage: Compilation.PROCESS_ASSETS_STAGE_OPTIMIZE_TRANSFER,
+        },
+        (assets) => {
+          for (const [name, asset] of Object.entries(assets)) {
+            const source = asset.buffer();
+            if (
+              !PRECOMPRESS_TEST.test(name) ||
+              source.length < PRECOMPRESS_MIN_SIZE
+            ) {
+              continue;
+            }
+            const brotli = zlib.brotliCompressSync(source, {
+              params: {
+                [zlib.constants.BROTLI_PARAM_QUALITY]:
+                  zlib.constants.BROTLI_MAX_QUALITY,
+              },
+            });
+            const gzip = zlib.gzipSync(source, {
+              level: zlib.constants.Z_BEST_COMPRESSION,
+            });
+            compilation.emitAsset(`${name}.br`, new sources.RawSource(brotli));
+            compilation.emitAsset(`${name}.gz`, new sources.RawSource(gzip));
+          }
+        }
+      );
+    });
+  }
+}
+
+module.exports = (env, argv) => ({
   entry: './src/index.tsx',
   output: {
     path: path.resolve(__dirname, '..', 'dist'),
-    filename: 'bundle.js',
+    // Hashed names let the backend cache them forever
+    filename: '[name].[contenthash].js',
+    assetModuleFilename: '[name].[contenthash][ext]',
+    clean: true,
   },
   resolve: {
     alias: {
@@ -55,6 +100,7 @@ module.exports = {
         {from: 'public/service-worker.js', to: 'service-worker.js'},
       ],
     }),
+    ...(argv.mode === 'production' ? [new PrecompressPlugin()] : []),
   ],
   devServer: {
     static: './public',
@@ -62,4 +108,4 @@ module.exports = {
     historyApiFallback: true,
   },
   mode: 'development',
-};
+});